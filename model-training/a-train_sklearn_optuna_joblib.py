@@ -1,59 +1,105 @@
 import numpy as np
-import pandas as pd
 import os
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+import time
+import optuna
 from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import LogisticRegression
 from lightgbm import LGBMClassifier
 import xgboost as xgb
-import optuna
 import joblib
 
+from dataset import FEATURE_COLUMNS, load_split
+from scheduler import train_models
+from tuning import (LATENCY_DIRECTIONS, boosting_report, choose_trial, fit_boosting, measure_latency, pareto_report,
+                    run_study, score_with_latency, study_name, trim_boosting)
+
 # Configuration
-HOME = '/Users/lucasbraga/Documents/GitHub/fraud-research/'
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
 MODEL_FOLDER = 'models2deploy-td-mlmodels'
 TUNE_HYPERPARAMETERS = True
 PARAMS_PATH = os.path.join(HOME, 'models', MODEL_FOLDER, 'best_params.pkl')
+# Studies persist here, so re-running with the same data and objective resumes (or reuses)
+# them; delete the file to tune from scratch
+STUDY_STORAGE = os.path.join(HOME, 'models', MODEL_FOLDER, 'optuna-studies.log')
+# Part of every study name; bump when objective() changes (2: validation split, early stopping, pruning)
+OBJECTIVE_VERSION = 2
+TRIAL_THREADS = 1
+# XGBoost and LightGBM: up to MAX_BOOSTING_ROUNDS trees, stopped EARLY_STOPPING_ROUNDS rounds
+# after validation average precision stops improving; trials trailing the median are pruned
+BOOSTING_MODELS = ('XGBoost', 'LightGBM')
+MAX_BOOSTING_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+PRUNER = optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=10)
+# Tune validation F1 against single-row predict latency, then keep the most
+# accurate Pareto-optimal trial within LATENCY_BUDGET_MS (no pruning in this mode)
+MULTI_OBJECTIVE = False
+LATENCY_BUDGET_MS = 1.0
 
 def load_data():
-    df = pd.read_csv(f'{HOME}/data/european_creditcard.csv')
-    print(f"Data shape: {df.shape}")
-
-    # Feature engineering: hour_of_day instead of Time
-    df['hour_of_day'] = (df['Time'] % (24 * 3600)) // 3600
-    df.drop('Time', axis=1, inplace=True)
+    # Engineered, scaled and split once by dataset.py, then memory-mapped from its cache
+    data = load_split(DATA_PATH, CACHE_DIR)
+    X_train, X_test, y_train, y_test = data['X_train'], data['X_test'], data['y_train'], data['y_test']
+    print(f"Data shape: train {X_train.shape}, test {X_test.shape}")
 
-    X = df.drop(['Class'], axis=1)
-    y = df['Class']
+    # Seeded so a re-run tunes on the same rows and can resume its studies
+    undersample_idx = np.random.default_rng(42).choice(len(X_train), size=len(X_train)//2, replace=False)
+    X_train, y_train = X_train[undersample_idx], y_train[undersample_idx]
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    return X_train, X_test, y_train, y_test, FEATURE_COLUMNS
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_scaled, y, test_size=0.3, random_state=42, stratify=y)
+def optimize_model(name, model, param_space, X_fit, y_fit, X_val, y_val):
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=TRIAL_THREADS)
+    boosting = name in BOOSTING_MODELS
+    if boosting:
+        model.set_params(n_estimators=MAX_BOOSTING_ROUNDS)
 
-    undersample_idx = np.random.choice(len(X_train), size=len(X_train)//2, replace=False)
-    X_train, y_train = X_train[undersample_idx], y_train.iloc[undersample_idx]
-
-    return X_train, X_test, y_train, y_test, X.columns
-
-def optimize_model(model, param_space, X, y):
     def objective(trial):
         params = {k: trial.suggest_categorical(k, v) if isinstance(v, list) else trial.suggest_float(k, *v) for k, v in param_space.items()}
         model.set_params(**params)
-        model.fit(X, y)
-        preds = model.predict(X)
-        return f1_score(y, preds)
+        if boosting:
+            pruning_trial = None if MULTI_OBJECTIVE else trial
+            trial.set_user_attr('best_rounds', fit_boosting(model, X_fit, y_fit, X_val, y_val, EARLY_STOPPING_ROUNDS, pruning_trial))
+        else:
+            model.fit(X_fit, y_fit)
+        preds = model.predict(X_val)
+        score = f1_score(y_val, preds)
+        return score_with_latency(trial, model, X_val, score) if MULTI_OBJECTIVE else score
+
+    # Trials run in parallel worker processes sharing a persistent study
+    base_name = study_name(f'{MODEL_FOLDER}-{name}', OBJECTIVE_VERSION, X_fit, y_fit, X_val, y_val)
+    if MULTI_OBJECTIVE:
+        study = run_study(f'{base_name}-latency', objective, STUDY_STORAGE, n_trials=20,
+                          threads_per_trial=TRIAL_THREADS, directions=LATENCY_DIRECTIONS)
+        pareto_report(study, os.path.join(HOME, 'models', MODEL_FOLDER, f'{name}_pareto.csv'))
+        best_trial = choose_trial(study, LATENCY_BUDGET_MS)
+        print(f"{name}: chose trial {best_trial.number} (F1 {best_trial.values[0]:.4f}, {best_trial.values[1]:.3f} ms)")
+    else:
+        study = run_study(base_name, objective, STUDY_STORAGE, n_trials=20,
+                          threads_per_trial=TRIAL_THREADS, pruner=PRUNER if boosting else None)
+        best_trial = study.best_trial
+    params = dict(best_trial.params)
+    if boosting:
+        if not MULTI_OBJECTIVE:
+            print(f"{name}: {boosting_report(study, MAX_BOOSTING_ROUNDS)}")
+        # Saved with the other params so a2- refits the same number of trees
+        params['n_estimators'] = best_trial.user_attrs['best_rounds']
+    return params
 
-    study = optuna.create_study(direction='maximize')
-    study.optimize(objective, n_trials=20)
-    return study.best_params
+def tree_count(model):
+    if isinstance(model, xgb.XGBClassifier):
+        return model.get_booster().num_boosted_rounds()
+    return model.booster_.num_trees()
 
 if __name__ == '__main__':
     X_train, X_test, y_train, y_test, _ = load_data()
+    # Trials are scored on a held-out part of the training data, which also drives early stopping
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=42, stratify=y_train)
 
     models = {
         'DecisionTree': DecisionTreeClassifier(random_state=42),
@@ -74,13 +120,23 @@ if __name__ == '__main__':
     best_params = {}
     for name, model in models.items():
         print(f"Tuning {name}...")
-        params = optimize_model(model, param_spaces[name], X_train, y_train)
-        model.set_params(**params).fit(X_train, y_train)
-        preds = model.predict(X_test)
-        print(f"{name} F1-score: {f1_score(y_test, preds):.4f}")
+        start = time.perf_counter()
+        params = optimize_model(name, model, param_spaces[name], X_fit, y_fit, X_val, y_val)
+        print(f"{name}: tuned in {time.perf_counter() - start:.1f}s")
+        model.set_params(**params)
+        if name in BOOSTING_MODELS:
+            # Exactly the best trial's rounds, with no early-stopping state left on the saved model
+            trim_boosting(model, params['n_estimators'])
 
-        model_path = os.path.join(HOME, 'models', MODEL_FOLDER, f'{name}_model.pkl')
-        joblib.dump(model, model_path)
-        
         best_params[name] = params
         joblib.dump(best_params, PARAMS_PATH)
+
+    # The final fits on the full training split are independent, so they run concurrently
+    results, seconds = train_models(models, X_train, y_train, X_test, y_test, os.path.join(HOME, 'models', MODEL_FOLDER))
+    print(f"Trained {len(models)} models in {seconds:.1f}s")
+    for name, result in results.items():
+        model = joblib.load(result['path'])
+        trees = f", {tree_count(model)} trees" if name in BOOSTING_MODELS else ''
+        p50, p99, batch = measure_latency(model, X_test)
+        print(f"{name}: F1-score {result['f1']:.4f}{trees}, predict p50 {p50:.3f} ms, p99 {p99:.3f} ms, "
+              f"1000 rows {batch:.1f} ms")
@@ -1,9 +1,5 @@
 import numpy as np
-import pandas as pd
 import os
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import f1_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import LogisticRegression
@@ -11,33 +7,30 @@ from lightgbm import LGBMClassifier
 import xgboost as xgb
 import joblib
 
+from dataset import FEATURE_COLUMNS, load_split
+from scheduler import train_models, train_sequentially
+
 # Configuration
-HOME = '/Users/lucasbraga/Documents/GitHub/fraud-research/'
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
 MODEL_FOLDER = 'models2deploy-td-mlmodels-nooptuna'
 TUNE_HYPERPARAMETERS = False
 PARAMS_PATH = os.path.join(HOME, 'models', 'models2deploy-td-mlmodels', 'best_params.pkl')
+# Also run the original one-model-at-a-time loop first and compare wall-clock
+COMPARE_SEQUENTIAL = False
 os.makedirs(os.path.join(HOME, 'models', MODEL_FOLDER), exist_ok=True)
 
 def load_data():
-    df = pd.read_csv(f'{HOME}/data/european_creditcard.csv')
-    print(f"Data shape: {df.shape}")
-
-    df['hour_of_day'] = (df['Time'] % (24 * 3600)) // 3600
-    df.drop('Time', axis=1, inplace=True)
-
-    X = df.drop(['Class'], axis=1)
-    y = df['Class']
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X_scaled, y, test_size=0.3, random_state=42, stratify=y)
+    # Engineered, scaled and split once by dataset.py, then memory-mapped from its cache
+    data = load_split(DATA_PATH, CACHE_DIR)
+    X_train, X_test, y_train, y_test = data['X_train'], data['X_test'], data['y_train'], data['y_test']
+    print(f"Data shape: train {X_train.shape}, test {X_test.shape}")
 
     undersample_idx = np.random.choice(len(X_train), size=len(X_train)//2, replace=False)
-    X_train, y_train = X_train[undersample_idx], y_train.iloc[undersample_idx]
+    X_train, y_train = X_train[undersample_idx], y_train[undersample_idx]
 
-    return X_train, X_test, y_train, y_test, X.columns
+    return X_train, X_test, y_train, y_test, FEATURE_COLUMNS
 
 if __name__ == '__main__':
     X_train, X_test, y_train, y_test, _ = load_data()
@@ -56,13 +49,15 @@ if __name__ == '__main__':
         raise ValueError("Best parameters file not found. Ensure you have run hyperparameter tuning first.")
 
     for name, model in models.items():
-        print(f"Training {name} with best parameters...")
-        params = best_params.get(name, {})
-        model.set_params(**params).fit(X_train, y_train)
-
-        preds = model.predict(X_test)
-        f1 = f1_score(y_test, preds)
-        print(f"{name} F1-score: {f1:.4f}")
-
-        model_path = os.path.join(HOME, 'models', MODEL_FOLDER, f'{name}_model.pkl')
-        joblib.dump(model, model_path)
+        model.set_params(**best_params.get(name, {}))
+    model_dir = os.path.join(HOME, 'models', MODEL_FOLDER)
+
+    if COMPARE_SEQUENTIAL:
+        print("Training sequentially with best parameters...")
+        _, sequential_seconds = train_sequentially(models, X_train, y_train, X_test, y_test, model_dir)
+
+    # Independent models, trained concurrently under the machine's core count
+    print("Training concurrently with best parameters...")
+    results, seconds = train_models(models, X_train, y_train, X_test, y_test, model_dir)
+    print(f"Trained {len(models)} models in {seconds:.1f}s"
+          + (f" ({sequential_seconds:.1f}s sequentially)" if COMPARE_SEQUENTIAL else ''))
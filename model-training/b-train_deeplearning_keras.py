@@ -1,5 +1,4 @@
 import numpy as np
-import pandas as pd
 import os
 import joblib
 import tensorflow as tf
@@ -8,35 +7,30 @@ from tensorflow.keras.layers import (Conv2D, MaxPooling2D, Flatten, Dense, LSTM,
                                      Input, Conv1D, GlobalAveragePooling1D, Dropout, 
                                      LayerNormalization, Add, MultiHeadAttention)
 from tensorflow.keras.callbacks import EarlyStopping
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, roc_auc_score, precision_recall_curve, f1_score
 
-HOME = '/Users/lucasbraga/Documents/GitHub/fraud-research/'
+from dataset import load_split
+from input_pipeline import BATCH_SIZE, Throughput, eval_dataset, scaled_learning_rate, train_dataset
+
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
 MODEL_FOLDER = os.path.join(HOME, 'models', 'models2deploy-dl')
 os.makedirs(MODEL_FOLDER, exist_ok=True)
+# Adam learning rate scaled up from 0.001 at batch size 64 to BATCH_SIZE (1024)
+LEARNING_RATE = scaled_learning_rate(BATCH_SIZE)
+# Fraction of fraud rows per training batch, e.g. 0.1; None keeps the natural ~0.2%
+POSITIVE_FRACTION = None
+EPOCHS = 10
 
 def load_data():
-    df = pd.read_csv(f'{HOME}/data/european_creditcard.csv')
-    df['hour_of_day'] = (df['Time'] % (24 * 3600)) // 3600
-    df.drop('Time', axis=1, inplace=True)
-
-    X = df.drop('Class', axis=1)
-    y = df['Class']
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
-
-    X_train, X_temp, y_train, y_temp = train_test_split(
-        X_scaled, y, test_size=0.3, random_state=42, stratify=y)
-    X_val, X_test, y_val, y_test = train_test_split(
-        X_temp, y_temp, test_size=0.5, random_state=42, stratify=y_temp)
-
-    return (X_train, y_train), (X_val, y_val), (X_test, y_test)
+    # Scaled 70/15/15 split, cached by dataset.py
+    data = load_split(DATA_PATH, CACHE_DIR, val_size=0.5)
+    return (data['X_train'], data['y_train']), (data['X_val'], data['y_val']), (data['X_test'], data['y_test'])
 
 # Model definitions
 
-def create_cnn(input_shape):
+def create_cnn(input_shape, learning_rate=0.001):
     model = Sequential([
         Conv2D(32, (2,2), activation='relu', input_shape=input_shape),
         MaxPooling2D((2,2)),
@@ -44,16 +38,16 @@ def create_cnn(input_shape):
         Dense(64, activation='relu'),
         Dense(1, activation='sigmoid')
     ])
-    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='binary_crossentropy', metrics=['accuracy'])
     return model
 
-def create_lstm(input_shape):
+def create_lstm(input_shape, learning_rate=0.001):
     model = Sequential([
         LSTM(64, input_shape=input_shape),
         Dense(32, activation='relu'),
         Dense(1, activation='sigmoid')
     ])
-    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='binary_crossentropy', metrics=['accuracy'])
     return model
 
 def transformer_encoder(inputs, head_size, num_heads, ff_dim, dropout=0.1):
@@ -68,7 +62,7 @@ def transformer_encoder(inputs, head_size, num_heads, ff_dim, dropout=0.1):
     x = Add()([x, x_ff])
     return LayerNormalization()(x)
 
-def create_transformer(input_shape):
+def create_transformer(input_shape, learning_rate=0.001):
     inputs = Input(shape=input_shape)
     x = transformer_encoder(inputs, head_size=32, num_heads=2, ff_dim=64)
     x = GlobalAveragePooling1D()(x)
@@ -76,7 +70,7 @@ def create_transformer(input_shape):
     outputs = Dense(1, activation="sigmoid")(x)
 
     model = Model(inputs, outputs)
-    model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='binary_crossentropy', metrics=['accuracy'])
     return model
 
 # Threshold optimization
@@ -87,11 +81,14 @@ def best_threshold(y_true, y_proba):
     return thresholds[best_idx], f1_scores[best_idx]
 
 # Training & Evaluation
-def train_and_save_model(model, X_train, y_train, X_val, y_val, X_test, y_test, model_name):
+def train_and_save_model(model, datasets, y_test, model_name):
+    train_ds, steps, val_ds, test_ds = datasets
     early_stop = EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True)
-    model.fit(X_train, y_train, epochs=10, batch_size=64, validation_data=(X_val, y_val), callbacks=[early_stop])
+    throughput = Throughput(steps * BATCH_SIZE)
+    model.fit(train_ds, epochs=EPOCHS, steps_per_epoch=steps, validation_data=val_ds, callbacks=[early_stop, throughput])
+    print(f"{model_name} training throughput: {np.mean(throughput.rates):,.0f} samples/sec over {len(throughput.rates)} epochs")
 
-    y_proba = model.predict(X_test).ravel()
+    y_proba = model.predict(test_ds).ravel()
     threshold, best_f1 = best_threshold(y_test, y_proba)
     y_pred = (y_proba >= threshold).astype(int)
     
@@ -101,26 +98,28 @@ def train_and_save_model(model, X_train, y_train, X_val, y_val, X_test, y_test,
     model.save(os.path.join(MODEL_FOLDER, f"{model_name}.keras"))
     model.export(os.path.join(MODEL_FOLDER, f"{model_name}/1/")) #Sagemaker likes this format
 
+def make_datasets(input_shape, X_train, y_train, X_val, y_val, X_test):
+    # Built once per input shape; each dataset caches its rows after the first pass
+    train_ds, steps = train_dataset(X_train, y_train, input_shape, BATCH_SIZE, POSITIVE_FRACTION)
+    return (train_ds, steps, eval_dataset(X_val, y_val, input_shape, BATCH_SIZE),
+            eval_dataset(X_test, None, input_shape, BATCH_SIZE))
+
 if __name__ == '__main__':
     (X_train, y_train), (X_val, y_val), (X_test, y_test) = load_data()
+    print(f"Batch size {BATCH_SIZE}, learning rate {LEARNING_RATE:.5f}, positive fraction {POSITIVE_FRACTION}")
 
-    # Prepare data shapes
-    X_train_cnn = X_train.reshape(-1, 5, 6, 1)
-    X_val_cnn = X_val.reshape(-1, 5, 6, 1)
-    X_test_cnn = X_test.reshape(-1, 5, 6, 1)
-
-    X_train_seq = X_train.reshape(-1, 30, 1)
-    X_val_seq = X_val.reshape(-1, 30, 1)
-    X_test_seq = X_test.reshape(-1, 30, 1)
+    # Prepare data pipelines: the CNN sees 5x6 images, the LSTM and Transformer 30-step sequences
+    cnn_data = make_datasets((5, 6, 1), X_train, y_train, X_val, y_val, X_test)
+    seq_data = make_datasets((30, 1), X_train, y_train, X_val, y_val, X_test)
 
     # CNN
-    cnn_model = create_cnn((5,6,1))
-    train_and_save_model(cnn_model, X_train_cnn, y_train, X_val_cnn, y_val, X_test_cnn, y_test, 'CNN')
+    cnn_model = create_cnn((5,6,1), LEARNING_RATE)
+    train_and_save_model(cnn_model, cnn_data, y_test, 'CNN')
 
     # LSTM
-    lstm_model = create_lstm((30,1))
-    train_and_save_model(lstm_model, X_train_seq, y_train, X_val_seq, y_val, X_test_seq, y_test, 'LSTM')
+    lstm_model = create_lstm((30,1), LEARNING_RATE)
+    train_and_save_model(lstm_model, seq_data, y_test, 'LSTM')
 
     # Transformer
-    transformer_model = create_transformer((30,1))
-    train_and_save_model(transformer_model, X_train_seq, y_train, X_val_seq, y_val, X_test_seq, y_test, 'Transformer')
+    transformer_model = create_transformer((30,1), LEARNING_RATE)
+    train_and_save_model(transformer_model, seq_data, y_test, 'Transformer')
@@ -1,54 +1,54 @@
 import numpy as np
-import pandas as pd
 import os
 import joblib
 from sklearn.metrics import classification_report, f1_score, precision_recall_curve
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 import xgboost as xgb
-import optuna
+
+from dataset import load_scaler, load_split
+from meta_features import BaseModel, meta_features
+from tuning import LATENCY_DIRECTIONS, choose_trial, pareto_report, run_study, score_with_latency, study_name
 
 # Configuration
 META_LEARNER_NAME = 'xgboost'  # 'xgboost' or 'random_forest'
-HOME = '/Users/lucasbraga/Documents/GitHub/fraud-research/'
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
 BASE_MODEL_FOLDER = os.path.join(HOME, 'models', 'models2deploy-td-mlmodels')
 STACKING_MODEL_FOLDER = os.path.join(HOME, 'models', 'stacking-model')
 os.makedirs(STACKING_MODEL_FOLDER, exist_ok=True)
 
 TUNE_META_HYPERPARAMETERS = True  # Set to False to use saved best parameters
 META_PARAMS_PATH = os.path.join(STACKING_MODEL_FOLDER, f'best_meta_params_{META_LEARNER_NAME}.pkl')
+# Studies persist here, so re-running with the same meta-features and objective resumes (or
+# reuses) them; delete the file to tune from scratch
+STUDY_STORAGE = os.path.join(STACKING_MODEL_FOLDER, 'optuna-studies.log')
+TRIAL_THREADS = 1
+# Part of every study name; bump when objective() changes
+OBJECTIVE_VERSION = 1
+# Out-of-fold meta-features, cached per base model artifact and dataset
+META_CACHE_DIR = os.path.join(STACKING_MODEL_FOLDER, 'meta-features')
+N_FOLDS = 5
+# Tune validation F1 against the meta-learner's single-row predict latency and keep
+# the most accurate Pareto-optimal trial within LATENCY_BUDGET_MS (the base models
+# cost the same in every trial, so only the meta-learner is timed)
+MULTI_OBJECTIVE = False
+LATENCY_BUDGET_MS = 1.0
 
 # Load original data
 def load_data():
-    df = pd.read_csv(f'{HOME}/data/european_creditcard.csv')
-    df['hour_of_day'] = (df['Time'] % (24 * 3600)) // 3600
-    df.drop('Time', axis=1, inplace=True)
-
-    X = df.drop('Class', axis=1)
-    y = df['Class']
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.3, random_state=42, stratify=y)
+    # Unscaled 70/30 split, cached by dataset.py
+    data = load_split(DATA_PATH, CACHE_DIR, scale=False)
+    return data['X_train'], data['X_test'], data['y_train'], data['y_test']
 
-    return X_train, X_test, y_train, y_test
-
-# Load previously trained base models explicitly
-def load_base_models():
-    base_models = {}
+# Previously trained base models, loaded by the meta-feature jobs themselves; a- fits
+# them on the scaled split, so they get its scaler for the unscaled rows used here
+def base_models():
     model_names = ['DecisionTree', 'RandomForest', 'LogisticRegression', 'XGBoost', 'LightGBM']
-
-    for model_name in model_names:
-        path = os.path.join(BASE_MODEL_FOLDER, f'{model_name}_model.pkl')
-        base_models[model_name] = joblib.load(path)
-
-    return base_models
-
-# Generate meta-features from base models explicitly
-def generate_meta_features(models, X):
-    meta_features = np.column_stack([
-        model.predict_proba(X.values)[:, 1] for model in models.values()
-    ])
-    return meta_features
+    scaler = load_scaler(DATA_PATH, CACHE_DIR)
+    return [BaseModel(name, os.path.join(BASE_MODEL_FOLDER, f'{name}_model.pkl'), scaler=scaler)
+            for name in model_names]
 
 # Optimize meta-learner with Optuna explicitly
 def optimize_meta_model(X_train, y_train, X_val, y_val, META_LEARNER_NAME='xgboost'):
@@ -59,20 +59,30 @@ def optimize_meta_model(X_train, y_train, X_val, y_val, META_LEARNER_NAME='xgboo
                 'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
                 'n_estimators': trial.suggest_int('n_estimators', 50, 200)
             }
-            model = xgb.XGBClassifier(**params, eval_metric='logloss', random_state=42)
+            model = xgb.XGBClassifier(**params, eval_metric='logloss', random_state=42, n_jobs=TRIAL_THREADS)
         else:  # random forest
             params = {
                 'n_estimators': trial.suggest_int('n_estimators', 50, 200),
                 'max_depth': trial.suggest_int('max_depth', 3, 20)
             }
-            model = RandomForestClassifier(**params, random_state=42)
+            model = RandomForestClassifier(**params, random_state=42, n_jobs=TRIAL_THREADS)
 
         model.fit(X_train, y_train)
         preds = model.predict(X_val)
-        return f1_score(y_val, preds)
-
-    study = optuna.create_study(direction='maximize')
-    study.optimize(objective, n_trials=20)
+        score = f1_score(y_val, preds)
+        return score_with_latency(trial, model, X_val, score) if MULTI_OBJECTIVE else score
+
+    # Trials run in parallel worker processes sharing a persistent study
+    base_name = study_name(f'stacking-{META_LEARNER_NAME}', OBJECTIVE_VERSION, X_train, y_train, X_val, y_val)
+    if MULTI_OBJECTIVE:
+        study = run_study(f'{base_name}-latency', objective, STUDY_STORAGE, n_trials=20,
+                          threads_per_trial=TRIAL_THREADS, directions=LATENCY_DIRECTIONS)
+        pareto_report(study, os.path.join(STACKING_MODEL_FOLDER, f'pareto_{META_LEARNER_NAME}.csv'))
+        best_trial = choose_trial(study, LATENCY_BUDGET_MS)
+        print(f"Chose trial {best_trial.number} (F1 {best_trial.values[0]:.4f}, {best_trial.values[1]:.3f} ms)")
+        return best_trial.params
+    study = run_study(base_name, objective, STUDY_STORAGE, n_trials=20,
+                      threads_per_trial=TRIAL_THREADS)
     return study.best_params
 
 def best_threshold(y_true, y_proba):
@@ -103,13 +113,9 @@ if __name__ == '__main__':
     X_train, X_val, y_train, y_val = train_test_split(
         X_train_full, y_train_full, test_size=0.2, random_state=42, stratify=y_train_full)
 
-    # Load base models explicitly
-    base_models = load_base_models()
-
-    # Generate meta-features explicitly
-    X_train_meta = generate_meta_features(base_models, X_train)
-    X_val_meta = generate_meta_features(base_models, X_val)
-    X_test_meta = generate_meta_features(base_models, X_test)
+    # Out-of-fold meta-features for the training rows, fold-model averages for validation and test
+    X_train_meta, X_val_meta, X_test_meta = meta_features(
+        base_models(), X_train, y_train, [X_val, X_test], META_CACHE_DIR, n_folds=N_FOLDS)
 
     if TUNE_META_HYPERPARAMETERS:
         print("Optimizing meta-learner with Optuna...")
@@ -1,18 +1,20 @@
 import numpy as np
-import pandas as pd
 import os
 import joblib
-import tensorflow as tf
 from sklearn.metrics import classification_report, precision_recall_curve, f1_score
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 import xgboost as xgb
-import optuna
+
+from dataset import load_split
+from meta_features import BaseModel, meta_features
+from tuning import LATENCY_DIRECTIONS, choose_trial, pareto_report, run_study, score_with_latency, study_name
 
 # Configuration explicitly
 META_LEARNER_NAME = 'random_forest'  # 'xgboost' or 'random_forest'
-HOME = '/Users/lucasbraga/Documents/GitHub/fraud-research/'
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
 BASE_MODEL_FOLDER = os.path.join(HOME, 'models', 'models2deploy-td-mlmodels')
 DL_MODEL_FOLDER = os.path.join(HOME, 'models', 'models2deploy-dl')
 STACKING_MODEL_FOLDER = os.path.join(HOME, 'models', 'stacking-model-dl')
@@ -20,52 +22,35 @@ os.makedirs(STACKING_MODEL_FOLDER, exist_ok=True)
 
 TUNE_META_HYPERPARAMETERS = True
 META_PARAMS_PATH = os.path.join(STACKING_MODEL_FOLDER, f'best_meta_params_{META_LEARNER_NAME}_dl.pkl')
+# Studies persist here, so re-running with the same meta-features and objective resumes (or
+# reuses) them; delete the file to tune from scratch
+STUDY_STORAGE = os.path.join(STACKING_MODEL_FOLDER, 'optuna-studies.log')
+TRIAL_THREADS = 1
+# Part of every study name; bump when objective() changes
+OBJECTIVE_VERSION = 1
+# Out-of-fold meta-features, cached per base model artifact and dataset
+META_CACHE_DIR = os.path.join(STACKING_MODEL_FOLDER, 'meta-features')
+N_FOLDS = 5
+# Tune validation F1 against the meta-learner's single-row predict latency and keep
+# the most accurate Pareto-optimal trial within LATENCY_BUDGET_MS (the base models
+# cost the same in every trial, so only the meta-learner is timed)
+MULTI_OBJECTIVE = False
+LATENCY_BUDGET_MS = 1.0
 
 # Load data explicitly
 def load_data():
-    df = pd.read_csv(f'{HOME}/data/european_creditcard.csv')
-    df['hour_of_day'] = (df['Time'] % (24 * 3600)) // 3600
-    df.drop('Time', axis=1, inplace=True)
-
-    X = df.drop('Class', axis=1)
-    y = df['Class']
-
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Scaled 70/30 split, cached by dataset.py
+    data = load_split(DATA_PATH, CACHE_DIR)
+    return data['X_train'], data['X_test'], data['y_train'], data['y_test']
 
-    X_train_full, X_test, y_train_full, y_test = train_test_split(
-        X_scaled, y, test_size=0.3, random_state=42, stratify=y)
-
-    return X_train_full, X_test, y_train_full, y_test
-
-# Load traditional ML models explicitly
-def load_traditional_models():
-    models = {}
+# Traditional ML models, then CNN and LSTM, loaded by the meta-feature jobs themselves
+def base_models():
     names = ['DecisionTree', 'RandomForest', 'LogisticRegression', 'XGBoost', 'LightGBM']
-    for name in names:
-        path = os.path.join(BASE_MODEL_FOLDER, f'{name}_model.pkl')
-        models[name] = joblib.load(path)
+    models = [BaseModel(name, os.path.join(BASE_MODEL_FOLDER, f'{name}_model.pkl')) for name in names]
+    models.append(BaseModel('CNN', os.path.join(DL_MODEL_FOLDER, 'CNN.keras'), input_shape=(5, 6, 1)))
+    models.append(BaseModel('LSTM', os.path.join(DL_MODEL_FOLDER, 'LSTM.keras'), input_shape=(30, 1)))
     return models
 
-# Load CNN and LSTM explicitly
-def load_dl_models():
-    cnn_model = tf.keras.models.load_model(os.path.join(DL_MODEL_FOLDER, 'CNN.keras'))
-    lstm_model = tf.keras.models.load_model(os.path.join(DL_MODEL_FOLDER, 'LSTM.keras'))
-    return {'CNN': cnn_model, 'LSTM': lstm_model}
-
-# Generate meta-features explicitly
-def generate_meta_features(ml_models, dl_models, X):
-    meta_features_ml = np.column_stack([model.predict_proba(X)[:, 1] for model in ml_models.values()])
-
-    X_cnn = X.reshape(-1, 5, 6, 1)
-    X_lstm = X.reshape(-1, 30, 1)
-    meta_features_dl = np.column_stack([
-        dl_models['CNN'].predict(X_cnn).ravel(),
-        dl_models['LSTM'].predict(X_lstm).ravel()
-    ])
-
-    return np.hstack((meta_features_ml, meta_features_dl))
-
 # Optimize meta-learner with Optuna explicitly
 def optimize_meta_model(X_train, y_train, X_val, y_val, meta_learner_name='random_forest'):
     def objective(trial):
@@ -75,20 +60,31 @@ def optimize_meta_model(X_train, y_train, X_val, y_val, meta_learner_name='rando
                 'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
                 'n_estimators': trial.suggest_int('n_estimators', 50, 200)
             }
-            model = xgb.XGBClassifier(**params, eval_metric='logloss', random_state=42)
+            model = xgb.XGBClassifier(**params, eval_metric='logloss', random_state=42, n_jobs=TRIAL_THREADS)
         else:
             params = {
                 'n_estimators': trial.suggest_int('n_estimators', 50, 200),
                 'max_depth': trial.suggest_int('max_depth', 3, 20)
             }
-            model = RandomForestClassifier(**params, random_state=42)
+            model = RandomForestClassifier(**params, random_state=42, n_jobs=TRIAL_THREADS)
 
         model.fit(X_train, y_train)
         preds = model.predict(X_val)
-        return f1_score(y_val, preds)
-
-    study = optuna.create_study(direction='maximize')
-    study.optimize(objective, n_trials=20)
+        score = f1_score(y_val, preds)
+        return score_with_latency(trial, model, X_val, score) if MULTI_OBJECTIVE else score
+
+    # Trials run in parallel worker processes sharing a persistent study; they only
+    # fit the meta-learner, so the forked workers never touch TensorFlow
+    base_name = study_name(f'stacking-dl-{meta_learner_name}', OBJECTIVE_VERSION, X_train, y_train, X_val, y_val)
+    if MULTI_OBJECTIVE:
+        study = run_study(f'{base_name}-latency', objective, STUDY_STORAGE, n_trials=20,
+                          threads_per_trial=TRIAL_THREADS, directions=LATENCY_DIRECTIONS)
+        pareto_report(study, os.path.join(STACKING_MODEL_FOLDER, f'pareto_{meta_learner_name}_dl.csv'))
+        best_trial = choose_trial(study, LATENCY_BUDGET_MS)
+        print(f"Chose trial {best_trial.number} (F1 {best_trial.values[0]:.4f}, {best_trial.values[1]:.3f} ms)")
+        return best_trial.params
+    study = run_study(base_name, objective, STUDY_STORAGE, n_trials=20,
+                      threads_per_trial=TRIAL_THREADS)
     return study.best_params
 
 # Find best threshold explicitly
@@ -121,12 +117,9 @@ if __name__ == '__main__':
     X_train, X_val, y_train, y_val = train_test_split(
         X_train_full, y_train_full, test_size=0.2, random_state=42, stratify=y_train_full)
 
-    ml_models = load_traditional_models()
-    dl_models = load_dl_models()
-
-    X_train_meta = generate_meta_features(ml_models, dl_models, X_train)
-    X_val_meta = generate_meta_features(ml_models, dl_models, X_val)
-    X_test_meta = generate_meta_features(ml_models, dl_models, X_test)
+    # Out-of-fold meta-features for the training rows, fold-model averages for validation and test
+    X_train_meta, X_val_meta, X_test_meta = meta_features(
+        base_models(), X_train, y_train, [X_val, X_test], META_CACHE_DIR, n_folds=N_FOLDS)
 
     if TUNE_META_HYPERPARAMETERS:
         best_params = optimize_meta_model(X_train_meta, y_train, X_val_meta, y_val, META_LEARNER_NAME)
@@ -0,0 +1,167 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+# Shared, cached preprocessing for the training scripts. The engineered,
+# (optionally) scaled and split dataset is written once as float32 .npy files
+# under CACHE_DIR/<key>/, where key hashes the source CSV contents and the
+# preprocessing config; later runs memory-map those files instead of
+# re-reading the CSV, refitting the scaler and re-splitting.
+
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
+
+FEATURE_COLUMNS = [f'V{i}' for i in range(1, 29)] + ['Amount', 'hour_of_day']
+# Bump when engineer_features() changes so old caches are not reused
+FEATURES_VERSION = 1
+
+def engineer_features(df):
+    """
+    hour_of_day instead of Time, as in every training script and app.
+    """
+    df['hour_of_day'] = (df['Time'] % (24 * 3600)) // 3600
+    df.drop('Time', axis=1, inplace=True)
+    return df
+
+def source_fingerprint(path, cache_dir):
+    """
+    Content hash of the source CSV, remembered per (size, mtime) so it is only recomputed when the file changes.
+    """
+    stat = os.stat(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, 'fingerprints.json')
+    # Pipeline stages run in parallel and share the index: the lock serializes
+    # its read-modify-write, and each writer replaces it from its own temp file
+    with open(index_path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+        entry = index.get(os.path.abspath(path))
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        index[os.path.abspath(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+        with tempfile.NamedTemporaryFile('w', dir=cache_dir, prefix='fingerprints.', suffix='.tmp', delete=False) as file:
+            json.dump(index, file, indent=2)
+        os.replace(file.name, index_path)
+        return digest.hexdigest()
+
+def array_hash(*arrays):
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype}{array.shape}'.encode())
+        digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()
+
+def split_config(scale=True, test_size=0.3, val_size=None, random_state=42):
+    """
+    val_size, when set, splits that fraction of the test part off as validation (b- uses 0.5).
+    """
+    return {'features_version': FEATURES_VERSION, 'scale': scale, 'test_size': test_size,
+            'val_size': val_size, 'random_state': random_state}
+
+def cache_key(fingerprint, config):
+    payload = json.dumps({'source': fingerprint, 'config': config}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def build_split(data_path, config):
+    df = engineer_features(pd.read_csv(data_path))
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = df['Class'].to_numpy(dtype=np.int8)
+
+    scaler = None
+    if config['scale']:
+        # Fit on the full dataset, as the original scripts do
+        scaler = StandardScaler()
+        X = scaler.fit_transform(X)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=config['test_size'], random_state=config['random_state'], stratify=y)
+    arrays = {'X_train': X_train, 'y_train': y_train, 'X_test': X_test, 'y_test': y_test}
+    if config['val_size']:
+        arrays['X_val'], arrays['X_test'], arrays['y_val'], arrays['y_test'] = train_test_split(
+            X_test, y_test, test_size=config['val_size'], random_state=config['random_state'], stratify=y_test)
+    arrays = {name: array.astype(np.float32) if name.startswith('X') else array for name, array in arrays.items()}
+    return arrays, scaler
+
+def materialize(data_path, config, directory):
+    """
+    Build the split and write it to directory atomically (a temp dir renamed into place).
+    """
+    arrays, scaler = build_split(data_path, config)
+    temp_dir = f'{directory}.tmp-{os.getpid()}'
+    os.makedirs(temp_dir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+    if scaler is not None:
+        joblib.dump(scaler, os.path.join(temp_dir, 'scaler.pkl'))
+    with open(os.path.join(temp_dir, 'meta.json'), 'w') as file:
+        json.dump({'source': os.path.abspath(data_path), 'config': config, 'columns': FEATURE_COLUMNS,
+                   'rows': {name: len(array) for name, array in arrays.items() if name.startswith('y')}}, file, indent=2)
+    try:
+        os.rename(temp_dir, directory)
+    except OSError:
+        # Another run materialized the same key first
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def split_directory(data_path, cache_dir, config):
+    """
+    Cache directory for this source and config, materializing it on first use.
+    """
+    directory = os.path.join(cache_dir, cache_key(source_fingerprint(data_path, cache_dir), config))
+    if not os.path.isdir(directory):
+        start = time.perf_counter()
+        materialize(data_path, config, directory)
+        print(f"Cached dataset split in {directory} ({time.perf_counter() - start:.1f}s)")
+    return directory
+
+def load_split(data_path=DATA_PATH, cache_dir=CACHE_DIR, mmap=True, **config):
+    """
+    Returns a dict with X_train, y_train, X_test, y_test (and X_val, y_val when
+    val_size is set). X is float32 in FEATURE_COLUMNS order, y is int8; with
+    mmap the arrays are read-only memory maps of the cached files.
+    """
+    directory = split_directory(data_path, cache_dir, split_config(**config))
+    mmap_mode = 'r' if mmap else None
+    names = [name[:-4] for name in os.listdir(directory) if name.endswith('.npy')]
+    return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in names}
+
+def load_scaler(data_path=DATA_PATH, cache_dir=CACHE_DIR, **config):
+    """
+    The StandardScaler fitted for a scaled split.
+    """
+    directory = split_directory(data_path, cache_dir, split_config(**config))
+    return joblib.load(os.path.join(directory, 'scaler.pkl'))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Materialize (or time loading) the cached training splits.')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    # The splits used by a-/a2-/a3-/d- (scaled), b- (scaled, with validation) and c- (unscaled)
+    for config in ({}, {'val_size': 0.5}, {'scale': False}):
+        start = time.perf_counter()
+        data = load_split(args.data, args.cache_dir, **config)
+        elapsed = time.perf_counter() - start
+        shapes = ', '.join(f'{name} {data[name].shape}' for name in sorted(data))
+        print(f"{json.dumps(config)}: loaded in {elapsed * 1000:.1f} ms: {shapes}")
@@ -0,0 +1,183 @@
+import argparse
+import copy
+import json
+import os
+import time
+import warnings
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from lightgbm import LGBMClassifier
+from sklearn.base import clone
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.metrics import average_precision_score
+
+from dataset import FEATURE_COLUMNS, engineer_features, load_scaler, load_split
+
+# Incremental refresh from a batch of newly labeled transactions, without
+# rereading the full CSV or refitting from scratch: XGBoost and LightGBM
+# continue boosting from the saved models, LogisticRegression is warm-started
+# from its coefficients, and the Keras models are fine-tuned for a few epochs
+# at a low learning rate. DecisionTree and RandomForest cannot be updated
+# incrementally and are carried over unchanged. Each refresh writes its
+# artifacts, under the usual file names, to a new refresh/<version>/ folder
+# next to the models it started from, with a report comparing old and new.
+# A batch with a single class cannot update the classifiers (boosting and
+# LogisticRegression need both classes, and fine-tuning would only learn
+# that class), so every model is then carried over and the report says why.
+
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+DATA_PATH = os.path.join(HOME, 'data', 'european_creditcard.csv')
+CACHE_DIR = os.path.join(HOME, 'data', 'cache')
+BASE_MODEL_FOLDER = os.path.join(HOME, 'models', 'models2deploy-td-mlmodels')
+DL_MODEL_FOLDER = os.path.join(HOME, 'models', 'models2deploy-dl')
+
+BOOSTING_ROUNDS = 20  # trees added per refresh
+LOGREG_ITERATIONS = 20  # solver iterations from the previous coefficients
+KERAS_EPOCHS = 3
+KERAS_LEARNING_RATE = 1e-4
+KERAS_MODELS = {'CNN': (5, 6, 1), 'LSTM': (30, 1), 'Transformer': (30, 1)}
+
+def load_new_batch(path, holdout):
+    """
+    Engineered and scaled like the training data; the latest holdout fraction
+    (by Time) is kept aside to evaluate the refresh on.
+    """
+    df = pd.read_csv(path).sort_values('Time', kind='stable')
+    df = engineer_features(df)
+    X = load_scaler(DATA_PATH, CACHE_DIR).transform(df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).astype(np.float32)
+    y = df['Class'].to_numpy(dtype=np.int8)
+    n_fit = int(len(X) * (1 - holdout))
+    return X[:n_fit], y[:n_fit], X[n_fit:], y[n_fit:]
+
+def continue_boosting(model, X, y):
+    params = dict(model.get_params(), n_estimators=BOOSTING_ROUNDS)
+    if isinstance(model, xgb.XGBClassifier):
+        params.update(early_stopping_rounds=None, callbacks=None)
+        return xgb.XGBClassifier(**params).fit(X, y, xgb_model=model.get_booster())
+    return LGBMClassifier(**params).fit(X, y, init_model=model.booster_)
+
+def warm_start(model, X, y):
+    refreshed = copy.deepcopy(model).set_params(warm_start=True, max_iter=LOGREG_ITERATIONS)
+    with warnings.catch_warnings():
+        # A few iterations from the previous optimum is the point, not full convergence
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        return refreshed.fit(X, y)
+
+def fine_tune(model, input_shape, X, y):
+    import tensorflow as tf
+    from input_pipeline import BATCH_SIZE, train_dataset
+
+    model.compile(optimizer=tf.keras.optimizers.Adam(KERAS_LEARNING_RATE), loss='binary_crossentropy',
+                  metrics=['accuracy'])
+    dataset, steps = train_dataset(X, y, input_shape, min(BATCH_SIZE, len(X)))
+    model.fit(dataset, epochs=KERAS_EPOCHS, steps_per_epoch=steps, verbose=0)
+    return model
+
+def single_class_reason(y):
+    """
+    Why a batch with labels y cannot be used for a refresh, or None if it can.
+    """
+    if not y.any():
+        return 'new batch has no fraud rows'
+    if y.all():
+        return 'new batch has no legitimate rows'
+    return None
+
+def scores(predict, datasets):
+    """
+    Average precision on each (name, X, y); None where y has no fraud rows.
+    """
+    return {name: float(average_precision_score(y, predict(X))) if y.any() else None for name, X, y in datasets}
+
+def compare_line(name, method, seconds, before, after, full_seconds=None):
+    fmt = lambda value: 'n/a' if value is None else f'{value:.4f}'
+    changes = ', '.join(f"{split} AP {fmt(before[split])} -> {fmt(after[split])}" for split in before)
+    full = f" (full retrain {full_seconds:.1f}s)" if full_seconds is not None else ''
+    return f"{name:<20} {method:<18} {seconds:6.1f}s{full}  {changes}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Refresh the deployed models incrementally from newly labeled transactions.')
+    parser.add_argument('new_data', help='CSV of labeled transactions in the training data layout (Time, V1..V28, Amount, Class)')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Latest fraction of the batch kept for evaluation')
+    parser.add_argument('--compare-full', action='store_true',
+                        help='Also refit the scikit-learn API models from scratch on train + new rows, for timing')
+    args = parser.parse_args()
+
+    X_new, y_new, X_holdout, y_holdout = load_new_batch(args.new_data, args.holdout)
+    data = load_split(DATA_PATH, CACHE_DIR)
+    print(f"New batch: {len(X_new)} rows to train on ({int(y_new.sum())} fraud), {len(X_holdout)} held out")
+    evaluation = [('test', data['X_test'], data['y_test']), ('new', X_holdout, y_holdout)]
+
+    skip_reason = single_class_reason(y_new)
+    if skip_reason:
+        print(f"Skipping the refresh: {skip_reason}; models are carried over unchanged")
+
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    report = {'version': version, 'new_data': os.path.abspath(args.new_data), 'rows': len(X_new),
+              'skipped_reason': skip_reason, 'models': {}}
+    lines = []
+
+    refresh_folder = os.path.join(BASE_MODEL_FOLDER, 'refresh', version)
+    os.makedirs(refresh_folder, exist_ok=True)
+    for name in ['DecisionTree', 'RandomForest', 'LogisticRegression', 'XGBoost', 'LightGBM']:
+        model = joblib.load(os.path.join(BASE_MODEL_FOLDER, f'{name}_model.pkl'))
+        before = scores(lambda X: model.predict_proba(X)[:, 1], evaluation)
+        start = time.perf_counter()
+        if skip_reason:
+            refreshed, method = model, 'skipped'
+        elif name in ('XGBoost', 'LightGBM'):
+            refreshed, method = continue_boosting(model, X_new, y_new), f'+{BOOSTING_ROUNDS} rounds'
+        elif name == 'LogisticRegression':
+            refreshed, method = warm_start(model, X_new, y_new), 'warm start'
+        else:
+            refreshed, method = model, 'unchanged'
+        seconds = time.perf_counter() - start
+        after = scores(lambda X: refreshed.predict_proba(X)[:, 1], evaluation)
+
+        full_seconds = None
+        if args.compare_full and method not in ('unchanged', 'skipped'):
+            full = clone(model)
+            if isinstance(full, xgb.XGBClassifier):
+                full.set_params(early_stopping_rounds=None, callbacks=None)
+            start = time.perf_counter()
+            full.fit(np.concatenate([data['X_train'], X_new]), np.concatenate([data['y_train'], y_new]))
+            full_seconds = time.perf_counter() - start
+
+        joblib.dump(refreshed, os.path.join(refresh_folder, f'{name}_model.pkl'))
+        report['models'][name] = {'method': method, 'seconds': seconds, 'full_retrain_seconds': full_seconds,
+                                  'before': before, 'after': after}
+        lines.append(compare_line(name, method, seconds, before, after, full_seconds))
+
+    if all(os.path.exists(os.path.join(DL_MODEL_FOLDER, f'{name}.keras')) for name in KERAS_MODELS):
+        import tensorflow as tf
+
+        dl_refresh_folder = os.path.join(DL_MODEL_FOLDER, 'refresh', version)
+        os.makedirs(dl_refresh_folder, exist_ok=True)
+        for name, input_shape in KERAS_MODELS.items():
+            model = tf.keras.models.load_model(os.path.join(DL_MODEL_FOLDER, f'{name}.keras'))
+            predict = lambda X: model.predict(X.reshape(-1, *input_shape), batch_size=4096, verbose=0).ravel()
+            before = scores(predict, evaluation)
+            start = time.perf_counter()
+            if not skip_reason:
+                fine_tune(model, input_shape, X_new, y_new)
+            seconds = time.perf_counter() - start
+            after = scores(predict, evaluation)
+
+            model.save(os.path.join(dl_refresh_folder, f'{name}.keras'))
+            model.export(os.path.join(dl_refresh_folder, f'{name}/1/'))
+            method = 'skipped' if skip_reason else f'{KERAS_EPOCHS} epochs fine-tune'
+            report['models'][name] = {'method': method, 'seconds': seconds, 'before': before, 'after': after}
+            lines.append(compare_line(name, method, seconds, before, after))
+
+    with open(os.path.join(refresh_folder, 'report.json'), 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Refresh {version} ('test': original test split, 'new': held-out new rows):")
+    print('\n'.join(lines))
+    print(f"Artifacts and report.json in {refresh_folder}")
+
+# --- How to Run ---
+# python e-refresh_models_incremental.py new_labeled_transactions.csv --compare-full
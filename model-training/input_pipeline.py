@@ -0,0 +1,112 @@
+import math
+import time
+
+import numpy as np
+import tensorflow as tf
+
+# tf.data input for the Keras models. Rows are cached in memory once per
+# input shape, shuffled each epoch, batched, reshaped a batch at a time and
+# prefetched, so the next batch is prepared while the current one trains.
+
+AUTOTUNE = tf.data.AUTOTUNE
+# Batch size and Adam learning rate the models were originally trained with
+BASE_BATCH_SIZE = 64
+BASE_LEARNING_RATE = 0.001
+# Larger batches train far faster on CPU; scaled_learning_rate() compensates
+BATCH_SIZE = 1024
+
+def scaled_learning_rate(batch_size, base_lr=BASE_LEARNING_RATE, base_batch_size=BASE_BATCH_SIZE, rule='sqrt'):
+    """
+    Learning rate for batch_size: 'linear' scales it with the batch size,
+    'sqrt' (steadier with Adam) with its square root.
+    """
+    ratio = batch_size / base_batch_size
+    return base_lr * (ratio if rule == 'linear' else math.sqrt(ratio))
+
+def _reshape(input_shape):
+    return lambda X, y: (tf.reshape(X, (-1, *input_shape)), y)
+
+def train_dataset(X, y, input_shape, batch_size, positive_fraction=None, seed=42):
+    """
+    Returns (an endless dataset, steps per epoch) for fit(steps_per_epoch=...).
+    With positive_fraction, batches are drawn from the fraud and legitimate
+    rows at that ratio, and an epoch is as many batches as the unbalanced
+    data would give.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    steps = math.ceil(len(X) / batch_size)
+    if positive_fraction is None:
+        dataset = (tf.data.Dataset.from_tensor_slices((X, y)).cache()
+                   .shuffle(min(len(X), 100_000), seed=seed, reshuffle_each_iteration=True)
+                   .batch(batch_size).repeat())
+    else:
+        positive = y == 1
+        classes = [tf.data.Dataset.from_tensor_slices((X[mask], y[mask])).cache()
+                   .shuffle(min(int(mask.sum()), 100_000), seed=seed, reshuffle_each_iteration=True).repeat()
+                   for mask in (~positive, positive)]
+        dataset = (tf.data.Dataset.sample_from_datasets(classes, weights=[1 - positive_fraction, positive_fraction],
+                                                        seed=seed)
+                   .batch(batch_size))
+    return dataset.map(_reshape(input_shape), num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE), steps
+
+def eval_dataset(X, y, input_shape, batch_size):
+    """
+    Unshuffled batches, for validation and prediction (y may be None).
+    """
+    X = np.asarray(X, dtype=np.float32)
+    if y is None:
+        dataset = tf.data.Dataset.from_tensor_slices(X).batch(batch_size)
+        reshape = lambda X: tf.reshape(X, (-1, *input_shape))
+    else:
+        dataset = tf.data.Dataset.from_tensor_slices((X, np.asarray(y, dtype=np.float32))).batch(batch_size)
+        reshape = _reshape(input_shape)
+    return dataset.cache().map(reshape, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+def shard_dataset(shards, input_shape, batch_size, seed=42):
+    """
+    Returns (an endless dataset, steps per epoch) streaming out_of_core.Shards:
+    each epoch visits the shards in a new order, loading one at a time and
+    shuffling its rows, so memory holds a shard rather than the split.
+    """
+    rng = np.random.default_rng(seed)
+
+    def batches():
+        for name in rng.permutation(shards.names):
+            X, y = shards.load(name, mmap=False)
+            order = rng.permutation(len(X))
+            for start in range(0, len(X), batch_size):
+                rows = order[start:start + batch_size]
+                yield X[rows], y[rows].astype(np.float32)
+
+    signature = (tf.TensorSpec((None, int(np.prod(input_shape))), tf.float32), tf.TensorSpec((None,), tf.float32))
+    dataset = tf.data.Dataset.from_generator(batches, output_signature=signature).repeat()
+    return dataset.map(_reshape(input_shape), num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE), math.ceil(shards.rows / batch_size)
+
+class Throughput(tf.keras.callbacks.Callback):
+    """
+    Prints training samples/sec per epoch and records it in the epoch logs (and so in History).
+    """
+    def __init__(self, samples_per_epoch):
+        super().__init__()
+        self.samples_per_epoch = samples_per_epoch
+        self.rates = []
+        self.start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.perf_counter()
+        self.train_seconds = None
+
+    def on_test_begin(self, logs=None):
+        # Validation runs at the end of the epoch; it is not training throughput
+        if self.start is not None and self.train_seconds is None:
+            self.train_seconds = time.perf_counter() - self.start
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = self.train_seconds or time.perf_counter() - self.start
+        rate = self.samples_per_epoch / seconds
+        self.rates.append(rate)
+        self.start = None
+        if logs is not None:
+            logs['samples_per_sec'] = rate
+        print(f"Epoch {epoch + 1}: {rate:,.0f} samples/sec")
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+from dataset import array_hash, source_fingerprint
+
+# Meta-features for the stacking scripts. The meta-learner's training rows
+# get out-of-fold predictions: each base model is cloned, refitted on the
+# other folds and scored on the held-out one, so no row is scored by a model
+# that saw it. Validation and test rows get the average prediction of the
+# same fold models, so every meta-feature column comes from models fitted the
+# same way. Every (base model, fold) fit is an independent job run in
+# parallel, and each resulting column is cached as .npy under cache_dir,
+# keyed by the model artifact's content hash, its scaling and the data's, so
+# re-tuning the meta-learner only reads the cache.
+
+# Bump when the out-of-fold procedure changes so old columns are not reused
+META_VERSION = 2
+PREDICT_BATCH = 4096
+
+class BaseModel:
+    """
+    A saved base model: joblib-pickled scikit-learn API estimators, or a .keras
+    model scored on rows reshaped to input_shape (refitted as b- trains it).
+    scaler, when given, is applied to every row the model is fitted on or
+    scores, for models trained on scaled data that are handed unscaled rows.
+    """
+    def __init__(self, name, path, input_shape=None, scaler=None):
+        self.name = name
+        self.path = path
+        self.input_shape = input_shape
+        self.scaler = scaler
+        self.keras = path.endswith('.keras')
+
+    def transform(self, X):
+        if self.scaler is None:
+            return X
+        return self.scaler.transform(X).astype(np.float32)
+
+    def scaling(self):
+        # Part of the column cache key
+        if self.scaler is None:
+            return None
+        return array_hash(self.scaler.mean_, self.scaler.scale_)
+
+    def load(self):
+        if self.keras:
+            import tensorflow as tf
+            return tf.keras.models.load_model(self.path)
+        return joblib.load(self.path)
+
+    def predict(self, model, X):
+        X = self.transform(X)
+        if self.keras:
+            return model.predict(X.reshape(-1, *self.input_shape), batch_size=PREDICT_BATCH, verbose=0).ravel()
+        return model.predict_proba(X)[:, 1]
+
+    def fit_copy(self, model, X, y):
+        """
+        Same architecture or hyperparameters, fitted from scratch on X, y.
+        """
+        X = self.transform(X)
+        if self.keras:
+            import tensorflow as tf
+            from input_pipeline import BATCH_SIZE, eval_dataset, scaled_learning_rate, train_dataset
+            copy = tf.keras.models.clone_model(model)
+            copy.compile(optimizer=tf.keras.optimizers.Adam(scaled_learning_rate(BATCH_SIZE)), loss='binary_crossentropy')
+            # Last 10% of the rows drive early stopping, as validation_split would
+            n_fit = int(len(X) * 0.9)
+            fit_ds, steps = train_dataset(X[:n_fit], y[:n_fit], self.input_shape, BATCH_SIZE)
+            val_ds = eval_dataset(X[n_fit:], y[n_fit:], self.input_shape, BATCH_SIZE)
+            early_stop = tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True)
+            copy.fit(fit_ds, epochs=10, steps_per_epoch=steps, validation_data=val_ds, callbacks=[early_stop], verbose=0)
+            return copy
+        copy = clone(model)
+        if 'n_jobs' in copy.get_params():
+            copy.set_params(n_jobs=1)
+        return copy.fit(X, y)
+
+def column_key(**parts):
+    payload = json.dumps(dict(parts, version=META_VERSION), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def save_column(path, column):
+    temp_path = f'{path[:-4]}.tmp-{os.getpid()}.npy'
+    np.save(temp_path, column)
+    os.replace(temp_path, path)
+
+# Jobs run in separate worker processes, each single-threaded, and load their
+# base model from disk rather than receiving it pickled
+
+def _out_of_fold(base, X, y, train_index, test_index, others):
+    """
+    Predictions of one fold model for its held-out rows and for each array in others.
+    """
+    with threadpool_limits(limits=1):
+        model = base.fit_copy(base.load(), X[train_index], y[train_index])
+        return base.predict(model, X[test_index]), [base.predict(model, X_other) for X_other in others]
+
+def meta_features(base_models, X_train, y_train, others, cache_dir, n_folds=5, seed=42, n_jobs=-1):
+    """
+    Returns [out-of-fold meta-features for X_train] + [fold-averaged meta-features
+    for each array in others], each of shape (rows, len(base_models)).
+    n_jobs is the number of worker processes (-1: one per core).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    train_hash = array_hash(X_train, y_train)
+    other_hashes = [array_hash(X) for X in others]
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X_train, y_train))
+
+    # (matrix index, model index) -> column cache path; the fold fits produce all of a
+    # base model's columns at once, so a model with any column missing gets its jobs
+    paths, jobs, targets = {}, [], []
+    for j, base in enumerate(base_models):
+        fitted = dict(model=source_fingerprint(base.path, cache_dir), scaling=base.scaling(),
+                      train=train_hash, folds=n_folds, seed=seed)
+        keys = [column_key(**fitted)] + [column_key(**fitted, data=data_hash) for data_hash in other_hashes]
+        for i, key in enumerate(keys):
+            paths[i, j] = os.path.join(cache_dir, f'{key}.npy')
+        if all(os.path.exists(paths[i, j]) for i in range(len(keys))):
+            continue
+        jobs += [delayed(_out_of_fold)(base, X_train, y_train, train_index, test_index, others)
+                 for train_index, test_index in folds]
+        targets += [(j, test_index) for _, test_index in folds]
+
+    computed = {}
+    if jobs:
+        for (j, rows), (held_out, other_predictions) in zip(targets, Parallel(n_jobs=n_jobs)(jobs)):
+            if (0, j) not in computed:
+                computed[0, j] = np.empty(len(X_train), dtype=np.float64)
+                for i, X_other in enumerate(others, start=1):
+                    computed[i, j] = np.zeros(len(X_other), dtype=np.float64)
+            computed[0, j][rows] = held_out
+            for i, predictions in enumerate(other_predictions, start=1):
+                computed[i, j] += predictions / n_folds
+        for (i, j), column in computed.items():
+            save_column(paths[i, j], column)
+
+    matrices = [np.column_stack([computed[i, j] if (i, j) in computed else np.load(paths[i, j])
+                                 for j in range(len(base_models))])
+                for i in range(len(others) + 1)]
+    print(f"Meta-features: {len(paths) - len(computed)} of {len(paths)} columns from cache, "
+          f"{len(jobs)} jobs, {time.perf_counter() - start:.1f}s")
+    return matrices
@@ -0,0 +1,166 @@
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from dataset import FEATURE_COLUMNS, FEATURES_VERSION, cache_key, engineer_features, source_fingerprint
+
+# Training data for sources larger than memory. The source CSV or Parquet file
+# is read chunk_rows rows at a time, twice: once to fit the StandardScaler
+# incrementally (partial_fit), once to scale each chunk, assign its rows to
+# train or test and append them as float32 .npy shards under
+# cache_dir/shards-<key>/. The trainers then read the shards one at a time
+# (XGBoost through an external-memory DMatrix, LightGBM through
+# lgb.Sequence, Keras through a generator), so no step holds more than a
+# chunk or shard of rows.
+
+def iter_chunks(path, chunk_rows):
+    """
+    Engineered DataFrames of up to chunk_rows rows from a CSV or Parquet file.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield engineer_features(batch.to_pandas())
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            yield engineer_features(chunk)
+
+def fit_scaler(path, chunk_rows):
+    scaler = StandardScaler()
+    for chunk in iter_chunks(path, chunk_rows):
+        scaler.partial_fit(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+    return scaler
+
+def test_mask(n_rows, chunk_index, test_size, seed):
+    # Seeded per chunk, so the split is reproducible without holding any row index
+    return np.random.default_rng([seed, chunk_index]).random(n_rows) < test_size
+
+def write_shards(path, directory, chunk_rows=500_000, test_size=0.3, seed=42):
+    """
+    Fit the scaler, then write scaled X/y shards for train and test, and meta.json.
+    """
+    start = time.perf_counter()
+    scaler = fit_scaler(path, chunk_rows)
+    rows = {'train': 0, 'test': 0}
+    shards = {'train': [], 'test': []}
+    for i, chunk in enumerate(iter_chunks(path, chunk_rows)):
+        X = scaler.transform(chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)).astype(np.float32)
+        y = chunk['Class'].to_numpy(dtype=np.int8)
+        mask = test_mask(len(X), i, test_size, seed)
+        for split, rows_mask in (('train', ~mask), ('test', mask)):
+            name = f'{split}-{i:05d}'
+            np.save(os.path.join(directory, f'X-{name}.npy'), X[rows_mask])
+            np.save(os.path.join(directory, f'y-{name}.npy'), y[rows_mask])
+            shards[split].append(name)
+            rows[split] += int(rows_mask.sum())
+
+    joblib.dump(scaler, os.path.join(directory, 'scaler.pkl'))
+    with open(os.path.join(directory, 'meta.json'), 'w') as file:
+        json.dump({'source': os.path.abspath(path), 'columns': FEATURE_COLUMNS, 'rows': rows, 'shards': shards}, file,
+                  indent=2)
+    print(f"Wrote {rows['train']} train / {rows['test']} test rows in {len(shards['train'])} shards "
+          f"({time.perf_counter() - start:.1f}s)")
+
+def shard_directory(path, cache_dir, chunk_rows=500_000, test_size=0.3, seed=42):
+    """
+    Shard directory for this source and config, written on first use (atomically, as in dataset.py).
+    """
+    config = {'features_version': FEATURES_VERSION, 'chunk_rows': chunk_rows, 'test_size': test_size, 'seed': seed}
+    directory = os.path.join(cache_dir, f'shards-{cache_key(source_fingerprint(path, cache_dir), config)}')
+    if not os.path.isdir(directory):
+        temp_dir = f'{directory}.tmp-{os.getpid()}'
+        os.makedirs(temp_dir, exist_ok=True)
+        write_shards(path, temp_dir, chunk_rows, test_size, seed)
+        try:
+            os.rename(temp_dir, directory)
+        except OSError:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return directory
+
+class Shards:
+    """
+    Shards of one split: paths, row count, and per-shard memory-mapped access.
+    """
+    def __init__(self, directory, split):
+        with open(os.path.join(directory, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        self.directory = directory
+        self.names = meta['shards'][split]
+        self.rows = meta['rows'][split]
+
+    def load(self, name, mmap=True):
+        mmap_mode = 'r' if mmap else None
+        return (np.load(os.path.join(self.directory, f'X-{name}.npy'), mmap_mode=mmap_mode),
+                np.load(os.path.join(self.directory, f'y-{name}.npy'), mmap_mode=mmap_mode))
+
+    def __iter__(self):
+        for name in self.names:
+            yield self.load(name, mmap=False)
+
+    def labels(self):
+        # One byte per row; the only per-row array the trainers hold
+        return np.concatenate([self.load(name)[1] for name in self.names])
+
+def xgboost_dmatrix(shards, cache_prefix, max_bin=256):
+    """
+    ExtMemQuantileDMatrix fed shard by shard; quantized pages are cached on disk under cache_prefix.
+    """
+    import xgboost as xgb
+
+    class ShardIter(xgb.DataIter):
+        def __init__(self):
+            self.position = 0
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self.position == len(shards.names):
+                return False
+            X, y = shards.load(shards.names[self.position], mmap=False)
+            input_data(data=X, label=y)
+            self.position += 1
+            return True
+
+        def reset(self):
+            self.position = 0
+
+    return xgb.ExtMemQuantileDMatrix(ShardIter(), max_bin=max_bin)
+
+def lightgbm_dataset(shards, params=None):
+    """
+    lgb.Dataset built through memory-mapped lgb.Sequence shards, binned batch by batch.
+    """
+    import lightgbm as lgb
+
+    class ShardSequence(lgb.Sequence):
+        def __init__(self, X):
+            self.X = X
+            self.batch_size = 65536
+
+        def __getitem__(self, index):
+            # LightGBM bins from float64 samples; cast one batch at a time
+            return np.asarray(self.X[index], dtype=np.float64)
+
+        def __len__(self):
+            return len(self.X)
+
+    sequences = [ShardSequence(shards.load(name)[0]) for name in shards.names]
+    return lgb.Dataset(sequences, label=shards.labels(), params=params, free_raw_data=True)
+
+def predict_shards(predict, shards):
+    """
+    Scores for every row of the split, one shard in memory at a time.
+    """
+    return np.concatenate([predict(X) for X, _ in shards])
+
+def peak_memory_mb():
+    # ru_maxrss is in bytes on macOS, KB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
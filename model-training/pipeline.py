@@ -0,0 +1,242 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+# Runs the training scripts as a pipeline of stages: base models (a) and DL
+# models (b) first, then the stacking models (c, d) that load their outputs.
+# A stage's inputs are the data and the upstream artifacts it reads, plus its
+# script and the local modules the script imports. A stage is skipped when
+# its outputs exist and its inputs hash to the same digest as on its last
+# successful run. Stages whose dependencies are done run in parallel as
+# separate processes. Each stage gets FRAUD_RESEARCH_HOME, its output goes
+# to a log file, and the run ends with a timing report per stage.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+HOME = os.environ.get('FRAUD_RESEARCH_HOME', '/Users/lucasbraga/Documents/GitHub/fraud-research/')
+
+DATA = 'data/european_creditcard.csv'
+BASE_MODELS = [f'models/models2deploy-td-mlmodels/{name}_model.pkl'
+               for name in ['DecisionTree', 'RandomForest', 'LogisticRegression', 'XGBoost', 'LightGBM']]
+DL_MODELS = [f'models/models2deploy-dl/{name}.keras' for name in ['CNN', 'LSTM', 'Transformer']]
+
+class Stage:
+    """
+    One training script; inputs and outputs are paths relative to HOME.
+    """
+    def __init__(self, name, script, inputs, outputs, deps=()):
+        self.name = name
+        self.script = script
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+
+STAGES = [
+    Stage('a', 'a-train_sklearn_optuna_joblib.py', [DATA], BASE_MODELS),
+    Stage('b', 'b-train_deeplearning_keras.py', [DATA], DL_MODELS),
+    Stage('c', 'c-train_stacking_model.py', [DATA] + BASE_MODELS,
+          ['models/stacking-model/stacking_model_xgboost.pkl'], deps=['a']),
+    # d stacks the CNN and LSTM only, so retraining the Transformer does not rerun it
+    Stage('d', 'd-train_stacking_model_incl_dl.py', [DATA] + BASE_MODELS + DL_MODELS[:2],
+          ['models/stacking-model-dl/stacking_model_random_forest_dl.pkl'], deps=['a', 'b']),
+]
+
+def local_modules(script, seen=None):
+    """
+    script plus the model-training modules it imports, directly or through each other.
+    """
+    seen = seen if seen is not None else set()
+    seen.add(script)
+    with open(os.path.join(SCRIPT_DIR, script), 'r') as file:
+        tree = ast.parse(file.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = f"{name.split('.')[0]}.py"
+            if module not in seen and os.path.exists(os.path.join(SCRIPT_DIR, module)):
+                local_modules(module, seen)
+    return seen
+
+def file_hash(path, memo):
+    """
+    sha256 of the file, remembered per (size, mtime) in memo so large unchanged inputs are not reread.
+    """
+    stat = os.stat(path)
+    entry = memo.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    memo[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return digest.hexdigest()
+
+def path_hash(path, memo):
+    # .keras models are files; SavedModel-style folders are hashed file by file
+    if not os.path.isdir(path):
+        return file_hash(path, memo)
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(f'{os.path.relpath(file_path, path)}:{file_hash(file_path, memo)}'.encode())
+    return digest.hexdigest()
+
+def input_hashes(stage, home, memo):
+    """
+    {path: sha256} for the stage's inputs (None where missing) and its code.
+    """
+    hashes = {path: path_hash(os.path.join(home, path), memo) if os.path.exists(os.path.join(home, path)) else None
+              for path in stage.inputs}
+    for module in sorted(local_modules(stage.script)):
+        hashes[f'model-training/{module}'] = file_hash(os.path.join(SCRIPT_DIR, module), memo)
+    return hashes
+
+def digest(hashes):
+    return hashlib.sha256(json.dumps(hashes, sort_keys=True).encode()).hexdigest()
+
+def run_stage(stage, home, log_dir):
+    env = dict(os.environ, FRAUD_RESEARCH_HOME=home)
+    log_path = os.path.join(log_dir, f'{stage.name}.log')
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        returncode = subprocess.run([sys.executable, stage.script], cwd=SCRIPT_DIR, env=env,
+                                    stdout=log, stderr=subprocess.STDOUT).returncode
+    return returncode, time.perf_counter() - start, log_path
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            return json.load(file)
+    return {'stages': {}, 'files': {}}
+
+def save_state(state, path):
+    with open(path + '.tmp', 'w') as file:
+        json.dump(state, file, indent=2)
+    os.replace(path + '.tmp', path)
+
+def run_pipeline(stages, home, jobs=2, force=(), dry_run=False):
+    """
+    Run (or skip) each stage once its dependencies have finished; returns {name: report}.
+    """
+    state_path = os.path.join(home, 'models', 'pipeline-state.json')
+    log_dir = os.path.join(home, 'models', 'pipeline-logs')
+    os.makedirs(log_dir, exist_ok=True)
+    state = load_state(state_path)
+    by_name = {stage.name: stage for stage in stages}
+    report = {}
+    start = time.perf_counter()
+
+    def decide(stage):
+        # Called once the dependencies are done, so their outputs are current
+        hashes = input_hashes(stage, home, state['files'])
+        last = state['stages'].get(stage.name, {})
+        missing = [path for path in stage.outputs if not os.path.exists(os.path.join(home, path))]
+        if stage.name in force:
+            reason = 'forced'
+        elif missing:
+            reason = f'missing {missing[0]}' + (f' (+{len(missing) - 1})' if len(missing) > 1 else '')
+        elif last.get('digest') != digest(hashes):
+            changed = [path for path, value in hashes.items() if last.get('inputs', {}).get(path) != value]
+            reason = f'changed {changed[0]}' + (f' (+{len(changed) - 1})' if len(changed) > 1 else '')
+        else:
+            reason = None
+        return hashes, reason
+
+    pending = list(stages)
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for stage in list(pending):
+                deps = [report.get(dep, {}).get('status') for dep in stage.deps]
+                if any(status in ('failed', 'blocked') for status in deps):
+                    report[stage.name] = {'status': 'blocked', 'seconds': 0.0, 'reason': 'dependency failed'}
+                    pending.remove(stage)
+                elif all(status in ('ran', 'skipped', 'would run') for status in deps) and len(running) < jobs:
+                    pending.remove(stage)
+                    hashes, reason = decide(stage)
+                    if reason is None and 'would run' in deps:
+                        # Its inputs will change once the dependency has run
+                        reason = f"after {stage.deps[deps.index('would run')]}"
+                    if reason is None:
+                        report[stage.name] = {'status': 'skipped', 'seconds': 0.0, 'reason': 'up to date'}
+                    elif dry_run:
+                        report[stage.name] = {'status': 'would run', 'seconds': 0.0, 'reason': reason}
+                    else:
+                        print(f"[{time.perf_counter() - start:7.1f}s] {stage.name}: running {stage.script} ({reason})")
+                        future = pool.submit(run_stage, stage, home, log_dir)
+                        running[future] = (stage, hashes, reason, time.perf_counter() - start)
+                        continue
+                    print(f"[{time.perf_counter() - start:7.1f}s] {stage.name}: {report[stage.name]['status']} "
+                          f"({report[stage.name]['reason']})")
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, hashes, reason, started = running.pop(future)
+                returncode, seconds, log_path = future.result()
+                status = 'ran' if returncode == 0 else 'failed'
+                report[stage.name] = {'status': status, 'seconds': seconds, 'reason': reason,
+                                      'started': started, 'log': log_path}
+                if returncode == 0:
+                    state['stages'][stage.name] = {'digest': digest(hashes), 'inputs': hashes,
+                                                   'finished': datetime.now(timezone.utc).isoformat(),
+                                                   'seconds': seconds}
+                    save_state(state, state_path)
+                print(f"[{time.perf_counter() - start:7.1f}s] {stage.name}: {status} in {seconds:.1f}s"
+                      + (f", exit code {returncode}, see {log_path}" if returncode else ''))
+
+    save_state(state, state_path)
+    wall_seconds = time.perf_counter() - start
+    with open(os.path.join(home, 'models', 'pipeline-report.json'), 'w') as file:
+        json.dump({'finished': datetime.now(timezone.utc).isoformat(), 'wall_seconds': wall_seconds,
+                   'stages': {name: report[name] for name in by_name}}, file, indent=2)
+    print_report(report, by_name, wall_seconds)
+    return report
+
+def print_report(report, by_name, wall_seconds):
+    print(f"\n{'stage':<6} {'status':<10} {'seconds':>8}  reason")
+    for name in by_name:
+        entry = report[name]
+        print(f"{name:<6} {entry['status']:<10} {entry['seconds']:8.1f}  {entry['reason']}")
+    stage_seconds = sum(entry['seconds'] for entry in report.values())
+    print(f"Wall-clock {wall_seconds:.1f}s for {stage_seconds:.1f}s of stage time")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the training scripts a -> c, b -> d, skipping up-to-date stages.')
+    parser.add_argument('stages', nargs='*', help='Stages to consider (default: all); dependencies are added')
+    parser.add_argument('--home', default=HOME, help='Research folder with data/ and models/ (default: FRAUD_RESEARCH_HOME)')
+    parser.add_argument('--jobs', type=int, default=2, help='Stages run at once (a and b each use every core)')
+    parser.add_argument('--force', nargs='+', default=[], help='Rerun these stages even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='Only print what would run and why')
+    args = parser.parse_args()
+
+    by_name = {stage.name: stage for stage in STAGES}
+    unknown = sorted(set(args.stages + args.force) - set(by_name))
+    if unknown:
+        parser.error(f"unknown stage(s) {', '.join(unknown)}; choose from {', '.join(by_name)}")
+    selected = set(args.stages or by_name)
+    for name in list(selected):
+        selected.update(by_name[name].deps)
+    report = run_pipeline([stage for stage in STAGES if stage.name in selected], os.path.abspath(args.home),
+                          jobs=args.jobs, force=set(args.force), dry_run=args.dry_run)
+    sys.exit(1 if any(entry['status'] in ('failed', 'blocked') for entry in report.values()) else 0)
+
+# --- How to Run ---
+# python pipeline.py --dry-run
+# FRAUD_RESEARCH_HOME=/path/to/fraud-research python pipeline.py
+# python pipeline.py c --force a
@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+from sklearn.metrics import f1_score
+from threadpoolctl import threadpool_limits
+
+# Concurrent training of independent models. Each model is fitted in its own
+# forked process with a thread allotment, and the allotments sum to the cores
+# available. Single-threaded estimators get one core each, and the spare
+# cores are split among the multi-threaded ones, so cores don't sit idle
+# while a single-threaded fit runs and the processes don't oversubscribe
+# them. Artifacts and metrics are collected as each model finishes. Nothing
+# is fitted in the parent process, so its OpenMP runtime is never started
+# before a fork.
+
+CPU_COUNT = os.cpu_count() or 1
+# Estimators whose fit uses n_jobs threads (n_jobs is an alias of nthread / num_threads)
+THREADED = ('RandomForestClassifier', 'ExtraTreesClassifier', 'XGBClassifier', 'LGBMClassifier')
+
+# Set before the pool forks so workers inherit the data instead of unpickling it
+_DATA = {}
+
+def allot_threads(models, cores=CPU_COUNT):
+    """
+    Returns ({name: threads}, number of models to run at once).
+    """
+    threaded = [name for name, model in models.items() if type(model).__name__ in THREADED]
+    allotment = {name: 1 for name in models}
+    if cores <= len(models):
+        return allotment, cores
+    spare = cores - len(models)
+    for i, name in enumerate(threaded):
+        allotment[name] += spare // len(threaded) + (i < spare % len(threaded))
+    return allotment, len(models)
+
+def fit_and_save(name, model, threads, model_dir):
+    """
+    Fit on the training data, score F1 on the test data and save the model as <name>_model.pkl.
+    """
+    X_train, y_train, X_test, y_test = _DATA['arrays']
+    if threads and type(model).__name__ in THREADED:
+        model.set_params(n_jobs=threads)
+    start = time.perf_counter()
+    with threadpool_limits(limits=threads):
+        model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    f1 = f1_score(y_test, model.predict(X_test))
+    model_path = os.path.join(model_dir, f'{name}_model.pkl')
+    joblib.dump(model, model_path)
+    return {'f1': f1, 'fit_seconds': fit_seconds, 'threads': threads, 'path': model_path}
+
+def train_models(models, X_train, y_train, X_test, y_test, model_dir, cores=CPU_COUNT):
+    """
+    Train models ({name: estimator}) concurrently; returns ({name: metrics}, wall-clock seconds).
+    """
+    allotment, concurrency = allot_threads(models, cores)
+    print(f"Training {len(models)} models, {concurrency} at a time on {cores} cores: {allotment}")
+    _DATA['arrays'] = (X_train, y_train, X_test, y_test)
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context('fork')) as pool:
+        # Threaded models first: they take the longest and hold the most cores
+        order = sorted(models, key=lambda name: type(models[name]).__name__ not in THREADED)
+        futures = {pool.submit(fit_and_save, name, models[name], allotment[name], model_dir): name for name in order}
+        for future in as_completed(futures):
+            name = futures[future]
+            results[name] = future.result()
+            print(f"{name} F1-score: {results[name]['f1']:.4f} (fit {results[name]['fit_seconds']:.1f}s "
+                  f"on {allotment[name]} threads, done at {time.perf_counter() - start:.1f}s)")
+    _DATA.clear()
+    return results, time.perf_counter() - start
+
+def fit_all(models, model_dir):
+    results = {}
+    for name, model in models.items():
+        results[name] = fit_and_save(name, model, None, model_dir)
+        print(f"{name} F1-score: {results[name]['f1']:.4f} (fit {results[name]['fit_seconds']:.1f}s)", flush=True)
+    return results
+
+def train_sequentially(models, X_train, y_train, X_test, y_test, model_dir):
+    """
+    The original loop: one model after another, each with its own default threading.
+    It runs in a forked child so that the parent never starts the OpenMP runtime
+    (LightGBM, XGBoost), which a later train_models() fork could deadlock on.
+    """
+    _DATA['arrays'] = (X_train, y_train, X_test, y_test)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('fork')) as pool:
+        results = pool.submit(fit_all, models, model_dir).result()
+    _DATA.clear()
+    return results, time.perf_counter() - start
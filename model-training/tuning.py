@@ -0,0 +1,278 @@
+import csv
+import logging
+import math
+import multiprocessing
+import os
+import time
+
+import lightgbm as lgb
+import numpy as np
+import optuna
+import xgboost as xgb
+from optuna.storages import JournalStorage, RDBStorage
+from optuna.study import MaxTrialsCallback
+from optuna.trial import TrialState
+from threadpoolctl import threadpool_limits
+
+from dataset import array_hash
+
+try:
+    from optuna.storages.journal import JournalFileBackend
+except ImportError:  # optuna < 4.0
+    from optuna.storages import JournalFileStorage as JournalFileBackend
+
+# Parallel, resumable Optuna tuning. Studies live in a local journal file
+# (or SQLite for a '.db' path) so several worker processes can share one
+# study and an interrupted run picks up where it stopped. Each worker runs
+# one trial at a time with at most threads_per_trial threads, so
+# n_workers * threads_per_trial should not exceed the cores available.
+# Study names carry the objective version and a hash of the data the
+# objective is scored on (see study_name()), so a changed dataset or
+# objective starts a new study instead of reusing stale trials.
+
+CPU_COUNT = os.cpu_count() or 1
+FINISHED_STATES = (TrialState.COMPLETE, TrialState.PRUNED)
+
+def make_storage(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if path.endswith('.db'):
+        return RDBStorage(f'sqlite:///{path}', engine_kwargs={'connect_args': {'timeout': 60}})
+    return JournalStorage(JournalFileBackend(path))
+
+def study_name(name, objective_version, *arrays):
+    """
+    name plus objective_version and a hash of arrays (the fit and validation data
+    the objective sees); bump objective_version whenever the objective changes.
+    """
+    return f'{name}-v{objective_version}-{array_hash(*arrays)[:12]}'
+
+def requeue_interrupted(study, storage):
+    """
+    Trials left RUNNING by an interrupted run are marked failed and their
+    parameters enqueued again, so the resumed run re-evaluates them first.
+    """
+    for trial in study.get_trials(deepcopy=False, states=(TrialState.RUNNING,)):
+        storage.set_trial_state_values(trial._trial_id, state=TrialState.FAIL)
+        study.enqueue_trial(trial.params)
+        print(f"{study.study_name}: re-queued interrupted trial {trial.number}")
+
+def require_complete(study, failed_workers=None):
+    """
+    Raise unless the study has a COMPLETE trial, so callers never hit Optuna's
+    bare ValueError from best_params / best_trials.
+    """
+    if study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,)):
+        return
+    states = {}
+    for trial in study.get_trials(deepcopy=False):
+        states[trial.state.name] = states.get(trial.state.name, 0) + 1
+    message = f"{study.study_name}: no trial completed (trials by state: {states or 'none'})"
+    if failed_workers:
+        message += f"; worker exit codes: {failed_workers}"
+    raise RuntimeError(message + "; see the worker logs above")
+
+def _worker(study_name, storage_path, objective, n_trials, worker_trials, threads_per_trial, sampler_seed, pruner):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    sampler = optuna.samplers.TPESampler(seed=sampler_seed) if sampler_seed is not None else None
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage_path), sampler=sampler, pruner=pruner)
+    with threadpool_limits(limits=threads_per_trial):
+        # worker_trials bounds this worker's share; the callback stops it once the study total is reached
+        study.optimize(objective, n_trials=worker_trials,
+                       callbacks=[MaxTrialsCallback(n_trials, states=FINISHED_STATES)])
+
+def run_study(study_name, objective, storage_path, n_trials=20, direction='maximize',
+              n_workers=None, threads_per_trial=1, seed=42, pruner=None, directions=None):
+    """
+    Run objective until the study has n_trials finished trials, spread over
+    n_workers processes (default: cores // threads_per_trial), and return the study.
+
+    Workers are forked, so objective may be a closure over the training data
+    (ideally memory-mapped, see dataset.py) and is not pickled. Estimators
+    built in the objective should use n_jobs=threads_per_trial. pruner
+    (e.g. optuna.pruners.HyperbandPruner) acts on values the objective
+    reports with trial.report(); see fit_boosting(). directions (e.g.
+    LATENCY_DIRECTIONS) makes it a multi-objective study, which cannot prune.
+    """
+    storage = make_storage(storage_path)
+    study = optuna.create_study(study_name=study_name, storage=storage, load_if_exists=True,
+                                **({'directions': directions} if directions else {'direction': direction}))
+    requeue_interrupted(study, storage)
+
+    finished = len(study.get_trials(deepcopy=False, states=FINISHED_STATES))
+    remaining = n_trials - finished
+    if remaining <= 0:
+        print(f"{study_name}: {finished} trials already finished, reusing them")
+        require_complete(study)
+        return study
+
+    n_workers = min(n_workers or max(1, CPU_COUNT // threads_per_trial), remaining)
+    print(f"{study_name}: running {remaining} trials on {n_workers} workers x {threads_per_trial} threads "
+          f"({finished} already finished)")
+    worker_trials = math.ceil(remaining / n_workers)
+    context = multiprocessing.get_context('fork')
+    # Distinct sampler seeds so workers don't propose identical parameters
+    processes = [context.Process(target=_worker, name=f'{study_name}-worker-{i}',
+                                 args=(study_name, storage_path, objective, n_trials, worker_trials, threads_per_trial,
+                                       None if seed is None else seed + i, pruner))
+                 for i in range(n_workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        raise
+
+    failed = {process.name: process.exitcode for process in processes if process.exitcode != 0}
+    if failed:
+        logging.error(f"Tuning workers exited with errors: {failed}")
+    study = optuna.load_study(study_name=study_name, storage=make_storage(storage_path))
+    require_complete(study, failed)
+    elapsed = time.perf_counter() - start
+    if directions:
+        print(f"{study_name}: {len(study.best_trials)} Pareto-optimal trials ({elapsed:.1f}s)")
+    else:
+        print(f"{study_name}: best value {study.best_value:.4f} with {study.best_params} ({elapsed:.1f}s)")
+    return study
+
+# Early stopping and pruning for the gradient-boosted models. Validation
+# average precision is reported to the trial after every boosting round, so
+# the pruner can stop an unpromising trial after a few rounds, and early
+# stopping ends a promising one once the metric stops improving.
+
+class XGBoostPruningCallback(xgb.callback.TrainingCallback):
+    def __init__(self, trial, rounds):
+        self.trial = trial
+        self.rounds = rounds
+        self.pruned = False
+
+    def after_iteration(self, model, epoch, evals_log):
+        self.rounds['trained'] = epoch + 1
+        self.trial.report(evals_log['validation_0']['aucpr'][-1], epoch)
+        # Stop boosting here; fit_boosting() raises TrialPruned once fit() returns
+        self.pruned = self.trial.should_prune()
+        return self.pruned
+
+def lightgbm_pruning_callback(trial, rounds):
+    def callback(env):
+        rounds['trained'] = env.iteration + 1
+        trial.report(env.evaluation_result_list[0][2], env.iteration)
+        if trial.should_prune():
+            raise optuna.TrialPruned(f'Pruned at boosting round {env.iteration}')
+    return callback
+
+def fit_boosting(model, X_fit, y_fit, X_val, y_val, early_stopping_rounds, trial=None):
+    """
+    Fit an XGBClassifier or LGBMClassifier with early stopping on (X_val, y_val)
+    and, given a trial, pruning. Returns the number of rounds worth keeping;
+    the rounds actually trained are recorded in the trial's 'rounds_trained'.
+    """
+    rounds = {'trained': 0}
+    try:
+        if isinstance(model, xgb.XGBClassifier):
+            pruning = XGBoostPruningCallback(trial, rounds) if trial else None
+            model.set_params(eval_metric='aucpr', early_stopping_rounds=early_stopping_rounds,
+                             callbacks=[pruning] if pruning else None)
+            model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+            if pruning and pruning.pruned:
+                raise optuna.TrialPruned(f"Pruned at boosting round {rounds['trained'] - 1}")
+            return model.best_iteration + 1
+        callbacks = [lgb.early_stopping(early_stopping_rounds, verbose=False)]
+        if trial:
+            callbacks.append(lightgbm_pruning_callback(trial, rounds))
+        model.set_params(metric='average_precision', verbose=-1)
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], callbacks=callbacks)
+        return model.best_iteration_
+    finally:
+        if trial:
+            trial.set_user_attr('rounds_trained', rounds['trained'])
+
+def trim_boosting(model, rounds):
+    """
+    Set exactly rounds trees and clear early stopping and callbacks, so the
+    refitted model carries no surplus trees past the best iteration.
+    """
+    if isinstance(model, xgb.XGBClassifier):
+        model.set_params(early_stopping_rounds=None, callbacks=None)
+    return model.set_params(n_estimators=rounds)
+
+def boosting_report(study, max_rounds):
+    """
+    Pruned trials and boosting rounds trained, against running every trial to max_rounds.
+    """
+    trials = study.get_trials(deepcopy=False, states=FINISHED_STATES)
+    trained = sum(trial.user_attrs.get('rounds_trained', max_rounds) for trial in trials)
+    pruned = sum(trial.state == TrialState.PRUNED for trial in trials)
+    full = len(trials) * max_rounds
+    return (f"{pruned}/{len(trials)} trials pruned, {trained} of {full} boosting rounds trained "
+            f"({1 - trained / full:.0%} saved)")
+
+# Multi-objective tuning: maximize the score and minimize the serving cost of
+# the candidate, measured inside the trial as the scoring service calls the
+# model (predict_proba on one row, and on a batch). Trials on the same host
+# run concurrently, so latencies compare candidates rather than predict
+# production numbers.
+
+LATENCY_DIRECTIONS = ['maximize', 'minimize']
+
+def measure_latency(model, X, n_rows=200, batch_size=1000):
+    """
+    Returns (single-row p50, single-row p99, batch of batch_size rows) predict_proba times in milliseconds.
+    """
+    X = np.asarray(X)
+    model.predict_proba(X[:1])
+    timings = []
+    for row in X[:n_rows]:
+        start = time.perf_counter()
+        model.predict_proba(row.reshape(1, -1))
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict_proba(X[:batch_size])
+    batch = time.perf_counter() - start
+    p50, p99 = np.percentile(timings, [50, 99]) * 1000
+    return float(p50), float(p99), batch * 1000
+
+def score_with_latency(trial, model, X, score):
+    """
+    Multi-objective trial value (score, single-row p50 ms); p99 and batch latency are kept as user attrs.
+    """
+    p50, p99, batch = measure_latency(model, X)
+    trial.set_user_attr('p99_ms', p99)
+    trial.set_user_attr('batch_ms', batch)
+    return score, p50
+
+def pareto_report(study, path=None):
+    """
+    Print the Pareto front, fastest first, and write it to path as CSV when given.
+    """
+    front = sorted(study.best_trials, key=lambda trial: trial.values[1])
+    rows = [{'trial': trial.number, 'score': trial.values[0], 'p50_ms': trial.values[1],
+             'p99_ms': trial.user_attrs.get('p99_ms'), 'batch_ms': trial.user_attrs.get('batch_ms'),
+             'params': trial.params} for trial in front]
+    print(f"{study.study_name} Pareto front:")
+    for row in rows:
+        print(f"  trial {row['trial']:>3}  score {row['score']:.4f}  p50 {row['p50_ms']:.3f} ms  "
+              f"p99 {row['p99_ms']:.3f} ms  batch {row['batch_ms']:.1f} ms  {row['params']}")
+    if path:
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else ['trial'])
+            writer.writeheader()
+            writer.writerows(rows)
+    return rows
+
+def choose_trial(study, latency_budget_ms):
+    """
+    Highest-scoring Pareto trial whose single-row p50 fits latency_budget_ms,
+    or the fastest one when none does.
+    """
+    front = study.best_trials
+    within = [trial for trial in front if trial.values[1] <= latency_budget_ms]
+    if within:
+        return max(within, key=lambda trial: trial.values[0])
+    fastest = min(front, key=lambda trial: trial.values[1])
+    logging.warning(f"{study.study_name}: no Pareto trial within {latency_budget_ms} ms, "
+                    f"using the fastest ({fastest.values[1]:.3f} ms)")
+    return fastest
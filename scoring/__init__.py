@@ -0,0 +1,5 @@
+"""Shared scoring package for the fraud detection models.
+
+Loads the same model artifacts that the Flask apps under apps/ ship with and
+exposes vectorized batch scoring on top of them.
+"""
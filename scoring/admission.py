@@ -0,0 +1,119 @@
+import itertools
+import threading
+import time
+
+from scoring.metrics import Counter, Gauge, Histogram
+
+ADMISSION_REJECTED = Counter('scoring_admission_rejected_total', 'Requests rejected by admission control, by reason')
+ADMISSION_QUEUE_SECONDS = Histogram('scoring_admission_queue_seconds', 'Time admitted requests waited for a slot')
+ADMISSION_IN_FLIGHT = Gauge('scoring_admission_in_flight', 'Requests currently being scored')
+ADMISSION_WAITING = Gauge('scoring_admission_waiting', 'Requests waiting for a scoring slot')
+
+# Priority classes, best first
+PRIORITIES = ['high', 'normal', 'low']
+DEFAULT_PRIORITY = 'normal'
+
+class Rejected(Exception):
+    """
+    Raised when a request is shed; reason is 'queue_full', 'queue_timeout',
+    'deadline_exceeded' or 'preempted' (evicted from a full queue by higher priority work).
+    """
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+class Waiter:
+    def __init__(self, priority, seq):
+        self.priority = priority
+        self.rank = PRIORITIES.index(priority)
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.granted = False
+        self.rejected = None
+
+class AdmissionController:
+    """
+    Per-worker concurrency limiter: at most max_in_flight requests score at once,
+    at most max_queue wait for a slot, and none waits longer than queue_timeout
+    seconds. Anything beyond that is rejected straight away so that admitted
+    requests keep a bounded latency.
+
+    Freed slots go to the best waiting priority class first, FIFO within a
+    class. Every aging seconds spent waiting promote a request by one class,
+    so low priority work is delayed under saturation but never starved. When
+    the queue is full, a new request evicts the worst waiter if it outranks it.
+    """
+    def __init__(self, max_in_flight, max_queue, queue_timeout, aging=0.1):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.aging = aging
+        self.in_flight = 0
+        self.waiters = []
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    @property
+    def waiting(self):
+        return len(self.waiters)
+
+    def _effective_rank(self, waiter, now):
+        promotions = int((now - waiter.enqueued) / self.aging) if self.aging else 0
+        return (waiter.rank - promotions, waiter.seq)
+
+    def _reject(self, reason, priority):
+        ADMISSION_REJECTED.inc(reason=reason, priority=priority)
+        raise Rejected(reason)
+
+    def acquire(self, deadline=None, priority=DEFAULT_PRIORITY):
+        """
+        Block until a slot is free; returns the seconds spent queued or raises Rejected.
+        A request never waits past its own deadline.
+        """
+        start = time.monotonic()
+        timeout = self.queue_timeout if deadline is None else min(self.queue_timeout, max(deadline.remaining(), 0))
+        with self.lock:
+            if self.in_flight < self.max_in_flight and not self.waiters:
+                self.in_flight += 1
+                ADMISSION_IN_FLIGHT.inc()
+                ADMISSION_QUEUE_SECONDS.observe(0.0, priority=priority)
+                return 0.0
+            waiter = Waiter(priority, next(self.counter))
+            if len(self.waiters) >= self.max_queue:
+                worst = max(self.waiters, key=lambda w: self._effective_rank(w, start))
+                if waiter.rank >= self._effective_rank(worst, start)[0]:
+                    self._reject('queue_full', priority)
+                self.waiters.remove(worst)
+                ADMISSION_WAITING.dec()
+                worst.rejected = 'preempted'
+                worst.event.set()
+            self.waiters.append(waiter)
+            ADMISSION_WAITING.inc()
+
+        waiter.event.wait(timeout)
+        with self.lock:
+            if not waiter.granted:
+                if waiter.rejected is None:
+                    self.waiters.remove(waiter)
+                    ADMISSION_WAITING.dec()
+                    expired = deadline is not None and deadline.expired()
+                    waiter.rejected = 'deadline_exceeded' if expired else 'queue_timeout'
+                self._reject(waiter.rejected, priority)
+        queue_time = time.monotonic() - start
+        ADMISSION_QUEUE_SECONDS.observe(queue_time, priority=priority)
+        return queue_time
+
+    def release(self):
+        with self.lock:
+            if not self.waiters:
+                self.in_flight -= 1
+                ADMISSION_IN_FLIGHT.dec()
+                return
+            # Hand the slot straight to the best waiter; in_flight is unchanged
+            now = time.monotonic()
+            best = min(self.waiters, key=lambda w: self._effective_rank(w, now))
+            self.waiters.remove(best)
+            ADMISSION_WAITING.dec()
+            best.granted = True
+            best.event.set()
@@ -0,0 +1,151 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from scoring.metrics import Counter, Histogram
+from scoring.models import FEATURE_NAMES, N_FEATURES
+
+AUDIT_ROWS = Counter('scoring_audit_rows_total', 'Scored rows by audit outcome (written or dropped)')
+AUDIT_FLUSH_SECONDS = Histogram('scoring_audit_flush_seconds', 'Time to write one audit Parquet file')
+
+class ColumnBuffer:
+    """
+    Preallocated NumPy columns for up to capacity audit rows.
+    """
+    def __init__(self, capacity):
+        self.size = 0
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.model = np.empty(capacity, dtype=object)
+        self.model_version = np.empty(capacity, dtype=object)
+        self.features = np.empty((capacity, N_FEATURES), dtype=np.float32)
+        self.score = np.empty(capacity, dtype=np.float32)
+        self.latency_ms = np.empty(capacity, dtype=np.float32)
+
+    @property
+    def full(self):
+        return self.size == len(self.score)
+
+    def append(self, timestamp, model, model_version, features, score, latency_ms):
+        i = self.size
+        self.timestamp[i] = timestamp
+        self.model[i] = model
+        self.model_version[i] = model_version
+        self.features[i] = features
+        self.score[i] = score
+        self.latency_ms[i] = latency_ms
+        self.size += 1
+
+    def to_table(self):
+        import pyarrow as pa
+        n = self.size
+        columns = {
+            'timestamp': pa.array((self.timestamp[:n] * 1e6).astype('int64'), type=pa.timestamp('us', tz='UTC')),
+            'model': pa.array(self.model[:n], type=pa.string()).dictionary_encode(),
+            'model_version': pa.array(self.model_version[:n], type=pa.string()).dictionary_encode(),
+        }
+        for j, name in enumerate(FEATURE_NAMES):
+            columns[name] = pa.array(self.features[:n, j])
+        columns['score'] = pa.array(self.score[:n])
+        columns['latency_ms'] = pa.array(self.latency_ms[:n])
+        return pa.table(columns)
+
+class ParquetAuditSink:
+    """
+    Columnar audit trail of every scored transaction. Rows are appended to an
+    in-memory buffer; a background thread writes it to directory as a Parquet
+    file every flush_rows rows or flush_interval seconds, whichever is first.
+
+    append() never touches disk and never waits on the writer: at most
+    max_pending full buffers queue for writing, and rows beyond that are
+    dropped and counted in scoring_audit_rows_total{outcome="dropped"}.
+    """
+    def __init__(self, directory, flush_rows=8192, flush_interval=10.0, max_pending=4):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(max_pending)
+        self.buffer = ColumnBuffer(flush_rows)
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.pid = None
+        self.writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _ensure_writer(self):
+        # Started lazily so that with preload_app each forked worker gets its own thread
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.buffer = ColumnBuffer(self.flush_rows)
+            self.writer = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self.writer.start()
+
+    def _swap(self):
+        """
+        Hand the current buffer to the writer; caller holds self.lock.
+        """
+        buffer, self.buffer = self.buffer, ColumnBuffer(self.flush_rows)
+        try:
+            self.pending.put_nowait(buffer)
+        except queue.Full:
+            AUDIT_ROWS.inc(buffer.size, outcome='dropped')
+
+    def append(self, model, model_version, features, score, latency_ms, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            self._ensure_writer()
+            self.buffer.append(timestamp, model, model_version, features, score, latency_ms)
+            if self.buffer.full:
+                self._swap()
+
+    def _run(self):
+        while True:
+            try:
+                buffer = self.pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self.lock:
+                    if not self.buffer.size:
+                        continue
+                    buffer, self.buffer = self.buffer, ColumnBuffer(self.flush_rows)
+            if buffer is None:
+                return
+            self._write(buffer)
+
+    def _write(self, buffer):
+        import pyarrow.parquet as pq
+        self.sequence += 1
+        name = f"audit-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self.sequence:06d}.parquet"
+        path = os.path.join(self.directory, name)
+        # Write to a hidden file then rename, so readers never see a partial file
+        temp_path = os.path.join(self.directory, f'.{name}.tmp')
+        try:
+            with AUDIT_FLUSH_SECONDS.time():
+                pq.write_table(buffer.to_table(), temp_path, compression='zstd')
+                os.replace(temp_path, path)
+            AUDIT_ROWS.inc(buffer.size, outcome='written')
+        except Exception as e:
+            AUDIT_ROWS.inc(buffer.size, outcome='dropped')
+            logging.error(f"Error writing audit file {path}: {str(e)}")
+
+    def close(self):
+        """
+        Flush buffered rows and stop the writer (at worker exit).
+        """
+        if self.writer is None or self.pid != os.getpid():
+            return
+        with self.lock:
+            if self.buffer.size:
+                self._swap()
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+
+def read_audit(directory, columns=None):
+    """
+    Load every audit file in directory as one DataFrame, e.g. to feed retraining.
+    """
+    import pandas as pd
+    return pd.read_parquet(directory, columns=columns)
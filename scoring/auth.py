@@ -0,0 +1,40 @@
+import base64
+import json
+import logging
+import os
+
+from scoring.models import HOME_PATH
+
+PATH_AUTH = os.environ.get('SCORING_AUTH', os.path.join(HOME_PATH, 'Documents', 'config', 'auth_flask.json'))
+
+def load_users(path=PATH_AUTH):
+    try:
+        with open(path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        logging.error(f"Auth file not found at {path}")
+        raise
+    except Exception as e:
+        logging.error(f"Error loading auth file: {str(e)}")
+        raise
+
+def check_credentials(users, username, password):
+    """
+    Same rule as verify_password in the Flask apps; returns the username on success.
+    """
+    if username == users['prod']['user'] and password == users['prod']['password']:
+        return username
+    logging.warning(f"Failed auth attempt with username={username}")
+    return None
+
+def parse_basic_auth(header):
+    """
+    Split an 'Authorization: Basic ...' value into (username, password).
+    """
+    if not header or not header.startswith('Basic '):
+        return None, None
+    try:
+        username, _, password = base64.b64decode(header[len('Basic '):]).decode().partition(':')
+    except Exception:
+        return None, None
+    return username, password
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from scoring.blocklist import BloomBlocklist, build
+
+def lookup_seconds(blocklist, keys):
+    start = time.perf_counter()
+    hits = sum(key in blocklist for key in keys)
+    return (time.perf_counter() - start) / len(keys), hits
+
+def python_set_bytes(keys):
+    """
+    Approximate footprint of the same keys as a Python set of str.
+    """
+    sample = keys[:10000]
+    per_key = sum(sys.getsizeof(key) for key in sample) / len(sample)
+    return sys.getsizeof(set(sample)) / len(sample) * len(keys) + per_key * len(keys)
+
+def bench(n_keys, fp_rate, n_lookups):
+    keys = [f'card_id:{4000000000000000 + i * 7919}' for i in range(n_keys)]
+    unknown = [f'card_id:{5000000000000000 + i}' for i in range(n_lookups)]
+    print(f"{n_keys:,} keys; a Python set of them would take ~{python_set_bytes(keys) / 2 ** 20:,.0f} MB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for exact in (False, True):
+            path = os.path.join(directory, 'blocklist.bloom')
+            start = time.perf_counter()
+            build(keys, path, fp_rate, exact)
+            build_s = time.perf_counter() - start
+            blocklist = BloomBlocklist(path)
+
+            hit_s, hits = lookup_seconds(blocklist, keys[:n_lookups])
+            miss_s, false_positives = lookup_seconds(blocklist, unknown)
+            label = 'bloom+exact' if exact else 'bloom'
+            print(f"{label:<12} {blocklist.nbytes / 2 ** 20:7.1f} MB | build {build_s:5.1f} s | "
+                  f"hit {hit_s * 1e6:5.2f} us | miss {miss_s * 1e6:5.2f} us | "
+                  f"recall {hits / n_lookups:.3f} | false positives {false_positives / n_lookups:.5f}")
+            del blocklist
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Blocklist memory, build time and lookup latency.')
+    parser.add_argument('--keys', type=int, default=10_000_000)
+    parser.add_argument('--fp-rate', type=float, default=0.001)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+
+    bench(args.keys, args.fp_rate, args.lookups)
+
+# --- How to Run ---
+# python -m scoring.benchmarks.blocklist --keys 10000000 --fp-rate 0.001
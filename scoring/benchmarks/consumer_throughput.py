@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from scoring.consumer import StreamConsumer
+from scoring.models import FEATURE_NAMES, load_model, records_to_array
+from scoring.sinks import JsonLinesSink
+from scoring.sources import FileTailSource
+
+def generate_records(n, seed=42):
+    """
+    Random standard-normal rows, i.e. already scaled like the locust payloads.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, len(FEATURE_NAMES)))
+    return [dict(zip(FEATURE_NAMES, row.tolist()), transaction_id=str(i)) for i, row in enumerate(X)]
+
+def bench_per_request(model, records):
+    """
+    Same work the Flask /predict route does per request, minus HTTP and auth.
+    """
+    start = time.perf_counter()
+    for record in records:
+        body = json.dumps(record)
+        data_input = json.loads(body)
+        score = float(model.score_batch(records_to_array([data_input]))[0])
+        json.dumps({'model_name': model.name, 'score': score})
+    return len(records) / (time.perf_counter() - start)
+
+def bench_http(url, username, password, records):
+    import requests
+    session = requests.Session()
+    start = time.perf_counter()
+    for record in records:
+        payload = {name: record[name] for name in FEATURE_NAMES}
+        session.post(f'{url}/predict', json=payload, auth=(username, password)).raise_for_status()
+    return len(records) / (time.perf_counter() - start)
+
+def bench_consumer(model, records, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path = os.path.join(tmp, 'transactions.jsonl')
+        with open(source_path, 'w') as file:
+            file.write(''.join(json.dumps(record) + '\n' for record in records))
+
+        source = FileTailSource(source_path)
+        sink = JsonLinesSink(os.path.join(tmp, 'scores.jsonl'))
+        consumer = StreamConsumer(model, source, sink, batch_size=batch_size, max_wait=0)
+        start = time.perf_counter()
+        consumer.run(max_records=len(records))
+        elapsed = time.perf_counter() - start
+        source.close()
+        sink.close()
+    return len(records) / elapsed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Consumer vs per-request scoring throughput.')
+    parser.add_argument('--model', default='lgbm')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--per-request-rows', type=int, default=2000)
+    parser.add_argument('--batch-sizes', default='64,256,1024,4096')
+    parser.add_argument('--url', help='Optional Flask app URL to also measure the real /predict path')
+    parser.add_argument('--auth', default='apps/traditional_ml/flask-lgbm-app/config/auth_flask.json')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    records = generate_records(args.rows)
+
+    print(f"Model: {model.name} (version {model.version})")
+    print(f"Per-request path: {bench_per_request(model, records[:args.per_request_rows]):,.0f} rows/s")
+    if args.url:
+        with open(args.auth, 'r') as file:
+            users = json.load(file)
+        rps = bench_http(args.url, users['prod']['user'], users['prod']['password'], records[:args.per_request_rows])
+        print(f"HTTP /predict at {args.url}: {rps:,.0f} rows/s")
+    for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+        print(f"Consumer batch_size={batch_size}: {bench_consumer(model, records, batch_size):,.0f} rows/s")
+
+# --- How to Run ---
+# python -m scoring.benchmarks.consumer_throughput --model lgbm --rows 50000
+# python -m scoring.benchmarks.consumer_throughput --model cnn --url http://localhost:8502
@@ -0,0 +1,49 @@
+import argparse
+import time
+
+import numpy as np
+
+from scoring.explain import explain_batch
+from scoring.models import N_FEATURES, load_model
+
+def percentiles(latencies_s):
+    latencies_ms = np.asarray(latencies_s) * 1000
+    return np.percentile(latencies_ms, 50), np.percentile(latencies_ms, 99)
+
+def bench(model_key, n):
+    """
+    Single-row latency of the score alone vs score plus contributions, as /predict?explain=true runs it.
+    """
+    model = load_model(model_key)
+    X = np.random.default_rng(42).standard_normal((n, N_FEATURES)).astype(np.float32)
+    model.score_batch(X[:1])
+    explain_batch(model, X[:1])
+
+    score_only, with_explain = [], []
+    for row in X:
+        row = row.reshape(1, -1)
+        start = time.perf_counter()
+        model.score_batch(row)
+        score_only.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        model.score_batch(row)
+        explain_batch(model, row)
+        with_explain.append(time.perf_counter() - start)
+
+    p50, p99 = percentiles(score_only)
+    e50, e99 = percentiles(with_explain)
+    print(f"{model.name:<26} score p50 {p50:6.3f} ms p99 {p99:6.3f} ms | "
+          f"score+explain p50 {e50:6.3f} ms p99 {e99:6.3f} ms | overhead p50 {e50 - p50:+6.3f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Explain overhead on the single-row scoring path.')
+    parser.add_argument('--models', default='lgbm,xgboost,logreg')
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    for model_key in args.models.split(','):
+        bench(model_key, args.rows)
+
+# --- How to Run ---
+# python -m scoring.benchmarks.explain_latency --rows 2000
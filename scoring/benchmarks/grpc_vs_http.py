@@ -0,0 +1,90 @@
+import argparse
+import base64
+import json
+import time
+
+import grpc
+import numpy as np
+import requests
+
+from scoring.benchmarks.consumer_throughput import generate_records
+from scoring.grpc_server import scoring_pb2, scoring_pb2_grpc
+from scoring.models import FEATURE_NAMES
+
+def summarize(label, latencies_s, n_rows):
+    latencies_ms = np.asarray(latencies_s) * 1000
+    total = latencies_ms.sum() / 1000
+    print(f"{label:<28} mean {latencies_ms.mean():7.3f} ms  p50 {np.percentile(latencies_ms, 50):7.3f} ms  "
+          f"p99 {np.percentile(latencies_ms, 99):7.3f} ms  {n_rows / total:,.0f} rows/s")
+
+def bench_http(url, auth, records):
+    session = requests.Session()
+    latencies = []
+    for record in records:
+        payload = {name: record[name] for name in FEATURE_NAMES}
+        start = time.perf_counter()
+        response = session.post(f'{url}/predict', json=payload, auth=auth)
+        response.raise_for_status()
+        response.json()
+        latencies.append(time.perf_counter() - start)
+    summarize('HTTP /predict (JSON)', latencies, len(records))
+
+def bench_unary(stub, metadata, records):
+    latencies = []
+    for record in records:
+        request = scoring_pb2.Transaction(transaction_id=record['transaction_id'],
+                                          features=[record[name] for name in FEATURE_NAMES])
+        start = time.perf_counter()
+        stub.Score(request, metadata=metadata)
+        latencies.append(time.perf_counter() - start)
+    summarize('gRPC Score (unary)', latencies, len(records))
+
+def bench_batch(stub, metadata, records, batch_size):
+    latencies = []
+    for i in range(0, len(records), batch_size):
+        chunk = records[i:i + batch_size]
+        request = scoring_pb2.TransactionBatch(
+            transaction_ids=[r['transaction_id'] for r in chunk],
+            features=[r[name] for r in chunk for name in FEATURE_NAMES])
+        start = time.perf_counter()
+        stub.ScoreBatch(request, metadata=metadata)
+        latencies.append(time.perf_counter() - start)
+    summarize(f'gRPC ScoreBatch ({batch_size})', latencies, len(records))
+
+def bench_stream(stub, metadata, records):
+    requests_ = [scoring_pb2.Transaction(transaction_id=r['transaction_id'],
+                                         features=[r[name] for name in FEATURE_NAMES]) for r in records]
+    start = time.perf_counter()
+    n = sum(1 for _ in stub.ScoreStream(iter(requests_), metadata=metadata))
+    elapsed = time.perf_counter() - start
+    print(f"{'gRPC ScoreStream':<28} {elapsed / n * 1000:7.3f} ms/row amortized  {n / elapsed:,.0f} rows/s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-request overhead: gRPC vs the /predict JSON endpoint.')
+    parser.add_argument('--grpc-target', default='localhost:50051')
+    parser.add_argument('--http-url', help='Flask app URL, e.g. http://localhost:8502')
+    parser.add_argument('--auth', default='Documents/config/auth_flask.json')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+
+    with open(args.auth, 'r') as file:
+        users = json.load(file)
+    username, password = users['prod']['user'], users['prod']['password']
+    token = base64.b64encode(f'{username}:{password}'.encode()).decode()
+    metadata = [('authorization', f'Basic {token}')]
+
+    records = generate_records(args.requests)
+    if args.http_url:
+        bench_http(args.http_url, (username, password), records)
+
+    with grpc.insecure_channel(args.grpc_target) as channel:
+        stub = scoring_pb2_grpc.ScorerStub(channel)
+        bench_unary(stub, metadata, records)
+        bench_batch(stub, metadata, records, args.batch_size)
+        bench_stream(stub, metadata, records)
+
+# --- How to Run ---
+# (cd apps/traditional_ml/flask-lgbm-app && gunicorn --bind 0.0.0.0:8502 wsgi:app --workers=3) &
+# python -m scoring.grpc_server --model lgbm &
+# python -m scoring.benchmarks.grpc_vs_http --http-url http://localhost:8502
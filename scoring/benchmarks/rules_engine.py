@@ -0,0 +1,77 @@
+import argparse
+import operator
+import time
+
+import numpy as np
+
+from scoring.models import N_FEATURES
+from scoring.rules import ACTIONS, COLUMNS, RuleSet, parse_condition
+
+PYTHON_OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+                    '==': operator.eq, '!=': operator.ne}
+
+def random_rules(n_rules, rng):
+    rules = []
+    for i in range(n_rules):
+        columns = rng.choice(len(COLUMNS), size=rng.integers(1, 4), replace=False)
+        when = []
+        for column in columns:
+            if rng.random() < 0.3:
+                low = float(rng.normal())
+                when.append([COLUMNS[column], 'between', [low, low + 1.0]])
+            else:
+                when.append([COLUMNS[column], str(rng.choice(['>', '>=', '<', '<='])), float(rng.normal())])
+        rules.append({'name': f'rule_{i}', 'action': str(rng.choice(ACTIONS)), 'when': when})
+    return {'default_threshold': 0.5, 'rules': rules}
+
+def evaluate_per_row(config, X, scores):
+    """
+    The loop callers would otherwise write: each rule checked row by row in Python.
+    """
+    rules = [(rule['name'], ACTIONS.index(rule['action']),
+              [(COLUMNS.index(c), PYTHON_OPERATORS[op], v) for condition in rule['when'] for c, op, v in parse_condition(condition)])
+             for rule in config['rules']]
+    decisions = []
+    for row, score in zip(X.tolist(), scores.tolist()):
+        values = row + [score]
+        best = None
+        for name, severity, conditions in rules:
+            if all(op(values[column], value) for column, op, value in conditions):
+                if best is None or severity > best[1]:
+                    best = (name, severity)
+        decisions.append(ACTIONS[best[1]] if best else ACTIONS[2 if score >= 0.5 else 0])
+    return decisions
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vectorized rule evaluation vs a per-row Python loop.')
+    parser.add_argument('--rules', type=int, default=150)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    config = random_rules(args.rules, rng)
+    X = rng.standard_normal((args.rows, N_FEATURES)).astype(np.float32)
+    scores = rng.random(args.rows)
+
+    compile_s, rule_set = timed(lambda: RuleSet(config), 1)
+    vectorized_s, (decisions, _) = timed(lambda: rule_set.evaluate(X, scores), args.repeat)
+    single_s, _ = timed(lambda: rule_set.evaluate(X[:1], scores[:1]), args.repeat * 100)
+    loop_s, expected = timed(lambda: evaluate_per_row(config, X, scores), 1)
+    assert decisions == expected
+
+    print(f"{args.rules} rules ({rule_set.n_conditions} distinct conditions), compile {compile_s * 1000:.1f} ms")
+    print(f"vectorized: {vectorized_s * 1000:7.2f} ms per {args.rows:,}-row batch "
+          f"({vectorized_s / args.rows * 1e6:.2f} us/row), single row {single_s * 1e6:.0f} us")
+    print(f"per-row   : {loop_s * 1000:7.2f} ms per {args.rows:,}-row batch ({loop_s / args.rows * 1e6:.2f} us/row)")
+
+# --- How to Run ---
+# python -m scoring.benchmarks.rules_engine --rules 150 --rows 10000
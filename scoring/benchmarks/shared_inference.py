@@ -0,0 +1,78 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from scoring.inference_server import RemoteModel, run_inference_server
+from scoring.memory import memory_summary
+from scoring.models import N_FEATURES, load_model
+
+def worker(mode, model_key, socket_path, threads, duration, results):
+    """
+    Stand-in for one gunicorn worker: `threads` request threads scoring single rows.
+    """
+    model = RemoteModel(socket_path) if mode == 'shared' else load_model(model_key)
+    X = np.random.default_rng(os.getpid()).standard_normal((256, N_FEATURES)).astype(np.float32)
+    model.score_batch(X[:1])
+    counts = [0] * threads
+    stop_at = time.perf_counter() + duration
+
+    def loop(i):
+        while time.perf_counter() < stop_at:
+            model.score_batch(X[counts[i] % len(X)].reshape(1, -1))
+            counts[i] += 1
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((sum(counts), memory_summary()))
+
+def run(mode, model_key, workers, threads, duration):
+    results = multiprocessing.Queue()
+    server = None
+    socket_path = os.path.join(tempfile.mkdtemp(), 'inference.sock')
+    if mode == 'shared':
+        server = multiprocessing.Process(target=run_inference_server, args=(model_key, socket_path), daemon=True)
+        server.start()
+        while not os.path.exists(socket_path):
+            time.sleep(0.1)
+
+    processes = [multiprocessing.Process(target=worker, args=(mode, model_key, socket_path, threads, duration, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    server_memory = None
+    if server is not None:
+        server_memory = memory_summary(server.pid)
+        server.terminate()
+        server.join()
+
+    rows = sum(count for count, _ in reports)
+    pss = sum(memory['pss_mb'] for _, memory in reports) + (server_memory['pss_mb'] if server_memory else 0)
+    rss = sum(memory['rss_mb'] for _, memory in reports) + (server_memory['rss_mb'] if server_memory else 0)
+    print(f"{mode:<11} workers={workers} threads={threads}  {rows / duration:9,.0f} rows/s  "
+          f"PSS {pss:8,.1f} MB  RSS {rss:8,.1f} MB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-worker model copies vs one shared inference process.')
+    parser.add_argument('--model', default='stacking_dl')
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=20.0)
+    args = parser.parse_args()
+
+    run('per-worker', args.model, args.workers, args.threads, args.duration)
+    run('shared', args.model, args.workers, args.threads, args.duration)
+
+# --- How to Run ---
+# python -m scoring.benchmarks.shared_inference --model cnn --workers 3 --threads 4
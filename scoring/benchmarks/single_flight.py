@@ -0,0 +1,45 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from scoring.models import N_FEATURES, load_model
+from scoring.singleflight import SingleFlight, request_key
+
+def bench(model, X, concurrency, rounds, single_flight):
+    """
+    concurrency threads send the same row at once, rounds times, as retries and fan-out do.
+    """
+    def score():
+        if single_flight:
+            return single_flight.do(request_key(model, X), lambda: model.score_batch(X))
+        return model.score_batch(X)
+
+    latencies = []
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            results = list(pool.map(lambda _: score(), range(concurrency)))
+            latencies.append(time.perf_counter() - start)
+            assert all(np.array_equal(result, results[0]) for result in results)
+    return np.percentile(np.asarray(latencies) * 1000, 50)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latency of a burst of identical requests with and without single-flight.')
+    parser.add_argument('--model', default='stacking_dl')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    X = np.random.default_rng(42).standard_normal((1, N_FEATURES)).astype(np.float32)
+    model.score_batch(X)
+
+    independent = bench(model, X, args.concurrency, args.rounds, None)
+    coalesced = bench(model, X, args.concurrency, args.rounds, SingleFlight())
+    print(f"{model.name}: {args.concurrency} identical concurrent requests, burst p50 "
+          f"independent {independent:.1f} ms | single-flight {coalesced:.1f} ms")
+
+# --- How to Run ---
+# python -m scoring.benchmarks.single_flight --model stacking --concurrency 8
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from scoring.metrics import Counter, Histogram
+
+BLOCKLIST_HITS = Counter('scoring_blocklist_hits_total', 'Requests short-circuited by the blocklist, by entity field')
+BLOCKLIST_CHECK_SECONDS = Histogram('scoring_blocklist_check_seconds', 'Time spent checking a payload against the blocklist')
+
+# File layout: header, then the Bloom filter bits, then an optional sorted
+# uint64 array of exact key hashes. Both are memory-mapped read-only, so every
+# worker on the host shares one copy through the page cache.
+HEADER = struct.Struct('=8sQQQ')
+MAGIC = b'SCBLOOM1'
+
+def key_digest(key):
+    """
+    128-bit digest of key, read as two 64-bit hashes; the first is also the exact-set hash.
+    """
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+def entity_key(field, value):
+    return f'{field}:{value}'
+
+def bloom_size(n_keys, fp_rate):
+    """
+    Optimal (n_bits, n_hashes) for n_keys at the target false positive rate.
+    """
+    n_bits = max(64, math.ceil(-n_keys * math.log(fp_rate) / math.log(2) ** 2))
+    n_bits = (n_bits + 63) // 64 * 64
+    n_hashes = max(1, round(n_bits / n_keys * math.log(2)))
+    return n_bits, n_hashes
+
+def bit_positions(h1, h2, n_hashes, n_bits):
+    """
+    Kirsch-Mitzenmacher double hashing, position_i = h1 + i * h2 (mod n_bits), for uint64 arrays h1, h2.
+    """
+    i = np.arange(n_hashes, dtype=np.uint64)
+    return (h1[:, None] + i * h2[:, None]) % np.uint64(n_bits)
+
+class BloomBlocklist:
+    """
+    Read-only Bloom filter over entity keys ('card_id:1234'), with an optional
+    exact hash set that confirms Bloom hits so they are never false positives.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.version = f'{os.fstat(file.fileno()).st_mtime_ns:x}'
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_bits, self.n_hashes, self.n_exact = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a blocklist file")
+        n_bytes = self.n_bits // 8
+        self.bits = memoryview(self.buffer)[HEADER.size:HEADER.size + n_bytes]
+        self.exact = np.frombuffer(self.buffer, dtype='<u8', count=self.n_exact,
+                                   offset=HEADER.size + n_bytes) if self.n_exact else None
+
+    @property
+    def nbytes(self):
+        return len(self.buffer)
+
+    def __contains__(self, key):
+        # Plain int arithmetic: a handful of probes is cheaper than building NumPy
+        # arrays. Wrapping at 64 bits matches the uint64 positions used by build()
+        h1, h2 = struct.unpack('<QQ', key_digest(key))
+        bits, n_bits = self.bits, self.n_bits
+        for i in range(self.n_hashes):
+            position = ((h1 + i * h2) & 0xFFFFFFFFFFFFFFFF) % n_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        if self.exact is None:
+            return True
+        index = int(np.searchsorted(self.exact, np.uint64(h1)))
+        return index < self.n_exact and int(self.exact[index]) == h1
+
+def build(keys, path, fp_rate=0.001, exact=False):
+    """
+    Write a blocklist file for keys, atomically replacing path so running services pick it up.
+    """
+    hashes = np.frombuffer(b''.join(key_digest(key) for key in keys), dtype='<u8').reshape(-1, 2)
+    n_bits, n_hashes = bloom_size(max(len(hashes), 1), fp_rate)
+    bits = np.zeros(n_bits, dtype=bool)
+    # Chunked so the (n, n_hashes) position matrix stays small
+    for start in range(0, len(hashes), 1 << 20):
+        chunk = hashes[start:start + (1 << 20)]
+        bits[bit_positions(chunk[:, 0], chunk[:, 1], n_hashes, n_bits).ravel()] = True
+    exact_hashes = np.unique(hashes[:, 0]) if exact else np.empty(0, dtype=np.uint64)
+
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, n_bits, n_hashes, len(exact_hashes)))
+        file.write(np.packbits(bits, bitorder='little').tobytes())
+        file.write(exact_hashes.tobytes())
+    os.replace(temp_path, path)
+    logging.info(f"Blocklist written to {path}: {len(hashes)} keys, {n_bits // 8} filter bytes, "
+                 f"{n_hashes} hashes, {len(exact_hashes)} exact hashes")
+
+class Blocklist:
+    """
+    Checks the entity fields of a payload against the blocklist file at path.
+    The file is re-opened when its mtime changes (checked at most every
+    reload_interval seconds), so replacing it hot-swaps the list.
+    """
+    def __init__(self, path, fields, reload_interval=5.0):
+        self.path = path
+        self.fields = fields
+        self.reload_interval = reload_interval
+        self.filter = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        if self.filter and f'{os.stat(self.path).st_mtime_ns:x}' == self.filter.version:
+            return
+        self.filter = BloomBlocklist(self.path)
+        logging.info(f"Blocklist loaded from {self.path} (version {self.filter.version}, {self.filter.nbytes} bytes)")
+
+    def _maybe_reload(self, now):
+        if now - self.checked_at < self.reload_interval:
+            return
+        with self.lock:
+            if now - self.checked_at < self.reload_interval:
+                return
+            self.checked_at = now
+            try:
+                self.reload()
+            except Exception as e:
+                logging.error(f"Error reloading blocklist, keeping previous one: {str(e)}")
+
+    def match(self, data_input):
+        """
+        Return the first payload field whose value is blocklisted, else None.
+        """
+        self._maybe_reload(time.monotonic())
+        current = self.filter
+        with BLOCKLIST_CHECK_SECONDS.time():
+            for field in self.fields:
+                value = data_input.get(field)
+                if value is not None and entity_key(field, value) in current:
+                    BLOCKLIST_HITS.inc(field=field)
+                    return field
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a blocklist file from entity keys, one field:value per line.')
+    parser.add_argument('input', help="Text file of keys such as 'card_id:4539123412341234'")
+    parser.add_argument('output')
+    parser.add_argument('--fp-rate', type=float, default=0.001)
+    parser.add_argument('--exact', action='store_true', help='Also store exact key hashes to rule out false positives')
+    args = parser.parse_args()
+
+    logging.basicConfig(level='INFO', format='%(asctime)s %(message)s')
+    with open(args.input, 'r') as file:
+        build((line.strip() for line in file if line.strip()), args.output, args.fp_rate, args.exact)
+
+# --- How to Run ---
+# python -m scoring.blocklist compromised_keys.txt scoring/config/blocklist.bloom --exact
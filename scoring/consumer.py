@@ -0,0 +1,141 @@
+import argparse
+import logging
+import multiprocessing
+import signal
+import time
+
+from scoring.models import load_model, records_to_array
+from scoring.rules import RulesEngine
+from scoring.sinks import make_sink
+from scoring.sources import make_source
+
+class StreamConsumer:
+    """
+    Pulls transactions from a source in batches, scores each batch with one
+    vectorized model call, writes the scores to a sink and only then commits
+    the batch offsets, so a crash replays rather than drops transactions.
+    With a RulesEngine, each result also carries the rules decision for the batch.
+    """
+    def __init__(self, model, source, sink, batch_size=1024, max_wait=0.05, rules=None):
+        self.model = model
+        self.rules = rules
+        self.source = source
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.running = True
+        self.scored = 0
+        self.failed = 0
+
+    def build_results(self, records, X, scores):
+        results = []
+        if self.rules:
+            decisions, rule_names = self.rules.evaluate(X, scores, self.model.threshold)
+        for i, (record, score) in enumerate(zip(records, scores)):
+            result = {
+                'transaction_id': record.get('transaction_id'),
+                'model_name': self.model.name,
+                'model_version': self.model.version,
+                'score': float(score),
+            }
+            if self.model.threshold is not None:
+                result['prediction'] = int(score >= self.model.threshold)
+                result['threshold'] = float(self.model.threshold)
+            if self.rules:
+                result['decision'], result['decision_rule'] = decisions[i], rule_names[i]
+            results.append(result)
+        return results
+
+    def process_batch(self, batch):
+        offsets = [offset for offset, _ in batch]
+        records = [record for _, record in batch]
+        try:
+            X = records_to_array(records)
+            results = self.build_results(records, X, self.model.score_batch(X))
+        except Exception as e:
+            # Fall back to per-record scoring so one bad record doesn't block the batch
+            logging.error(f"Error scoring batch of {len(records)}: {str(e)}")
+            results = []
+            for record in records:
+                try:
+                    X = records_to_array([record])
+                    results.extend(self.build_results([record], X, self.model.score_batch(X)))
+                except Exception as e:
+                    self.failed += 1
+                    results.append({'transaction_id': record.get('transaction_id'), 'error': str(e)})
+        self.sink.write(results)
+        self.source.commit(offsets)
+        self.scored += len(records)
+
+    def run(self, max_records=None):
+        while self.running and (max_records is None or self.scored < max_records):
+            batch = self.source.read(self.batch_size, self.max_wait)
+            if batch:
+                self.process_batch(batch)
+
+    def stop(self, *args):
+        self.running = False
+
+def run_partition(model_key, source_spec, sink_spec, partition, batch_size, max_wait, stream, output_stream, group,
+                  rules_path=None, consumer_name='consumer-{partition}'):
+    model = load_model(model_key)
+    source = make_source(source_spec, partition, stream, group, consumer_name)
+    sink = make_sink(sink_spec, partition, output_stream)
+    rules = RulesEngine(rules_path) if rules_path else None
+    consumer = StreamConsumer(model, source, sink, batch_size, max_wait, rules)
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+
+    start = time.perf_counter()
+    try:
+        consumer.run()
+    finally:
+        elapsed = time.perf_counter() - start
+        source.close()
+        sink.close()
+        logging.info(f"Partition {partition}: scored {consumer.scored} transactions "
+                     f"({consumer.failed} failed) in {elapsed:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Score transactions from a stream in batches.')
+    parser.add_argument('--model', default='lgbm', help='Key in scoring.models.MODEL_SPECS')
+    parser.add_argument('--source', required=True,
+                        help="file:PATH, unix:PATH, redis://HOST:PORT/DB or local:DBPATH; may contain {partition}")
+    parser.add_argument('--sink', default='jsonl:-', help="jsonl:PATH, redis://HOST:PORT/DB or local:DBPATH")
+    parser.add_argument('--stream', default='transactions:{partition}', help='Input stream key for redis/local sources')
+    parser.add_argument('--output-stream', default='scores:{partition}', help='Output stream key for redis/local sinks')
+    parser.add_argument('--group', default='scoring', help='Consumer group for redis/local sources')
+    parser.add_argument('--consumer', default='consumer-{partition}',
+                        help='Consumer name in the group; keep it stable across restarts so unacked entries are replayed')
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--max-wait', type=float, default=0.05, help='Seconds to wait for the first record of a batch')
+    parser.add_argument('--partitions', type=int, default=1, help='One consumer process per partition')
+    parser.add_argument('--rules', help='JSON rules file (see scoring.rules) adding a decision to each result')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+
+    partition_args = [(args.model, args.source, args.sink, p, args.batch_size, args.max_wait,
+                       args.stream, args.output_stream, args.group, args.rules, args.consumer) for p in range(args.partitions)]
+    if args.partitions == 1:
+        run_partition(*partition_args[0])
+        return
+
+    processes = [multiprocessing.Process(target=run_partition, args=a, name=f'partition-{a[3]}')
+                 for a in partition_args]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+if __name__ == '__main__':
+    main()
+
+# --- How to Run ---
+# python -m scoring.consumer --model lgbm --source 'file:/data/tx-{partition}.jsonl' \
+#     --sink 'jsonl:/data/scores-{partition}.jsonl' --partitions 4
+# python -m scoring.consumer --model stacking --source local:/tmp/stream.db --sink local:/tmp/stream.db
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from scoring.metrics import Counter
+
+# Relative budget in milliseconds, measured from when the request reached the service
+TIMEOUT_HEADER = 'X-Request-Timeout-Ms'
+# Absolute deadline as unix epoch seconds (float), for callers that share a clock
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+DEADLINE_EXCEEDED = Counter('scoring_deadline_exceeded_total', 'Requests abandoned after their deadline, by stage')
+DEADLINE_SKIPPED_CALLS = Counter('scoring_deadline_skipped_model_calls_total',
+                                 'Model calls skipped because the deadline had passed')
+DEADLINE_SAVED_SECONDS = Counter('scoring_deadline_saved_seconds_total',
+                                 'Estimated model time saved by skipping expired work')
+
+# EWMA of each model step's duration, used to estimate the work a skip saved
+STEP_SECONDS = {}
+STEP_LOCK = threading.Lock()
+EWMA_ALPHA = 0.1
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage):
+        super().__init__(f'deadline exceeded at {stage}')
+        self.stage = stage
+
+class Deadline:
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_headers(cls, headers, arrival=None):
+        """
+        Build a Deadline from the request headers, or return None when the caller sent none.
+        """
+        arrival = time.monotonic() if arrival is None else arrival
+        if headers.get(TIMEOUT_HEADER):
+            return cls(arrival + float(headers[TIMEOUT_HEADER]) / 1000.0)
+        if headers.get(DEADLINE_HEADER):
+            return cls(arrival + float(headers[DEADLINE_HEADER]) - time.time())
+        return None
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+def record_step(name, seconds):
+    with STEP_LOCK:
+        previous = STEP_SECONDS.get(name)
+        STEP_SECONDS[name] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+
+def record_skip(stage, skipped_steps):
+    """
+    Count a request abandoned at stage and the model steps it did not run.
+    """
+    DEADLINE_EXCEEDED.inc(stage=stage)
+    DEADLINE_SKIPPED_CALLS.inc(len(skipped_steps))
+    DEADLINE_SAVED_SECONDS.inc(sum(STEP_SECONDS.get(step, 0.0) for step in skipped_steps))
+
+def check(deadline, stage, skipped_steps):
+    """
+    Raise DeadlineExceeded before running skipped_steps (model step names) if the deadline has passed.
+    """
+    if deadline is None or not deadline.expired():
+        return
+    record_skip(stage, skipped_steps)
+    raise DeadlineExceeded(stage)
+
+def run_step(name, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    record_step(name, time.perf_counter() - start)
+    return result
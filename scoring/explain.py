@@ -0,0 +1,51 @@
+import numpy as np
+
+from scoring.metrics import Histogram
+from scoring.models import FEATURE_NAMES, SklearnModel
+
+EXPLAIN_SECONDS = Histogram('scoring_explain_seconds', 'Time spent computing per-feature contributions')
+
+# Per-feature contributions in log-odds units; they plus 'bias' sum to the raw
+# margin, so sigmoid(sum) is the returned score. Uses the libraries' native
+# TreeSHAP (LightGBM pred_contrib, XGBoost pred_contribs) and w_i * x_i for
+# LogisticRegression, all on the same single-row input as the score.
+
+def _lightgbm(estimator, X):
+    contributions = estimator.predict(X, pred_contrib=True)
+    return contributions[:, :-1], contributions[:, -1]
+
+def _xgboost(estimator, X):
+    import xgboost as xgb
+    contributions = estimator.get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+    return contributions[:, :-1], contributions[:, -1]
+
+def _logistic_regression(estimator, X):
+    contributions = X * estimator.coef_[0]
+    return contributions, np.full(len(X), estimator.intercept_[0])
+
+EXPLAINERS = {
+    'LGBMClassifier': _lightgbm,
+    'XGBClassifier': _xgboost,
+    'LogisticRegression': _logistic_regression,
+}
+
+def supports_explain(model):
+    return isinstance(model, SklearnModel) and type(model.model).__name__ in EXPLAINERS
+
+def explain_batch(model, X):
+    """
+    Returns (contributions (n, 30), bias (n,)) for a LightGBM, XGBoost or LogisticRegression model.
+    """
+    if not supports_explain(model):
+        raise ValueError(f"Explanations are not available for {model.name}")
+    with EXPLAIN_SECONDS.time():
+        return EXPLAINERS[type(model.model).__name__](model.model, X)
+
+def explanation_dict(contributions, bias, top_k=None):
+    order = np.argsort(-np.abs(contributions))
+    if top_k:
+        order = order[:top_k]
+    return {
+        'bias': float(bias),
+        'contributions': {FEATURE_NAMES[i]: float(contributions[i]) for i in order},
+    }
@@ -0,0 +1,160 @@
+import argparse
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent import futures
+
+import grpc
+import numpy as np
+
+from scoring.auth import check_credentials, load_users, parse_basic_auth
+from scoring.deadline import Deadline, DeadlineExceeded
+from scoring.models import N_FEATURES, load_model
+
+PROTO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'protos')
+
+# Compile scoring.proto at import time (needs grpcio-tools) instead of checking in generated stubs.
+# protos_and_services() resolves the file against sys.path, so the protos folder goes on it,
+# which makes the server independent of the working directory.
+if PROTO_DIR not in sys.path:
+    sys.path.append(PROTO_DIR)
+scoring_pb2, scoring_pb2_grpc = grpc.protos_and_services('scoring.proto')
+
+class ScorerServicer(scoring_pb2_grpc.ScorerServicer):
+    """
+    gRPC front for one scoring model. Clients authenticate with the same Basic
+    credentials as /predict, sent as 'authorization' call metadata.
+    """
+    def __init__(self, model, users, stream_batch_size=256):
+        self.model = model
+        self.users = users
+        self.stream_batch_size = stream_batch_size
+
+    def _authenticate(self, context):
+        metadata = dict(context.invocation_metadata())
+        username, password = parse_basic_auth(metadata.get('authorization'))
+        if check_credentials(self.users, username, password) is None:
+            context.abort(grpc.StatusCode.UNAUTHENTICATED, 'Unauthorized Access')
+
+    @staticmethod
+    def _deadline(context):
+        # gRPC carries the client deadline natively
+        remaining = context.time_remaining()
+        return None if remaining is None else Deadline(time.monotonic() + remaining)
+
+    def _score_response(self, transaction_id, score):
+        response = scoring_pb2.ScoreResponse(
+            transaction_id=transaction_id,
+            model_name=self.model.name,
+            model_version=self.model.version,
+            score=float(score))
+        if self.model.threshold is not None:
+            response.has_threshold = True
+            response.threshold = float(self.model.threshold)
+            response.prediction = int(score >= self.model.threshold)
+        return response
+
+    def Score(self, request, context):
+        self._authenticate(context)
+        if len(request.features) != N_FEATURES:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'Expected {N_FEATURES} features, got {len(request.features)}')
+        X = np.asarray(request.features, dtype=np.float32).reshape(1, -1)
+        try:
+            score = self.model.score_batch(X, self._deadline(context))[0]
+        except DeadlineExceeded as e:
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+        return self._score_response(request.transaction_id, score)
+
+    def ScoreBatch(self, request, context):
+        self._authenticate(context)
+        if len(request.features) % N_FEATURES:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, f'Feature count is not a multiple of {N_FEATURES}')
+        X = np.asarray(request.features, dtype=np.float32).reshape(-1, N_FEATURES)
+        # IDs are optional, but when sent there must be one per row, in row order
+        if request.transaction_ids and len(request.transaction_ids) != len(X):
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                          f'Got {len(request.transaction_ids)} transaction_ids for {len(X)} rows')
+        try:
+            scores = self.model.score_batch(X, self._deadline(context))
+        except DeadlineExceeded as e:
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+        response = scoring_pb2.ScoreBatchResponse(
+            model_name=self.model.name,
+            model_version=self.model.version,
+            scores=scores.tolist(),
+            transaction_ids=request.transaction_ids)
+        if self.model.threshold is not None:
+            response.has_threshold = True
+            response.threshold = float(self.model.threshold)
+            response.predictions.extend((scores >= self.model.threshold).astype(int).tolist())
+        return response
+
+    def ScoreStream(self, request_iterator, context):
+        """
+        Requests are read on a helper thread; whatever has arrived since the
+        last model call is scored together, so a busy stream batches itself.
+        """
+        self._authenticate(context)
+        pending = queue.Queue()
+        done = object()
+
+        def read_requests():
+            try:
+                for request in request_iterator:
+                    pending.put(request)
+            finally:
+                pending.put(done)
+
+        threading.Thread(target=read_requests, daemon=True).start()
+        finished = False
+        while not finished:
+            batch = [pending.get()]
+            while len(batch) < self.stream_batch_size:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is done:
+                batch.pop()
+                finished = True
+            valid = [r for r in batch if len(r.features) == N_FEATURES]
+            for r in batch:
+                if len(r.features) != N_FEATURES:
+                    yield scoring_pb2.ScoreResponse(transaction_id=r.transaction_id,
+                                                    error=f'Expected {N_FEATURES} features, got {len(r.features)}')
+            if not valid:
+                continue
+            X = np.asarray([r.features for r in valid], dtype=np.float32)
+            try:
+                # The call's deadline, as it stands when this batch of messages is scored
+                scores = self.model.score_batch(X, self._deadline(context))
+            except DeadlineExceeded as e:
+                context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e))
+            for request, score in zip(valid, scores):
+                yield self._score_response(request.transaction_id, score)
+
+def serve(model_key, port=50051, max_workers=8):
+    model = load_model(model_key)
+    users = load_users()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers))
+    scoring_pb2_grpc.add_ScorerServicer_to_server(ScorerServicer(model, users), server)
+    server.add_insecure_port(f'[::]:{port}')
+    server.start()
+    logging.info(f"gRPC scorer for {model.name} listening on port {port}")
+    server.wait_for_termination()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='gRPC scoring service.')
+    parser.add_argument('--model', default='lgbm', help='Key in scoring.models.MODEL_SPECS')
+    parser.add_argument('--port', type=int, default=50051)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    serve(args.model, args.port, args.workers)
+
+# --- How to Run ---
+# python -m scoring.grpc_server --model lgbm --port 50051
@@ -0,0 +1,94 @@
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+# gunicorn --config scoring/gunicorn.conf.py scoring.service:app
+bind = os.environ.get('SCORING_BIND', '0.0.0.0:8502')
+workers = int(os.environ.get('SCORING_WORKERS', '3'))
+timeout = 120
+
+# Threaded workers so that admission control sees the queue in-process
+# instead of requests piling up unbounded in the listen backlog.
+worker_class = 'gthread'
+threads = int(os.environ.get('SCORING_THREADS', '4'))
+backlog = int(os.environ.get('SCORING_BACKLOG', '64'))
+
+# Each worker's metrics are merged into every /metrics scrape through snapshot
+# files in one directory per master (see scoring/metrics.py). Set before the
+# app is imported so preloaded modules, workers and the inference process see it.
+metrics_dir_created = 'SCORING_METRICS_DIR' not in os.environ
+if metrics_dir_created:
+    os.environ['SCORING_METRICS_DIR'] = tempfile.mkdtemp(
+        prefix='scoring-metrics-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+os.makedirs(os.environ['SCORING_METRICS_DIR'], exist_ok=True)
+
+# SCORING_PRELOAD=1 loads the models once in the master and shares them with
+# the workers copy-on-write. The collector stays off in the master so freed
+# objects don't leave holes in shared pages, and everything loaded is frozen
+# out of the collector's reach right before the workers fork. Models behind
+# SCORING_INFERENCE_SOCKET / SCORING_RESCORE_SOCKET are not warmed: each
+# worker opens its own connection to the inference process after fork.
+preload_app = os.environ.get('SCORING_PRELOAD') == '1'
+if preload_app:
+    if os.environ.get('SCORING_INFERENCE_PROCESS') == '1':
+        raise RuntimeError("SCORING_PRELOAD and SCORING_INFERENCE_PROCESS are alternatives; set only one")
+    # Every model the service loads in-process would be loaded here, in the master, before fork
+    from scoring.models import uses_tensorflow
+    in_process = [os.environ.get('SCORING_FALLBACK_MODEL')]
+    if not os.environ.get('SCORING_INFERENCE_SOCKET'):
+        in_process.append(os.environ.get('SCORING_MODEL', 'lgbm'))
+    if not os.environ.get('SCORING_RESCORE_SOCKET'):
+        in_process.append(os.environ.get('SCORING_RESCORE_MODEL'))
+    tensorflow_keys = [key for key in in_process if key and uses_tensorflow(key)]
+    if tensorflow_keys:
+        raise RuntimeError(f"SCORING_PRELOAD cannot be used with TensorFlow models ({', '.join(tensorflow_keys)}), "
+                           "which are not fork-safe; use SCORING_INFERENCE_PROCESS instead")
+    gc.disable()
+
+# SCORING_INFERENCE_PROCESS=1 starts one inference process that owns the model;
+# workers then pass feature rows to it over shared memory instead of each
+# loading their own copy (see scoring/inference_server.py).
+inference_process = None
+
+def on_starting(server):
+    global inference_process
+    if os.environ.get('SCORING_INFERENCE_PROCESS') != '1':
+        return
+    from scoring.inference_server import run_inference_server
+    socket_path = os.environ.setdefault('SCORING_INFERENCE_SOCKET', '/tmp/scoring-inference.sock')
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    inference_process = multiprocessing.Process(
+        target=run_inference_server,
+        args=(os.environ.get('SCORING_MODEL', 'lgbm'), socket_path,
+              int(os.environ.get('SCORING_INFERENCE_SLOTS', '1024')),
+              int(os.environ.get('SCORING_INFERENCE_SLOTS_PER_WORKER', '64'))),
+        name='scoring-inference', daemon=True)
+    inference_process.start()
+    # Workers connect on import, so wait until the model is loaded and the socket is up
+    while not os.path.exists(socket_path):
+        if not inference_process.is_alive():
+            raise RuntimeError("Inference process exited during startup")
+        time.sleep(0.1)
+
+def when_ready(server):
+    if preload_app:
+        from scoring import service
+        from scoring.preload import freeze_for_fork
+        freeze_for_fork(service.model, service.fallback_model)
+
+def post_fork(server, worker):
+    from scoring.metrics import start_publisher
+    start_publisher()
+    if preload_app:
+        gc.enable()
+
+def on_exit(server):
+    if inference_process is not None:
+        inference_process.terminate()
+        inference_process.join()
+    if metrics_dir_created:
+        shutil.rmtree(os.environ['SCORING_METRICS_DIR'], ignore_errors=True)
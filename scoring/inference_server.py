@@ -0,0 +1,361 @@
+import argparse
+import json
+import logging
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from scoring.deadline import DeadlineExceeded, check, record_skip
+from scoring.metrics import Histogram, start_publisher
+from scoring.models import N_FEATURES, load_model
+
+# One inference process per host owns the models. HTTP workers write feature
+# rows into slots of a shared-memory buffer and send the slot ids over a Unix
+# socket; the server scores every slot id that has arrived from any worker in
+# one batch, writes the scores back into the same slots and returns the ids.
+
+SLOT = struct.Struct('=I')
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+INFERENCE_BATCH_SIZE = Histogram('scoring_inference_batch_size', 'Rows per shared inference model call',
+                                 buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+def attach_buffers(shm, n_slots):
+    """
+    Numpy views over the shared segment: features (n, 30) float32, scores (n,) float64, status (n,) uint8.
+    """
+    features = np.ndarray((n_slots, N_FEATURES), dtype=np.float32, buffer=shm.buf, offset=0)
+    offset = features.nbytes
+    scores = np.ndarray((n_slots,), dtype=np.float64, buffer=shm.buf, offset=offset)
+    offset += scores.nbytes
+    status = np.ndarray((n_slots,), dtype=np.uint8, buffer=shm.buf, offset=offset)
+    return features, scores, status
+
+def buffer_size(n_slots):
+    return n_slots * (N_FEATURES * 4 + 8 + 1)
+
+class InferenceServer:
+    def __init__(self, model, socket_path, n_slots=1024, slots_per_client=64, max_batch=512):
+        self.model = model
+        self.socket_path = socket_path
+        self.n_slots = n_slots
+        self.slots_per_client = slots_per_client
+        self.max_batch = max_batch
+        self.shm = shared_memory.SharedMemory(create=True, size=buffer_size(n_slots))
+        self.features, self.scores, self.status = attach_buffers(self.shm, n_slots)
+        self.free_ranges = list(range(0, n_slots - slots_per_client + 1, slots_per_client))
+        self.clients = {}
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(socket_path)
+        self.server.listen()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+
+    def _accept(self):
+        conn, _ = self.server.accept()
+        if not self.free_ranges:
+            logging.error("No free inference slots for new client; raise --slots")
+            conn.close()
+            return
+        first_slot = self.free_ranges.pop(0)
+        handshake = {
+            'shm_name': self.shm.name,
+            'n_slots': self.n_slots,
+            'first_slot': first_slot,
+            'slot_count': self.slots_per_client,
+            'model_key': self.model.key,
+            'model_name': self.model.name,
+            'model_version': self.model.version,
+            'threshold': None if self.model.threshold is None else float(self.model.threshold),
+            'step_names': self.model.step_names(),
+        }
+        try:
+            conn.sendall(json.dumps(handshake).encode() + b'\n')
+        except OSError as e:
+            logging.warning(f"Inference client went away during handshake: {e}")
+            self.free_ranges.append(first_slot)
+            conn.close()
+            return
+        conn.setblocking(False)
+        self.clients[conn] = [first_slot, b'']
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def _drop(self, conn):
+        # A conn can be dropped while reading and again while replying; only the first counts
+        if conn not in self.clients:
+            return
+        self.selector.unregister(conn)
+        first_slot, _ = self.clients.pop(conn)
+        self.free_ranges.append(first_slot)
+        conn.close()
+
+    def _collect(self, events):
+        requests = []
+        for key, _ in events:
+            if key.fileobj is self.server:
+                self._accept()
+                continue
+            conn = key.fileobj
+            try:
+                data = conn.recv(SLOT.size * self.max_batch)
+            except OSError:
+                data = b''
+            if not data:
+                self._drop(conn)
+                continue
+            state = self.clients[conn]
+            data = state[1] + data
+            usable = len(data) - len(data) % SLOT.size
+            state[1] = data[usable:]
+            for (slot,) in SLOT.iter_unpack(data[:usable]):
+                # A client may only use its own range, or it would overwrite another worker's rows
+                if not state[0] <= slot < state[0] + self.slots_per_client:
+                    logging.warning(f"Ignoring slot {slot} outside the client's range "
+                                    f"[{state[0]}, {state[0] + self.slots_per_client})")
+                    continue
+                requests.append((conn, slot))
+        return requests
+
+    def _score(self, requests):
+        # Rows from workers that disconnected since they were read: their slot
+        # range may already belong to a new client, and nobody waits for the reply
+        requests = [(conn, slot) for conn, slot in requests if conn in self.clients]
+        if not requests:
+            return
+        slots = np.fromiter((slot for _, slot in requests), dtype=np.int64, count=len(requests))
+        INFERENCE_BATCH_SIZE.observe(len(slots))
+        try:
+            self.scores[slots] = self.model.score_batch(self.features[slots])
+            self.status[slots] = STATUS_OK
+        except Exception as e:
+            logging.error(f"Error during shared inference of {len(slots)} rows: {str(e)}")
+            self.status[slots] = STATUS_ERROR
+
+        replies = {}
+        for conn, slot in requests:
+            replies.setdefault(conn, []).append(slot)
+        for conn, conn_slots in replies.items():
+            # One dead worker must not take shared inference down for the others
+            try:
+                conn.setblocking(True)
+                conn.sendall(struct.pack(f'={len(conn_slots)}I', *conn_slots))
+                conn.setblocking(False)
+            except OSError as e:
+                logging.warning(f"Dropping inference client that went away mid-batch: {e}")
+                self._drop(conn)
+
+    def serve_forever(self):
+        logging.info(f"Inference server for {self.model.name} on {self.socket_path} "
+                     f"({self.n_slots} slots, shm {self.shm.name})")
+        try:
+            while True:
+                requests = self._collect(self.selector.select())
+                # Drain whatever else is already pending so all workers share the batch
+                while requests and len(requests) < self.max_batch:
+                    more = self._collect(self.selector.select(0))
+                    if not more:
+                        break
+                    requests.extend(more)
+                for i in range(0, len(requests), self.max_batch):
+                    self._score(requests[i:i + self.max_batch])
+        finally:
+            self.close()
+
+    def close(self):
+        self.selector.close()
+        self.server.close()
+        self.shm.close()
+        self.shm.unlink()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+class Connection:
+    """
+    One process's connection to the inference server: its slot range in the
+    shared buffer, and a thread that marks slots done as their replies arrive.
+    """
+    def __init__(self, socket_path):
+        self.conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.conn.connect(socket_path)
+        self.handshake = json.loads(self.conn.makefile('rb').readline())
+        self.shm = shared_memory.SharedMemory(name=self.handshake['shm_name'])
+        # The server owns the segment; stop this process's tracker from unlinking it on exit
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        self.features, self.scores, self.status = attach_buffers(self.shm, self.handshake['n_slots'])
+        first_slot = self.handshake['first_slot']
+        self.free_slots = list(range(first_slot, first_slot + self.handshake['slot_count']))
+        self.slot_lock = threading.Condition()
+        self.send_lock = threading.Lock()
+        self.done = {slot: threading.Event() for slot in self.free_slots}
+        # Slots whose caller stopped waiting; they are reused only once their late reply arrives
+        self.abandoned = set()
+        self.closed = False
+        threading.Thread(target=self._read_replies, daemon=True).start()
+
+    def _read_replies(self):
+        buffer = b''
+        while True:
+            try:
+                data = self.conn.recv(SLOT.size * 256)
+            except OSError:
+                data = b''
+            if not data:
+                if not self.closed:
+                    logging.error("Inference server closed the connection")
+                self.closed = True
+                for event in self.done.values():
+                    event.set()
+                with self.slot_lock:
+                    self.slot_lock.notify_all()
+                return
+            buffer += data
+            usable = len(buffer) - len(buffer) % SLOT.size
+            with self.slot_lock:
+                for (slot,) in SLOT.iter_unpack(buffer[:usable]):
+                    if slot in self.abandoned:
+                        self.abandoned.discard(slot)
+                        self.free_slots.append(slot)
+                        self.slot_lock.notify_all()
+                    else:
+                        self.done[slot].set()
+            buffer = buffer[usable:]
+
+    def close(self):
+        # The reply thread sees the socket close and wakes every waiting caller
+        self.closed = True
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+    def score(self, X, timeout):
+        """
+        Scores for the rows of X; raises TimeoutError when no reply comes within timeout seconds.
+        """
+        expires_at = time.monotonic() + timeout
+        with self.slot_lock:
+            if not self.slot_lock.wait_for(lambda: self.closed or len(self.free_slots) >= len(X), timeout):
+                raise TimeoutError("no free inference slots")
+            if self.closed:
+                raise RuntimeError("Inference server is not available")
+            slots = [self.free_slots.pop() for _ in range(len(X))]
+        try:
+            for slot, row in zip(slots, X):
+                self.done[slot].clear()
+                self.features[slot] = row
+            try:
+                with self.send_lock:
+                    self.conn.sendall(struct.pack(f'={len(slots)}I', *slots))
+            except OSError as e:
+                self.close()
+                raise RuntimeError(f"Inference server is not available: {e}")
+            for slot in slots:
+                if not self.done[slot].wait(max(expires_at - time.monotonic(), 0)):
+                    raise TimeoutError("no reply from the inference server")
+            if self.closed or self.status[slots].any():
+                raise RuntimeError("Shared inference failed, see inference server log")
+            return self.scores[slots].copy()
+        finally:
+            with self.slot_lock:
+                for slot in slots:
+                    if self.closed or self.done[slot].is_set():
+                        self.free_slots.append(slot)
+                    else:
+                        self.abandoned.add(slot)
+                self.slot_lock.notify_all()
+
+class RemoteModel:
+    """
+    Client side used inside each HTTP worker. Has the same attributes and
+    score_batch() as the models in scoring.models, so the service can use it
+    in place of a locally loaded model.
+
+    The constructor only reads the model's attributes from a handshake; each
+    process opens its own Connection on its first score_batch(), so an
+    instance built in the gunicorn master before fork holds no live
+    connection for the workers to share. A connection the server closed is
+    replaced on the next call. score_batch() waits for the server at most
+    timeout seconds, or until the request's deadline.
+    """
+    def __init__(self, socket_path, timeout=10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_lock = threading.Lock()
+        self.pid = None
+        self.connection = None
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(socket_path)
+        self._set_model(json.loads(conn.makefile('rb').readline()))
+        conn.close()
+
+    def _set_model(self, handshake):
+        self.key = handshake['model_key']
+        self.name = handshake['model_name']
+        self.version = handshake['model_version']
+        self.threshold = handshake['threshold']
+        self._step_names = handshake['step_names']
+        self.max_batch = handshake['slot_count']
+
+    def _connected(self):
+        with self.connect_lock:
+            if self.pid == os.getpid() and not self.connection.closed:
+                return self.connection
+            if self.pid == os.getpid():
+                logging.warning("Reconnecting to the inference server")
+                self.connection.close()
+            try:
+                connection = Connection(self.socket_path)
+            except OSError as e:
+                raise RuntimeError(f"Inference server is not available: {e}")
+            self._set_model(connection.handshake)
+            self.connection, self.pid = connection, os.getpid()
+            return connection
+
+    def step_names(self):
+        return self._step_names
+
+    def score_batch(self, X, deadline=None):
+        check(deadline, 'model', self._step_names)
+        X = np.asarray(X, dtype=np.float32).reshape(-1, N_FEATURES)
+        if len(X) > self.max_batch:
+            raise ValueError(f"Batch of {len(X)} rows exceeds the {self.max_batch} slots of this worker")
+        timeout = self.timeout if deadline is None else min(self.timeout, deadline.remaining())
+        try:
+            return self._connected().score(X, max(timeout, 0))
+        except TimeoutError as e:
+            if deadline is not None and deadline.expired():
+                record_skip('model', [])
+                raise DeadlineExceeded('model')
+            raise RuntimeError(f"Inference server did not answer within {timeout:.3g}s: {e}")
+
+def run_inference_server(model_key, socket_path, n_slots=1024, slots_per_client=64, max_batch=512):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    # Its batch sizes reach /metrics through the workers' shared metrics directory
+    start_publisher()
+    model = load_model(model_key)
+    InferenceServer(model, socket_path, n_slots, slots_per_client, max_batch).serve_forever()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shared per-host inference process.')
+    parser.add_argument('--model', default='stacking_dl', help='Key in scoring.models.MODEL_SPECS')
+    parser.add_argument('--socket', default='/tmp/scoring-inference.sock')
+    parser.add_argument('--slots', type=int, default=1024, help='Total shared-memory slots')
+    parser.add_argument('--slots-per-client', type=int, default=64, help='Slots reserved per HTTP worker')
+    parser.add_argument('--max-batch', type=int, default=512)
+    args = parser.parse_args()
+    run_inference_server(args.model, args.socket, args.slots, args.slots_per_client, args.max_batch)
+
+# --- How to Run ---
+# python -m scoring.inference_server --model stacking_dl --socket /tmp/scoring-inference.sock &
+# SCORING_INFERENCE_SOCKET=/tmp/scoring-inference.sock gunicorn --config scoring/gunicorn.conf.py scoring.service:app
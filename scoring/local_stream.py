@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import time
+
+class LocalStreamClient:
+    """
+    Local stand-in for the subset of the redis-py stream API the consumer uses
+    (xadd, xgroup_create, xreadgroup, xack). Entries live in a SQLite file so
+    several consumer processes on one host can share it.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                stream TEXT NOT NULL, seq INTEGER NOT NULL, fields TEXT NOT NULL,
+                PRIMARY KEY (stream, seq));
+            CREATE TABLE IF NOT EXISTS groups (
+                stream TEXT NOT NULL, groupname TEXT NOT NULL, last_delivered INTEGER NOT NULL,
+                PRIMARY KEY (stream, groupname));
+            CREATE TABLE IF NOT EXISTS pending (
+                stream TEXT NOT NULL, groupname TEXT NOT NULL, seq INTEGER NOT NULL, consumer TEXT NOT NULL,
+                PRIMARY KEY (stream, groupname, seq));
+        """)
+
+    @staticmethod
+    def _entry_id(seq):
+        return f'{seq}-0'
+
+    @staticmethod
+    def _seq(entry_id):
+        if isinstance(entry_id, bytes):
+            entry_id = entry_id.decode()
+        return int(str(entry_id).split('-')[0])
+
+    def xadd(self, name, fields):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute('SELECT MAX(seq) FROM entries WHERE stream = ?', (name,)).fetchone()
+            seq = (row[0] or 0) + 1
+            self.conn.execute('INSERT INTO entries VALUES (?, ?, ?)', (name, seq, json.dumps(fields)))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return self._entry_id(seq)
+
+    def xgroup_create(self, name, groupname, id='0', mkstream=True):
+        seq = 0 if id in ('0', b'0') else self._seq(id)
+        self.conn.execute('INSERT OR IGNORE INTO groups VALUES (?, ?, ?)', (name, groupname, seq))
+        return True
+
+    def xreadgroup(self, groupname, consumername, streams, count=None, block=None):
+        """
+        With '>' returns entries never delivered to the group; with '0' returns
+        this consumer's pending (delivered but unacked) entries, as Redis does.
+        """
+        deadline = time.monotonic() + (block or 0) / 1000.0
+        while True:
+            result = []
+            for name, start in streams.items():
+                entries = self._read(name, groupname, consumername, start, count)
+                if entries:
+                    result.append([name, entries])
+            if result or block is None or time.monotonic() >= deadline:
+                return result
+            time.sleep(0.01)
+
+    def _read(self, name, groupname, consumername, start, count):
+        limit = count or -1
+        if start not in ('>', b'>'):
+            rows = self.conn.execute(
+                'SELECT e.seq, e.fields FROM pending p JOIN entries e ON e.stream = p.stream AND e.seq = p.seq '
+                'WHERE p.stream = ? AND p.groupname = ? AND p.consumer = ? AND p.seq > ? ORDER BY p.seq LIMIT ?',
+                (name, groupname, consumername, self._seq(start), limit)).fetchall()
+            return [(self._entry_id(seq), json.loads(fields)) for seq, fields in rows]
+
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute('SELECT last_delivered FROM groups WHERE stream = ? AND groupname = ?',
+                                    (name, groupname)).fetchone()
+            if row is None:
+                raise ValueError(f"NOGROUP No such consumer group '{groupname}' for stream '{name}'")
+            rows = self.conn.execute('SELECT seq, fields FROM entries WHERE stream = ? AND seq > ? ORDER BY seq LIMIT ?',
+                                     (name, row[0], limit)).fetchall()
+            if rows:
+                self.conn.execute('UPDATE groups SET last_delivered = ? WHERE stream = ? AND groupname = ?',
+                                  (rows[-1][0], name, groupname))
+                self.conn.executemany('INSERT OR REPLACE INTO pending VALUES (?, ?, ?, ?)',
+                                      [(name, groupname, seq, consumername) for seq, _ in rows])
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return [(self._entry_id(seq), json.loads(fields)) for seq, fields in rows]
+
+    def xack(self, name, groupname, *ids):
+        cursor = self.conn.executemany('DELETE FROM pending WHERE stream = ? AND groupname = ? AND seq = ?',
+                                       [(name, groupname, self._seq(i)) for i in ids])
+        return cursor.rowcount
+
+    def xlen(self, name):
+        return self.conn.execute('SELECT COUNT(*) FROM entries WHERE stream = ?', (name,)).fetchone()[0]
@@ -0,0 +1,26 @@
+def read_smaps_rollup(pid='self'):
+    """
+    Memory totals in kB from /proc/<pid>/smaps_rollup (Linux 4.14+), e.g.
+    {'Rss': ..., 'Pss': ..., 'Shared_Clean': ..., 'Private_Dirty': ...}.
+    """
+    totals = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                totals[parts[0].rstrip(':')] = int(parts[1])
+    return totals
+
+def memory_summary(pid='self'):
+    """
+    Private vs shared resident memory in MB for one process.
+    """
+    totals = read_smaps_rollup(pid)
+    private_kb = totals.get('Private_Clean', 0) + totals.get('Private_Dirty', 0)
+    shared_kb = totals.get('Shared_Clean', 0) + totals.get('Shared_Dirty', 0)
+    return {
+        'rss_mb': round(totals.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(totals.get('Pss', 0) / 1024, 1),
+        'private_mb': round(private_kb / 1024, 1),
+        'shared_mb': round(shared_kb / 1024, 1),
+    }
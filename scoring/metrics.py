@@ -0,0 +1,231 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics. Values are kept per process. When
+# SCORING_METRICS_DIR names a directory shared by every process on the host
+# (gunicorn.conf.py sets one up for its workers and the inference process),
+# each process writes a snapshot of its metrics there every
+# SCORING_METRICS_PUBLISH_S seconds and at exit, and render_all() merges all
+# snapshots: counters and histograms are summed, gauges of live processes
+# are summed (or maxed), so a scrape shows the whole host whichever worker
+# answers it. Without the directory every sample carries a 'worker' label
+# with the pid instead.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PUBLISH_INTERVAL = float(os.environ.get('SCORING_METRICS_PUBLISH_S', '1'))
+
+REGISTRY = []
+
+def metrics_dir():
+    return os.environ.get('SCORING_METRICS_DIR')
+
+def _format_labels(labels, worker=True):
+    if worker:
+        labels = dict(labels, worker=str(os.getpid()))
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in sorted(labels.items())) + '}'
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(tuple(sorted(labels.items())), 0)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+    @staticmethod
+    def merge(values, others):
+        for key, value in others.items():
+            values[key] = values.get(key, 0) + value
+
+    def render(self, values=None, worker=True):
+        values = self.snapshot() if values is None else values
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, value in values.items():
+            lines.append(f'{self.name}{_format_labels(dict(key), worker)} {value}')
+        return lines
+
+class Gauge(Counter):
+    """
+    aggregate says how the values of the host's live processes combine:
+    'sum' (queue depths, requests in flight) or 'max' (per-worker states).
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, aggregate='sum'):
+        super().__init__(name, documentation)
+        self.aggregate = aggregate
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def merge(self, values, others):
+        if self.aggregate == 'max':
+            for key, value in others.items():
+                values[key] = max(values.get(key, value), value)
+        else:
+            Counter.merge(values, others)
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            state = self.values.setdefault(key, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self.lock:
+            return {key: dict(state, buckets=list(state['buckets'])) for key, state in self.values.items()}
+
+    @staticmethod
+    def merge(values, others):
+        for key, other in others.items():
+            state = values.setdefault(key, {'buckets': [0] * len(other['buckets']), 'sum': 0.0, 'count': 0})
+            state['buckets'] = [a + b for a, b in zip(state['buckets'], other['buckets'])]
+            state['sum'] += other['sum']
+            state['count'] += other['count']
+
+    def render(self, values=None, worker=True):
+        values = self.snapshot() if values is None else values
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for key, state in values.items():
+            labels = dict(key)
+            for bound, bucket_count in zip(self.buckets, state['buckets']):
+                lines.append(f'{self.name}_bucket{_format_labels(dict(labels, le=bound), worker)} {bucket_count}')
+            lines.append(f'{self.name}_bucket{_format_labels(dict(labels, le="+Inf"), worker)} {state["count"]}')
+            lines.append(f'{self.name}_sum{_format_labels(labels, worker)} {state["sum"]}')
+            lines.append(f'{self.name}_count{_format_labels(labels, worker)} {state["count"]}')
+        return lines
+
+def publish():
+    """
+    Write this process's metrics to <SCORING_METRICS_DIR>/<pid>.json.
+    """
+    directory = metrics_dir()
+    if not directory:
+        return
+    snapshot = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in REGISTRY}
+    with tempfile.NamedTemporaryFile('w', dir=directory, prefix='.metrics.', delete=False) as file:
+        json.dump(snapshot, file)
+    os.replace(file.name, os.path.join(directory, f'{os.getpid()}.json'))
+
+_publisher = {'pid': None}
+_publisher_lock = threading.Lock()
+
+def start_publisher():
+    """
+    Publish every PUBLISH_INTERVAL seconds and at exit; started once per
+    process (after fork, since the thread does not survive it).
+    """
+    if not metrics_dir():
+        return
+    with _publisher_lock:
+        if _publisher['pid'] == os.getpid():
+            return
+        _publisher['pid'] = os.getpid()
+        threading.Thread(target=_publish_forever, name='metrics-publisher', daemon=True).start()
+        atexit.register(_publish_quietly)
+
+def _publish_quietly():
+    try:
+        publish()
+    except Exception as e:
+        logging.error(f"Error publishing metrics: {str(e)}")
+
+def _publish_forever():
+    while True:
+        _publish_quietly()
+        time.sleep(PUBLISH_INTERVAL)
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect():
+    """
+    {metric name: {label key: value}} merged over every snapshot in SCORING_METRICS_DIR.
+    Exited processes still count towards counters and histograms, not gauges.
+    """
+    metrics = {metric.name: metric for metric in REGISTRY}
+    merged = {name: {} for name in metrics}
+    for path in glob.glob(os.path.join(metrics_dir(), '*.json')):
+        pid = int(os.path.basename(path)[:-5])
+        try:
+            with open(path, 'r') as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.error(f"Skipping unreadable metrics snapshot {path}: {str(e)}")
+            continue
+        alive = _alive(pid)
+        for name, values in snapshot.items():
+            metric = metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not alive):
+                continue
+            metric.merge(merged[name], {tuple(tuple(label) for label in key): value for key, value in values})
+    return merged
+
+def render_all():
+    lines = []
+    if metrics_dir():
+        start_publisher()
+        publish()
+        merged = collect()
+        for metric in REGISTRY:
+            lines.extend(metric.render(merged[metric.name], worker=False))
+    else:
+        for metric in REGISTRY:
+            lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
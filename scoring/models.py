@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import os
+
+import joblib
+import numpy as np
+
+from scoring.deadline import check, run_step
+
+# Configuration
+HOME_PATH = os.environ.get('SCORING_HOME', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+APPS_PATH = os.path.join(HOME_PATH, 'apps')
+
+# Feature order used at training time: V1..V28, Amount, hour_of_day
+FEATURE_NAMES = [f'V{i}' for i in range(1, 29)] + ['Amount', 'hour_of_day']
+N_FEATURES = len(FEATURE_NAMES)
+
+BASE_MODEL_NAMES = ['DecisionTree', 'RandomForest', 'LogisticRegression', 'XGBoost', 'LightGBM']
+
+# Same artifacts and response names as the Flask apps under apps/
+MODEL_SPECS = {
+    'lgbm': {
+        'kind': 'sklearn',
+        'model_name': 'LightGBM_model',
+        'path': os.path.join(APPS_PATH, 'traditional_ml', 'flask-lgbm-app', 'models', 'LightGBM_model.pkl'),
+    },
+    'xgboost': {
+        'kind': 'sklearn',
+        'model_name': 'XGBoost_model',
+        'path': os.path.join(APPS_PATH, 'traditional_ml', 'flask-xgboost-app', 'models', 'XGBoost_model.pkl'),
+    },
+    'logreg': {
+        'kind': 'sklearn',
+        'model_name': 'LogisticRegression_model',
+        'path': os.path.join(APPS_PATH, 'traditional_ml', 'flask-logreg-app', 'models', 'LogisticRegression_model.pkl'),
+    },
+    'cnn': {
+        'kind': 'keras',
+        'model_name': 'CNN_model',
+        'path': os.path.join(APPS_PATH, 'deep_learning', 'flask-cnn-app', 'models', 'CNN.keras'),
+        'input_shape': (-1, 5, 6, 1),
+    },
+    'lstm': {
+        'kind': 'keras',
+        'model_name': 'LSTM_model',
+        'path': os.path.join(APPS_PATH, 'deep_learning', 'flask-lstm-app', 'models', 'LSTM.keras'),
+        'input_shape': (-1, 30, 1),
+    },
+    'transformer': {
+        'kind': 'keras',
+        'model_name': 'Transformers_model',
+        'path': os.path.join(APPS_PATH, 'deep_learning', 'flask-transformers-app', 'models', 'Transformer.keras'),
+        'input_shape': (-1, 30, 1),
+    },
+    'stacking': {
+        'kind': 'stacking',
+        'model_name': 'Stacking_RF_model',
+        'path': os.path.join(APPS_PATH, 'stacking_models', 'flask-stacking-app', 'models',
+                             'stacking-model', 'stacking_model_random_forest.pkl'),
+        'base_model_folder': os.path.join(APPS_PATH, 'stacking_models', 'flask-stacking-app', 'models',
+                                          'models2deploy-td-mlmodels'),
+    },
+    'stacking_dl': {
+        'kind': 'stacking',
+        'model_name': 'Stacking_RF_DL_model',
+        'path': os.path.join(APPS_PATH, 'stacking_models', 'flask-stacking-dl-app', 'models',
+                             'stacking-model-dl', 'stacking_model_random_forest_dl.pkl'),
+        'base_model_folder': os.path.join(APPS_PATH, 'stacking_models', 'flask-stacking-dl-app', 'models',
+                                          'models2deploy-td-mlmodels'),
+        'dl_model_folder': os.path.join(APPS_PATH, 'stacking_models', 'flask-stacking-dl-app', 'models',
+                                        'models2deploy-dl'),
+    },
+}
+
+def file_version(*paths):
+    """
+    Short content hash of the artifact files, used as the model version.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+def load_keras_model(path):
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+def records_to_array(records):
+    """
+    Build a float32 (n, 30) matrix from transaction dicts in FEATURE_NAMES order.
+    """
+    X = np.empty((len(records), N_FEATURES), dtype=np.float32)
+    for i, record in enumerate(records):
+        X[i] = [record[name] for name in FEATURE_NAMES]
+    return X
+
+class SklearnModel:
+    """
+    joblib-pickled sklearn-API classifier (LightGBM, XGBoost, LogisticRegression).
+    """
+    def __init__(self, key, spec):
+        self.key = key
+        self.name = spec['model_name']
+        self.threshold = None
+        self.model = joblib.load(spec['path'])
+        self.version = file_version(spec['path'])
+
+    def step_names(self):
+        return [self.key]
+
+    def score_batch(self, X, deadline=None):
+        check(deadline, 'model', self.step_names())
+        return run_step(self.key, lambda X: self.model.predict_proba(X)[:, 1], X)
+
+class KerasModel:
+    """
+    Keras model that expects the 30 features reshaped to spec['input_shape'].
+    """
+    def __init__(self, key, spec):
+        self.key = key
+        self.name = spec['model_name']
+        self.threshold = None
+        self.input_shape = spec['input_shape']
+        self.model = load_keras_model(spec['path'])
+        self.version = file_version(spec['path'])
+
+    def step_names(self):
+        return [self.key]
+
+    def score_batch(self, X, deadline=None):
+        check(deadline, 'model', self.step_names())
+        X = np.asarray(X).reshape(self.input_shape)
+        return run_step(self.key, lambda X: self.model.predict(X, batch_size=len(X), verbose=0).ravel(), X)
+
+class StackingModel:
+    """
+    Stacking meta-model over the traditional base models (and CNN/LSTM for the DL variant).
+    """
+    def __init__(self, key, spec):
+        self.key = key
+        self.name = spec['model_name']
+        self.model, self.threshold = joblib.load(spec['path'])
+
+        artifact_paths = [spec['path']]
+        self.base_models = {}
+        for name in BASE_MODEL_NAMES:
+            path = os.path.join(spec['base_model_folder'], f'{name}_model.pkl')
+            self.base_models[name] = joblib.load(path)
+            artifact_paths.append(path)
+
+        self.dl_models = {}
+        if 'dl_model_folder' in spec:
+            for name in ['CNN', 'LSTM']:
+                path = os.path.join(spec['dl_model_folder'], f'{name}.keras')
+                self.dl_models[name] = load_keras_model(path)
+                artifact_paths.append(path)
+
+        self.version = file_version(*artifact_paths)
+
+    def base_model_steps(self):
+        """
+        Ordered (name, fn) pairs, each fn mapping X to one meta-feature column.
+        """
+        steps = [(name, lambda X, m=model: m.predict_proba(X)[:, 1])
+                 for name, model in self.base_models.items()]
+        if 'CNN' in self.dl_models:
+            cnn = self.dl_models['CNN']
+            steps.append(('CNN', lambda X: cnn.predict(X.reshape(-1, 5, 6, 1), batch_size=len(X), verbose=0).ravel()))
+        if 'LSTM' in self.dl_models:
+            lstm = self.dl_models['LSTM']
+            steps.append(('LSTM', lambda X: lstm.predict(X.reshape(-1, 30, 1), batch_size=len(X), verbose=0).ravel()))
+        return steps
+
+    def step_names(self):
+        return [f'{self.key}/{name}' for name, _ in self.base_model_steps()] + [f'{self.key}/meta']
+
+    def score_batch(self, X, deadline=None):
+        """
+        Runs the base models in order and stops as soon as the deadline has
+        passed, skipping the remaining base models and the meta-model.
+        """
+        steps = self.base_model_steps()
+        step_names = self.step_names()
+        columns = []
+        for i, (name, fn) in enumerate(steps):
+            check(deadline, name, step_names[i:])
+            columns.append(run_step(step_names[i], fn, X))
+        check(deadline, 'meta', step_names[-1:])
+        return run_step(step_names[-1], lambda M: self.model.predict_proba(M)[:, 1], np.column_stack(columns))
+
+MODEL_CLASSES = {
+    'sklearn': SklearnModel,
+    'keras': KerasModel,
+    'stacking': StackingModel,
+}
+
+def uses_tensorflow(key):
+    """
+    Whether loading this model key starts TensorFlow (Keras models and stacking with DL base models).
+    """
+    spec = MODEL_SPECS.get(key, {})
+    return spec.get('kind') == 'keras' or 'dl_model_folder' in spec
+
+def load_model(key):
+    """
+    Load a model from MODEL_SPECS by key, e.g. 'lgbm' or 'stacking_dl'.
+    """
+    if key not in MODEL_SPECS:
+        raise ValueError(f"Unknown model '{key}', expected one of {sorted(MODEL_SPECS)}")
+    spec = MODEL_SPECS[key]
+    try:
+        model = MODEL_CLASSES[spec['kind']](key, spec)
+        logging.info(f"Model '{key}' loaded successfully from {spec['path']} (version {model.version})")
+    except FileNotFoundError:
+        logging.error(f"Model file not found at {spec['path']}")
+        raise
+    except Exception as e:
+        logging.error(f"Error loading model '{key}': {str(e)}")
+        raise
+    return model
@@ -0,0 +1,57 @@
+import gc
+import logging
+from contextlib import contextmanager
+
+import numpy as np
+
+from scoring.inference_server import RemoteModel
+from scoring.models import N_FEATURES, KerasModel, SklearnModel, StackingModel
+
+# Copy-on-write friendly preload: load and warm every model in the gunicorn
+# master, then gc.freeze() so the collector never walks (and so never writes
+# to) the model objects the forked workers share. See scoring/gunicorn.conf.py.
+
+def model_estimators(model):
+    if isinstance(model, SklearnModel):
+        return [model.model]
+    if isinstance(model, StackingModel):
+        return list(model.base_models.values()) + [model.model]
+    return []
+
+@contextmanager
+def single_threaded(estimators):
+    """
+    Run with n_jobs=1 so the master never starts an OpenMP pool, which forked
+    workers could not use (LightGBM and XGBoost can hang after fork otherwise).
+    """
+    saved = []
+    for estimator in estimators:
+        if 'n_jobs' in estimator.get_params():
+            saved.append((estimator, estimator.get_params()['n_jobs']))
+            estimator.set_params(n_jobs=1)
+    try:
+        yield
+    finally:
+        for estimator, n_jobs in saved:
+            estimator.set_params(n_jobs=n_jobs)
+
+def warm_up(model):
+    """
+    Score one dummy row so lazily built state (feature-name checks, tree
+    caches) is created before fork and shared, not rebuilt per worker.
+    """
+    if isinstance(model, KerasModel) or getattr(model, 'dl_models', None):
+        # gunicorn.conf.py refuses this combination; TensorFlow's runtime does not survive fork
+        raise RuntimeError(f"{model.name} uses TensorFlow, which is not fork-safe; it cannot be preloaded")
+    with single_threaded(model_estimators(model)):
+        model.score_batch(np.zeros((1, N_FEATURES), dtype=np.float32))
+    logging.info(f"Warmed up {model.name} in the master process")
+
+def freeze_for_fork(*models):
+    for model in models:
+        # A RemoteModel has nothing to warm, and scoring here would open a
+        # connection that every forked worker inherits without its reply thread
+        if model is not None and not isinstance(model, RemoteModel):
+            warm_up(model)
+    gc.freeze()
+    logging.info(f"gc.freeze(): {gc.get_freeze_count()} objects moved to the permanent generation")
@@ -0,0 +1,141 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from scoring.metrics import Counter
+
+RATE_LIMITED = Counter('scoring_rate_limited_total', 'Requests rejected for exceeding the client quota, by user')
+
+# Bucket state lives in a small mmap'd file (tmpfs under /dev/shm) so every
+# gunicorn worker on the host draws from the same buckets. Each slot holds the
+# username, the token count and the last refill time, and is guarded by an
+# fcntl byte-range lock across processes plus a thread lock within one.
+SLOT = struct.Struct('=32sdd')
+DEFAULT_STORE = '/dev/shm/scoring-ratelimit' if os.path.isdir('/dev/shm') else os.path.join(tempfile.gettempdir(),
+                                                                                            'scoring-ratelimit')
+
+class StoreFull(RuntimeError):
+    """
+    Every slot of the shared store is taken by other users; raise capacity.
+    """
+
+def check_limit(name, limit):
+    """
+    A tier needs a positive refill rate (a zero rate would never refill, so
+    no Retry-After could be given) and room for at least one request.
+    """
+    if float(limit['rate']) <= 0:
+        raise ValueError(f"Rate limit '{name}': rate must be > 0, got {limit['rate']}")
+    if float(limit['burst']) < 1:
+        raise ValueError(f"Rate limit '{name}': burst must be >= 1, got {limit['burst']}")
+
+class TokenBucketLimiter:
+    """
+    Per-username token buckets: 'rate' tokens per second refill up to 'burst'.
+    Limits come from a JSON file such as
+        {"default": {"rate": 100, "burst": 200}, "users": {"batch-job": {"rate": 20, "burst": 40}}}
+    which is re-read when its mtime changes, checked at most every reload_interval seconds.
+    """
+    def __init__(self, limits_path, store_path=DEFAULT_STORE, capacity=1024, reload_interval=1.0):
+        self.limits_path = limits_path
+        self.capacity = capacity
+        self.reload_interval = reload_interval
+        self.limits = {}
+        self.default = None
+        self.limits_mtime = None
+        self.checked_at = 0.0
+        self.slots = {}
+        self.lock = threading.Lock()
+
+        self.fd = os.open(store_path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = capacity * SLOT.size
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.buffer = mmap.mmap(self.fd, size)
+        self.reload()
+
+    def reload(self):
+        mtime = os.stat(self.limits_path).st_mtime
+        if mtime == self.limits_mtime:
+            return
+        with open(self.limits_path, 'r') as file:
+            config = json.load(file)
+        limits = config.get('users', {})
+        default = config.get('default')
+        for name, limit in list(limits.items()) + [('default', default)]:
+            if limit:
+                check_limit(name, limit)
+        self.limits = limits
+        self.default = default
+        self.limits_mtime = mtime
+        logging.info(f"Rate limits loaded from {self.limits_path}: {len(self.limits)} users, default {self.default}")
+
+    def _maybe_reload(self, now):
+        if now - self.checked_at < self.reload_interval:
+            return
+        self.checked_at = now
+        try:
+            self.reload()
+        except Exception as e:
+            logging.error(f"Error reloading rate limits, keeping previous ones: {str(e)}")
+
+    def _slot(self, username):
+        """
+        Find or claim the slot for username by linear probing from its crc32.
+        """
+        if username in self.slots:
+            return self.slots[username]
+        key = username.encode()[:32].ljust(32, b'\0')
+        start = zlib.crc32(key) % self.capacity
+        for i in range(self.capacity):
+            index = (start + i) % self.capacity
+            offset = index * SLOT.size
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, SLOT.size, offset)
+            try:
+                name, _, _ = SLOT.unpack_from(self.buffer, offset)
+                if name == key or name == b'\0' * 32:
+                    if name != key:
+                        SLOT.pack_into(self.buffer, offset, key, -1.0, 0.0)
+                    self.slots[username] = offset
+                    return offset
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, SLOT.size, offset)
+        raise StoreFull(f"Rate limit store is full ({self.capacity} users)")
+
+    def acquire(self, username, cost=1.0):
+        """
+        Take cost tokens from username's bucket. Returns 0 when allowed, else
+        the seconds until enough tokens will have refilled.
+        """
+        now = time.monotonic()
+        self._maybe_reload(now)
+        limit = self.limits.get(username, self.default)
+        if not limit:
+            return 0.0
+        rate, burst = float(limit['rate']), float(limit['burst'])
+
+        with self.lock:
+            offset = self._slot(username)
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, SLOT.size, offset)
+            try:
+                key, tokens, updated = SLOT.unpack_from(self.buffer, offset)
+                # A freshly claimed slot starts with a full bucket
+                tokens = burst if tokens < 0 else min(burst, tokens + (now - updated) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self.buffer, offset, key, tokens, now)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, SLOT.size, offset)
+
+        if allowed:
+            return 0.0
+        RATE_LIMITED.inc(user=username)
+        return (cost - tokens) / rate
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from scoring.metrics import Counter, Gauge, Histogram
+
+RESCORE_JOBS = Counter('scoring_rescore_jobs_total', 'Deep re-score jobs by outcome (enqueued, dropped, done, failed)')
+# Each worker has its own queue; the shared metrics directory sums the depths and merges the lags host-wide
+RESCORE_QUEUE_DEPTH = Gauge('scoring_rescore_queue_depth', 'Jobs waiting for the deep re-score, over all workers',
+                            aggregate='sum')
+RESCORE_LAG_SECONDS = Histogram('scoring_rescore_lag_seconds', 'Time from enqueue to deep re-score result',
+                                buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+RESCORE_BATCH_SECONDS = Histogram('scoring_rescore_batch_seconds', 'Deep model time per re-score batch',
+                                  buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60))
+
+# Results are shared by every worker on the host (any worker may serve
+# /result/<id>), so they live in a small SQLite file on tmpfs.
+DEFAULT_RESULTS_PATH = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                                    'scoring-rescore.db')
+
+class ResultStore:
+    """
+    job_id -> result dict, with 'pending' rows written at enqueue time so that
+    any worker can tell a queued job from an unknown one. Rows older than ttl
+    seconds are deleted.
+    """
+    def __init__(self, path=DEFAULT_RESULTS_PATH, ttl=3600.0):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                job_id TEXT PRIMARY KEY, enqueued REAL NOT NULL, completed REAL, result TEXT)""")
+
+    def _conn(self):
+        # One connection per thread, re-opened after fork
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self.local.conn.execute('PRAGMA journal_mode=WAL')
+            self.local.conn.execute('PRAGMA synchronous=OFF')
+            self.local.pid = os.getpid()
+        return self.local.conn
+
+    def add_pending(self, job_id, enqueued):
+        self._conn().execute('INSERT INTO results (job_id, enqueued) VALUES (?, ?)', (job_id, enqueued))
+
+    def remove(self, job_id):
+        self._conn().execute('DELETE FROM results WHERE job_id = ?', (job_id,))
+
+    def complete(self, results, completed):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('UPDATE results SET completed = ?, result = ? WHERE job_id = ?',
+                             [(completed, json.dumps(result), job_id) for job_id, result in results])
+            conn.execute('DELETE FROM results WHERE enqueued < ?', (time.time() - self.ttl,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get(self, job_id):
+        """
+        Returns None for unknown (or expired) jobs, else a dict with 'status' 'pending' or 'done'.
+        """
+        row = self._conn().execute('SELECT enqueued, completed, result FROM results WHERE job_id = ?',
+                                   (job_id,)).fetchone()
+        if row is None:
+            return None
+        enqueued, completed, result = row
+        if completed is None:
+            return {'id': job_id, 'status': 'pending', 'queued_seconds': round(time.time() - enqueued, 3)}
+        return dict(json.loads(result), id=job_id, status='done', lag_seconds=round(completed - enqueued, 3))
+
+class DeepRescorer:
+    """
+    Second phase of two-phase scoring: /predict answers with the fast model
+    and submit()s the same features here. A background thread re-scores the
+    queue with the deep model in batches of up to batch_size rows (waiting up
+    to max_wait seconds to fill one) and stores the results, also writing
+    them to sink when one is given.
+
+    submit() never blocks: when max_queue jobs are already waiting the job
+    is dropped and counted, and the caller gets None instead of a job id.
+    """
+    def __init__(self, model, store, max_queue=10000, batch_size=256, max_wait=0.5, sink=None):
+        self.model = model
+        self.store = store
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.sink = sink
+        self.jobs = queue.Queue(max_queue)
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Started lazily so that with preload_app each forked worker gets its own thread
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                threading.Thread(target=self._run, name='deep-rescore', daemon=True).start()
+
+    def submit(self, features, transaction_id=None):
+        self._ensure_worker()
+        job_id = uuid.uuid4().hex
+        enqueued = time.time()
+        # The pending row must exist before the worker can see the job, or its UPDATE could run first
+        try:
+            self.store.add_pending(job_id, enqueued)
+        except Exception as e:
+            logging.error(f"Error recording re-score job {job_id}: {str(e)}")
+            RESCORE_JOBS.inc(outcome='dropped')
+            return None
+        try:
+            self.jobs.put_nowait((job_id, transaction_id, features, enqueued))
+        except queue.Full:
+            RESCORE_JOBS.inc(outcome='dropped')
+            try:
+                self.store.remove(job_id)
+            except Exception as e:
+                logging.error(f"Error removing dropped re-score job {job_id}: {str(e)}")
+            return None
+        RESCORE_JOBS.inc(outcome='enqueued')
+        RESCORE_QUEUE_DEPTH.set(self.jobs.qsize())
+        return job_id
+
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        fill_until = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.jobs.get(timeout=max(fill_until - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        RESCORE_QUEUE_DEPTH.set(self.jobs.qsize())
+        return batch
+
+    def build_result(self, transaction_id, score):
+        result = {
+            'transaction_id': transaction_id,
+            'model_name': self.model.name,
+            'model_version': self.model.version,
+            'score': float(score),
+        }
+        if self.model.threshold is not None:
+            result['prediction'] = int(score >= self.model.threshold)
+            result['threshold'] = float(self.model.threshold)
+        return result
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with RESCORE_BATCH_SECONDS.time():
+                    scores = self.model.score_batch(np.stack([features for _, _, features, _ in batch]))
+                results = [(job_id, self.build_result(transaction_id, score))
+                           for (job_id, transaction_id, _, _), score in zip(batch, scores)]
+                outcome = 'done'
+            except Exception as e:
+                logging.error(f"Error re-scoring batch of {len(batch)}: {str(e)}")
+                results = [(job_id, {'transaction_id': transaction_id, 'error': str(e)})
+                           for job_id, transaction_id, _, _ in batch]
+                outcome = 'failed'
+
+            completed = time.time()
+            try:
+                self.store.complete(results, completed)
+                if self.sink:
+                    self.sink.write([dict(result, id=job_id) for job_id, result in results])
+            except Exception as e:
+                logging.error(f"Error storing re-score results: {str(e)}")
+            RESCORE_JOBS.inc(len(batch), outcome=outcome)
+            for _, _, _, enqueued in batch:
+                RESCORE_LAG_SECONDS.observe(completed - enqueued)
@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from scoring.metrics import Counter
+from scoring.models import FEATURE_NAMES
+
+RULE_DECISIONS = Counter('scoring_rule_decisions_total', 'Transactions by final decision and deciding rule')
+
+# Decisions from least to most severe; the most severe of the matching rules and the threshold decision wins
+ACTIONS = ['approve', 'review', 'decline']
+# Rules may test any model feature or the model score
+COLUMNS = FEATURE_NAMES + ['score']
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+def parse_condition(condition):
+    """
+    ['Amount', '>', 5.0] or ['hour_of_day', 'between', [0, 5]] -> [(column, op, value)].
+    """
+    column, op, value = condition
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown rule column {column!r}")
+    if op == 'between':
+        low, high = value
+        return [(column, '>=', float(low)), (column, '<=', float(high))]
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown rule operator {op!r}")
+    return [(column, op, float(value))]
+
+class RuleSet:
+    """
+    Rules compiled for whole-batch evaluation. Distinct conditions are grouped
+    by operator and each group is evaluated for all rows with one gather and
+    one broadcast comparison; each rule is then the AND of its rows of that
+    condition matrix, gathered for all rules at once. A batch costs at most
+    six comparisons plus one reduction whatever the number of rules or rows.
+
+    Config:
+        {"default_threshold": 0.5,
+         "rules": [{"name": "night_high_amount", "action": "review",
+                    "when": [["hour_of_day", "between", [0, 5]], ["Amount", ">", 4.0]]}]}
+
+    The threshold decision is 'decline' when the score is at or above the
+    model's threshold (default_threshold for models without one) and
+    'approve' otherwise. Rules can only escalate it: a matching rule less
+    severe than the threshold decision does not apply.
+    """
+    def __init__(self, config, version=None):
+        self.version = version
+        self.default_threshold = float(config.get('default_threshold', 0.5))
+        rules = config.get('rules', [])
+        self.names = [rule['name'] for rule in rules]
+        self.severity = np.array([ACTIONS.index(rule['action']) for rule in rules], dtype=np.int64)
+
+        conditions = {}
+        rule_conditions = []
+        for rule in rules:
+            parsed = [c for condition in rule['when'] for c in parse_condition(condition)]
+            if not parsed:
+                raise ValueError(f"Rule {rule['name']!r} has no conditions")
+            rule_conditions.append([conditions.setdefault(c, len(conditions)) for c in parsed])
+        self.n_conditions = len(conditions)
+
+        # (rules, max conditions per rule) indices into the condition matrix,
+        # padded with its extra always-true last row
+        width = max((len(indices) for indices in rule_conditions), default=0)
+        self.rule_conditions = np.full((len(rules), width), self.n_conditions, dtype=np.int64)
+        for j, indices in enumerate(rule_conditions):
+            self.rule_conditions[j, :len(indices)] = indices
+
+        groups = {}
+        for (column, op, value), index in conditions.items():
+            groups.setdefault(op, []).append((index, COLUMNS.index(column), value))
+        self.groups = [(OPERATORS[op], np.array([i for i, _, _ in items]), np.array([c for _, c, _ in items]),
+                        np.array([[v] for _, _, v in items])) for op, items in groups.items()]
+
+    def matches(self, X, scores):
+        """
+        (n_rules, n) bool matrix of which rules fire for each row.
+        """
+        # Column-major values so each comparison reads one contiguous row
+        values = np.vstack([np.asarray(X, dtype=np.float64).T, scores])
+        satisfied = np.empty((self.n_conditions + 1, values.shape[1]), dtype=bool)
+        satisfied[-1] = True
+        for op, indices, columns, thresholds in self.groups:
+            satisfied[indices] = op(values[columns], thresholds)
+        return np.logical_and.reduce(satisfied[self.rule_conditions], axis=1)
+
+    def evaluate(self, X, scores, threshold=None):
+        """
+        Returns (decisions, deciding rule names or None) for a batch of feature rows and their scores.
+
+        >>> rules = RuleSet({'rules': [{'name': 'amount_cap', 'action': 'review', 'when': [['Amount', '>', 4.0]]}]})
+        >>> X = np.zeros((2, len(FEATURE_NAMES)))
+        >>> X[:, FEATURE_NAMES.index('Amount')] = 5.0
+        >>> rules.evaluate(X, [0.99, 0.1], threshold=0.5)
+        (['decline', 'review'], [None, 'amount_cap'])
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        threshold = self.default_threshold if threshold is None else threshold
+        severity = np.where(scores >= threshold, ACTIONS.index('decline'), ACTIONS.index('approve'))
+        rule = np.full(len(scores), -1)
+        n_rules = len(self.names)
+        if n_rules:
+            fired = self.matches(X, scores)
+            # Most severe matching rule, earliest in the file on ties
+            rank = self.severity * n_rules + (n_rules - 1 - np.arange(n_rules))
+            ranked = np.where(fired, rank[:, None], -1)
+            best = ranked.argmax(axis=0)
+            rule_severity = np.where(fired.any(axis=0), self.severity[best], -1)
+            # A rule decides only when it is at least as severe as the threshold decision
+            rule = np.where(rule_severity >= severity, best, -1)
+            severity = np.maximum(severity, rule_severity)
+
+        # -1 (no rule) indexes the trailing None / 'threshold'
+        counts = np.bincount(severity * (n_rules + 1) + rule + 1, minlength=len(ACTIONS) * (n_rules + 1))
+        labels = ['threshold'] + self.names
+        for key in np.flatnonzero(counts):
+            RULE_DECISIONS.inc(int(counts[key]), decision=ACTIONS[key // (n_rules + 1)], rule=labels[key % (n_rules + 1)])
+        rule_names = np.array(self.names + [None], dtype=object)[rule]
+        return np.array(ACTIONS)[severity].tolist(), rule_names.tolist()
+
+class RulesEngine:
+    """
+    Holds the RuleSet from a JSON file and swaps in a new one when the file's
+    mtime changes (checked at most every reload_interval seconds). A file
+    that fails to parse or compile is logged and the previous rules are kept.
+    """
+    def __init__(self, path, reload_interval=1.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.checked_at = 0.0
+        self.rules = None
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if self.rules and self.rules.version == mtime:
+            return
+        with open(self.path, 'r') as file:
+            self.rules = RuleSet(json.load(file), version=mtime)
+        logging.info(f"Rules loaded from {self.path}: {len(self.rules.names)} rules")
+
+    def _maybe_reload(self, now):
+        if now - self.checked_at < self.reload_interval:
+            return
+        with self.lock:
+            if now - self.checked_at < self.reload_interval:
+                return
+            self.checked_at = now
+            try:
+                self.reload()
+            except Exception as e:
+                logging.error(f"Error reloading rules, keeping previous ones: {str(e)}")
+
+    def evaluate(self, X, scores, threshold=None):
+        self._maybe_reload(time.monotonic())
+        return self.rules.evaluate(X, scores, threshold)
@@ -0,0 +1,311 @@
+from flask import Flask, Response, g, jsonify, request
+from flask_httpauth import HTTPBasicAuth
+import atexit
+import gc
+import logging
+import math
+import os
+import time
+
+from scoring.admission import DEFAULT_PRIORITY, PRIORITIES, AdmissionController, Rejected
+from scoring.audit import ParquetAuditSink
+from scoring.auth import check_credentials, load_users
+from scoring.blocklist import Blocklist
+from scoring.deadline import Deadline, DeadlineExceeded, record_skip
+from scoring.explain import explain_batch, explanation_dict, supports_explain
+from scoring.inference_server import RemoteModel
+from scoring.memory import memory_summary
+from scoring.metrics import Counter, Histogram, render_all
+from scoring.models import load_model, records_to_array
+from scoring.ratelimit import StoreFull, TokenBucketLimiter
+from scoring.rescore import DEFAULT_RESULTS_PATH, DeepRescorer, ResultStore
+from scoring.rules import RulesEngine
+from scoring.sinks import make_sink
+from scoring.singleflight import SingleFlight, request_key
+from scoring.tiering import FALLBACK, PRIMARY, TierPolicy
+
+# Configuration
+MODEL_KEY = os.environ.get('SCORING_MODEL', 'lgbm')
+# When set, the primary model lives in the shared per-host inference process
+INFERENCE_SOCKET = os.environ.get('SCORING_INFERENCE_SOCKET')
+# Longest wait for the inference process (primary or re-score) when the request has no earlier deadline
+INFERENCE_TIMEOUT_MS = float(os.environ.get('SCORING_INFERENCE_TIMEOUT_MS', '10000'))
+THREADS = int(os.environ.get('SCORING_THREADS', '4'))
+MAX_IN_FLIGHT = int(os.environ.get('SCORING_MAX_IN_FLIGHT', str(THREADS)))
+MAX_QUEUE = int(os.environ.get('SCORING_MAX_QUEUE', str(THREADS * 2)))
+QUEUE_TIMEOUT_MS = float(os.environ.get('SCORING_QUEUE_TIMEOUT_MS', '200'))
+RETRY_AFTER_S = int(os.environ.get('SCORING_RETRY_AFTER_S', '1'))
+# 503 tells load balancers the replica is overloaded; set 429 to push back on clients instead
+REJECT_STATUS = int(os.environ.get('SCORING_REJECT_STATUS', '503'))
+# Cheaper model loaded in the same process and used while the primary is overloaded
+FALLBACK_MODEL_KEY = os.environ.get('SCORING_FALLBACK_MODEL')
+TIER_QUEUE_HIGH = int(os.environ.get('SCORING_TIER_QUEUE_HIGH', str(max(MAX_QUEUE // 2, 1))))
+TIER_QUEUE_LOW = int(os.environ.get('SCORING_TIER_QUEUE_LOW', '0'))
+TIER_LATENCY_HIGH_MS = float(os.environ.get('SCORING_TIER_LATENCY_HIGH_MS', '1000'))
+TIER_LATENCY_LOW_MS = float(os.environ.get('SCORING_TIER_LATENCY_LOW_MS', '250'))
+TIER_MIN_DWELL_S = float(os.environ.get('SCORING_TIER_MIN_DWELL_S', '5'))
+# While degraded, one request per interval goes to the primary model to measure its latency
+TIER_PROBE_INTERVAL_S = float(os.environ.get('SCORING_TIER_PROBE_INTERVAL_S', '1'))
+# /predict?explain=true only pays for contributions on transactions at or above this score
+EXPLAIN_MIN_SCORE = float(os.environ.get('SCORING_EXPLAIN_MIN_SCORE', '0.5'))
+EXPLAIN_TOP_K = int(os.environ.get('SCORING_EXPLAIN_TOP_K', '0')) or None
+# Priority class from the X-Priority header, or 'high' when the payload Amount
+# (in the same scaled units the model receives) is at least SCORING_PRIORITY_AMOUNT_MIN
+PRIORITY_HEADER = 'X-Priority'
+PRIORITY_AMOUNT_MIN = os.environ.get('SCORING_PRIORITY_AMOUNT_MIN')
+PRIORITY_AGING_MS = float(os.environ.get('SCORING_PRIORITY_AGING_MS', '100'))
+# Identical concurrent /predict inputs share one model computation; set 0 to disable
+SINGLE_FLIGHT = os.environ.get('SCORING_SINGLE_FLIGHT', '1') == '1'
+# Directory for the Parquet audit trail of scored transactions; unset disables it
+AUDIT_DIR = os.environ.get('SCORING_AUDIT_DIR')
+AUDIT_FLUSH_ROWS = int(os.environ.get('SCORING_AUDIT_FLUSH_ROWS', '8192'))
+AUDIT_FLUSH_S = float(os.environ.get('SCORING_AUDIT_FLUSH_S', '10'))
+AUDIT_MAX_PENDING = int(os.environ.get('SCORING_AUDIT_MAX_PENDING', '4'))
+# Blocklist file from `python -m scoring.blocklist`; payload entity fields checked against it before scoring
+BLOCKLIST_PATH = os.environ.get('SCORING_BLOCKLIST')
+BLOCKLIST_FIELDS = os.environ.get('SCORING_BLOCKLIST_FIELDS', 'card_id,device_id,merchant_id').split(',')
+# JSON rules combining the score with feature conditions into approve/review/decline; reloaded on change
+RULES_PATH = os.environ.get('SCORING_RULES')
+# Two-phase scoring: answer with the primary model and queue the features for a
+# deep re-score by SCORING_RESCORE_MODEL in-process, or by the inference server at SCORING_RESCORE_SOCKET
+RESCORE_MODEL_KEY = os.environ.get('SCORING_RESCORE_MODEL')
+RESCORE_SOCKET = os.environ.get('SCORING_RESCORE_SOCKET')
+RESCORE_MAX_QUEUE = int(os.environ.get('SCORING_RESCORE_MAX_QUEUE', '10000'))
+RESCORE_BATCH = int(os.environ.get('SCORING_RESCORE_BATCH', '256'))
+RESCORE_MAX_WAIT_MS = float(os.environ.get('SCORING_RESCORE_MAX_WAIT_MS', '500'))
+RESCORE_RESULTS_PATH = os.environ.get('SCORING_RESCORE_RESULTS', DEFAULT_RESULTS_PATH)
+RESCORE_RESULT_TTL_S = float(os.environ.get('SCORING_RESCORE_RESULT_TTL_S', '3600'))
+# Optional sink spec (jsonl:PATH, redis://..., local:DBPATH) that also receives every deep result
+RESCORE_SINK = os.environ.get('SCORING_RESCORE_SINK')
+# JSON file of per-user token-bucket quotas shared by all workers on the host; unset disables them
+RATE_LIMITS_PATH = os.environ.get('SCORING_RATE_LIMITS')
+
+logging.basicConfig(level=os.environ.get('SCORING_LOG_LEVEL', 'INFO'), format='%(asctime)s %(message)s')
+
+model = RemoteModel(INFERENCE_SOCKET, INFERENCE_TIMEOUT_MS / 1000.0) if INFERENCE_SOCKET else load_model(MODEL_KEY)
+users = load_users()
+admission = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUE, QUEUE_TIMEOUT_MS / 1000.0, PRIORITY_AGING_MS / 1000.0)
+
+fallback_model = load_model(FALLBACK_MODEL_KEY) if FALLBACK_MODEL_KEY else None
+tier_policy = TierPolicy(TIER_QUEUE_HIGH, TIER_QUEUE_LOW,
+                         TIER_LATENCY_HIGH_MS / 1000.0, TIER_LATENCY_LOW_MS / 1000.0,
+                         min_dwell=TIER_MIN_DWELL_S, probe_interval=TIER_PROBE_INTERVAL_S) if fallback_model else None
+rate_limiter = TokenBucketLimiter(RATE_LIMITS_PATH) if RATE_LIMITS_PATH else None
+single_flight = SingleFlight() if SINGLE_FLIGHT else None
+rescorer = None
+if RESCORE_MODEL_KEY or RESCORE_SOCKET:
+    rescore_model = RemoteModel(RESCORE_SOCKET, INFERENCE_TIMEOUT_MS / 1000.0) if RESCORE_SOCKET else load_model(RESCORE_MODEL_KEY)
+    rescorer = DeepRescorer(rescore_model, ResultStore(RESCORE_RESULTS_PATH, RESCORE_RESULT_TTL_S), RESCORE_MAX_QUEUE,
+                            min(RESCORE_BATCH, getattr(rescore_model, 'max_batch', RESCORE_BATCH)),
+                            RESCORE_MAX_WAIT_MS / 1000.0, make_sink(RESCORE_SINK) if RESCORE_SINK else None)
+rules_engine = RulesEngine(RULES_PATH) if RULES_PATH else None
+blocklist = Blocklist(BLOCKLIST_PATH, BLOCKLIST_FIELDS) if BLOCKLIST_PATH else None
+audit_sink = ParquetAuditSink(AUDIT_DIR, AUDIT_FLUSH_ROWS, AUDIT_FLUSH_S, AUDIT_MAX_PENDING) if AUDIT_DIR else None
+if audit_sink:
+    atexit.register(audit_sink.close)
+
+REQUESTS = Counter('scoring_requests_total', 'Scoring requests by HTTP status')
+REQUEST_SECONDS = Histogram('scoring_request_seconds', 'End-to-end /predict latency of admitted requests, by priority')
+
+app = Flask(f'{model.name} Transaction Scoring')
+auth = HTTPBasicAuth()
+
+@auth.verify_password
+def verify_password(username, password):
+    # Already checked by admit_request for the rate limiter; don't log or count a failure twice
+    if 'auth_user' in g:
+        return g.auth_user
+    return check_credentials(users, username, password)
+
+def request_priority():
+    priority = request.headers.get(PRIORITY_HEADER)
+    if priority is not None:
+        if priority.lower() not in PRIORITIES:
+            raise ValueError(f"{PRIORITY_HEADER} must be one of {PRIORITIES}")
+        return priority.lower()
+    if PRIORITY_AMOUNT_MIN is not None:
+        data_input = request.get_json(silent=True)
+        # Malformed payloads are left for /predict to reject
+        if isinstance(data_input, dict) and isinstance(data_input.get('Amount'), (int, float)):
+            if data_input['Amount'] >= float(PRIORITY_AMOUNT_MIN):
+                return 'high'
+    return DEFAULT_PRIORITY
+
+@app.before_request
+def admit_request():
+    if request.endpoint != 'predict':
+        return None
+    g.start_time = time.monotonic()
+
+    # Quota check first: only the Authorization header is read, never the body
+    if rate_limiter:
+        credentials = request.authorization
+        g.auth_user = check_credentials(users, credentials.username if credentials else '',
+                                        credentials.password if credentials else '')
+        username = g.auth_user
+        if username:
+            try:
+                wait = rate_limiter.acquire(username)
+            except StoreFull as e:
+                logging.error(f"Rate limiting unavailable: {str(e)}")
+                REQUESTS.inc(status=503)
+                response = jsonify({'error': 'rate_limit_unavailable'})
+                response.headers['Retry-After'] = str(RETRY_AFTER_S)
+                return response, 503
+            if wait:
+                REQUESTS.inc(status=429)
+                response = jsonify({'error': 'rate_limited', 'user': username})
+                response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+                return response, 429
+
+    try:
+        g.deadline = Deadline.from_headers(request.headers, g.start_time)
+        g.priority = request_priority()
+    except ValueError:
+        return jsonify({'error': 'Invalid deadline or priority input'}), 400
+    try:
+        g.queue_time = admission.acquire(g.deadline, g.priority)
+    except Rejected as e:
+        if e.reason == 'deadline_exceeded':
+            record_skip('queued', model.step_names())
+            return deadline_response('queued')
+        REQUESTS.inc(status=REJECT_STATUS)
+        response = jsonify({'error': 'overloaded', 'reason': e.reason})
+        response.headers['Retry-After'] = str(RETRY_AFTER_S)
+        return response, REJECT_STATUS
+    g.admitted = True
+    return None
+
+@app.teardown_request
+def release_request(exc):
+    if g.pop('admitted', False):
+        admission.release()
+        latency = time.monotonic() - g.start_time
+        REQUEST_SECONDS.observe(latency, priority=g.priority)
+        if audit_sink and 'audit' in g:
+            scoring_model, features, score = g.audit
+            audit_sink.append(scoring_model.name, scoring_model.version, features, score, latency * 1000)
+        if tier_policy and 'tier' in g:
+            tier_policy.observe_latency(latency, g.tier)
+
+def deadline_response(stage):
+    REQUESTS.inc(status=504)
+    return jsonify({'error': 'deadline_exceeded', 'status': 'deadline_exceeded', 'stage': stage}), 504
+
+def select_model():
+    """
+    Pick the model tier for a new request from the current queue depth and latency EWMA.
+    """
+    if tier_policy and tier_policy.choose(admission.waiting) == FALLBACK:
+        return fallback_model, FALLBACK
+    return model, PRIMARY
+
+def build_result(scoring_model, score, tier):
+    result = {
+        'model_name': scoring_model.name,
+        'model_version': scoring_model.version,
+        'model_tier': tier,
+        'score': float(score),
+    }
+    if scoring_model.threshold is not None:
+        result['prediction'] = int(score >= scoring_model.threshold)
+        result['threshold'] = float(scoring_model.threshold)
+    return result
+
+def blocked_result(field):
+    return {
+        'model_name': 'blocklist',
+        'model_version': blocklist.filter.version,
+        'model_tier': 'blocklist',
+        'score': 1.0,
+        'prediction': 1,
+        'blocklist_match': field,
+    }
+
+@app.route('/predict', methods=['POST'])
+@auth.login_required
+def predict():
+    try:
+        data_input = request.get_json()
+        if not data_input:
+            raise ValueError("No input data provided")
+
+        blocked_field = blocklist.match(data_input) if blocklist else None
+        if blocked_field:
+            # Known-bad entity: decide without running any model
+            REQUESTS.inc(status=200)
+            return jsonify(blocked_result(blocked_field)), 200
+
+        scoring_model, tier = select_model()
+        g.tier = tier
+        # Decided before scoring: an explanation that can't be made never fails the request
+        explain = request.args.get('explain') == 'true'
+        explainable = explain and supports_explain(scoring_model)
+        input_array = records_to_array([data_input])
+        if single_flight:
+            scores = single_flight.do(request_key(scoring_model, input_array),
+                                      lambda: scoring_model.score_batch(input_array, g.deadline), g.deadline)
+        else:
+            scores = scoring_model.score_batch(input_array, g.deadline)
+        score = scores[0]
+        result = build_result(scoring_model, score, tier)
+        if rules_engine:
+            decisions, rule_names = rules_engine.evaluate(input_array, scores, scoring_model.threshold)
+            result['decision'], result['decision_rule'] = decisions[0], rule_names[0]
+        if rescorer:
+            # None when the re-score queue is full and the job was dropped
+            result['rescore_id'] = rescorer.submit(input_array[0], data_input.get('transaction_id'))
+        g.audit = (scoring_model, input_array[0], score)
+        if explain and score >= EXPLAIN_MIN_SCORE:
+            if not explainable:
+                result['explanation_unavailable'] = f'not supported for {scoring_model.name}'
+            else:
+                try:
+                    contributions, bias = explain_batch(scoring_model, input_array)
+                    result['explanation'] = explanation_dict(contributions[0], bias[0], EXPLAIN_TOP_K)
+                except Exception as e:
+                    logging.error(f"Error explaining {scoring_model.name}: {str(e)}")
+                    result['explanation_unavailable'] = 'error'
+        logging.debug(f"Prediction result: {result}")
+        REQUESTS.inc(status=200)
+        return jsonify(result), 200
+
+    except DeadlineExceeded as e:
+        return deadline_response(e.stage)
+    except Exception as e:
+        logging.error(f"Error during prediction: {str(e)}")
+        REQUESTS.inc(status=400)
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/result/<job_id>', methods=['GET'])
+@auth.login_required
+def rescore_result(job_id):
+    """
+    Deep re-score of an earlier /predict call, by its rescore_id.
+    """
+    if not rescorer:
+        return jsonify({'error': 'Two-phase scoring is not enabled'}), 404
+    result = rescorer.store.get(job_id)
+    if result is None:
+        return jsonify({'error': 'Unknown or expired job id'}), 404
+    return jsonify(result), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_all(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/memory', methods=['GET'])
+@auth.login_required
+def debug_memory():
+    """
+    Private vs shared resident memory of the worker that served this request.
+    """
+    result = dict(memory_summary(), worker=os.getpid(), gc_frozen_objects=gc.get_freeze_count())
+    return jsonify(result), 200
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok', 'model_name': model.name, 'model_version': model.version}), 200
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=8502, threaded=True)
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+
+from scoring.deadline import DeadlineExceeded, record_skip
+from scoring.metrics import Counter, Gauge
+
+SINGLE_FLIGHT_REQUESTS = Counter('scoring_single_flight_requests_total',
+                                 'Scoring calls by single-flight role (leader computed, follower reused)')
+SINGLE_FLIGHT_IN_FLIGHT = Gauge('scoring_single_flight_in_flight', 'Distinct computations currently running')
+
+def request_key(model, X):
+    """
+    Hash of the model identity and the normalized float32 feature matrix.
+    Adding 0.0 folds -0.0 into 0.0 so equal values always hash the same.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{model.name}:{model.version}'.encode())
+    digest.update((X + 0.0).tobytes())
+    return digest.hexdigest()
+
+class Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations: the first caller for a key
+    (the leader) runs fn, later callers with the same key wait for and share
+    its result. Nothing is cached once the leader finishes.
+
+    Followers wait no longer than their own deadline. If the leader fails
+    (for instance on its own, shorter, deadline) followers do not inherit
+    the error; one of them becomes the new leader and retries.
+    """
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn, deadline=None):
+        while True:
+            with self.lock:
+                call = self.calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self.calls[key] = Call()
+            if leader:
+                return self._lead(key, call, fn)
+
+            SINGLE_FLIGHT_REQUESTS.inc(role='follower')
+            timeout = None if deadline is None else max(deadline.remaining(), 0)
+            if not call.event.wait(timeout):
+                record_skip('coalesced', [])
+                raise DeadlineExceeded('coalesced')
+            if call.error is None:
+                return call.result
+
+    def _lead(self, key, call, fn):
+        SINGLE_FLIGHT_REQUESTS.inc(role='leader')
+        SINGLE_FLIGHT_IN_FLIGHT.inc()
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            SINGLE_FLIGHT_IN_FLIGHT.dec()
+            call.event.set()
@@ -0,0 +1,59 @@
+import json
+import logging
+import os
+import sys
+
+from scoring.sources import redis_client
+
+class JsonLinesSink:
+    """
+    Appends one JSON line per scored transaction; '-' writes to stdout.
+    """
+    def __init__(self, path):
+        self.path = path
+        if path == '-':
+            self.file = sys.stdout
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.file = open(path, 'a')
+
+    def write(self, results):
+        self.file.write(''.join(json.dumps(result) + '\n' for result in results))
+        self.file.flush()
+        if self.file is not sys.stdout:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+class RedisStreamSink:
+    """
+    Appends each result to an output stream as a 'data' JSON field.
+    """
+    def __init__(self, client, stream):
+        self.client = client
+        self.stream = stream
+
+    def write(self, results):
+        pipeline = self.client.pipeline() if hasattr(self.client, 'pipeline') else self.client
+        for result in results:
+            pipeline.xadd(self.stream, {'data': json.dumps(result)})
+        if pipeline is not self.client:
+            pipeline.execute()
+
+    def close(self):
+        pass
+
+def make_sink(spec, partition=0, stream='scores:{partition}'):
+    """
+    Build a sink from 'jsonl:PATH', 'redis://HOST:PORT/DB' or 'local:DBPATH'.
+    """
+    spec = spec.format(partition=partition)
+    stream = stream.format(partition=partition)
+    if spec.startswith('jsonl:'):
+        return JsonLinesSink(spec[len('jsonl:'):])
+    if spec.startswith('redis://') or spec.startswith('local:'):
+        return RedisStreamSink(redis_client(spec), stream)
+    logging.error(f"Unknown sink spec: {spec}")
+    raise ValueError(f"Unknown sink spec: {spec}")
@@ -0,0 +1,219 @@
+import json
+import logging
+import os
+import selectors
+import socket
+import time
+
+from scoring.local_stream import LocalStreamClient
+from scoring.metrics import Counter
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Every source returns a list of (offset, record) pairs from read(), waiting up to
+# timeout seconds for the first record and then taking what is already available,
+# and is told which offsets have been durably written by commit(offsets).
+# Records that are not valid JSON are logged, counted and skipped, so one bad
+# line never stops the consumer.
+
+BAD_RECORDS = Counter('scoring_source_bad_records_total', 'Input records skipped as invalid JSON, by source')
+
+def parse_record(data, source, where):
+    """
+    The decoded record, or None (logged and counted) when data is not valid JSON.
+    """
+    try:
+        return json.loads(data)
+    except (json.JSONDecodeError, UnicodeDecodeError, TypeError) as e:
+        logging.error(f"Skipping invalid JSON record at {where}: {str(e)}")
+        BAD_RECORDS.inc(source=source)
+        return None
+
+class FileTailSource:
+    """
+    Tails a newline-delimited JSON file. The committed byte offset is kept in
+    '<path>.offset' so a restarted consumer resumes after the last written batch.
+    """
+    def __init__(self, path, poll_interval=0.05):
+        self.path = path
+        self.offset_path = f'{path}.offset'
+        self.poll_interval = poll_interval
+        self.position = self._load_offset()
+        self.file = None
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_path, 'r') as file:
+                return int(file.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _open(self):
+        if self.file is None and os.path.exists(self.path):
+            self.file = open(self.path, 'rb')
+            self.file.seek(self.position)
+        return self.file
+
+    def read(self, max_records, timeout):
+        deadline = time.monotonic() + timeout
+        batch = []
+        while len(batch) < max_records:
+            file = self._open()
+            line = file.readline() if file else b''
+            if line.endswith(b'\n'):
+                start, self.position = self.position, file.tell()
+                record = parse_record(line, 'file', f'{self.path}:{start}') if line.strip() else None
+                if record is not None:
+                    batch.append((self.position, record))
+                continue
+            # Partial line: rewind and wait for the writer to finish it
+            if line and file:
+                file.seek(self.position)
+            if batch or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        return batch
+
+    def commit(self, offsets):
+        if not offsets:
+            return
+        tmp_path = f'{self.offset_path}.tmp'
+        with open(tmp_path, 'w') as file:
+            file.write(str(max(offsets)))
+        os.replace(tmp_path, self.offset_path)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+class UnixSocketSource:
+    """
+    Listens on a Unix socket for newline-delimited JSON from any number of writers.
+    There is no replay, so commit() is a no-op (at-most-once delivery).
+    """
+    def __init__(self, path):
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        self.server.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.buffers = {}
+        self.ready = []
+
+    def _poll(self, timeout):
+        for key, _ in self.selector.select(timeout):
+            if key.fileobj is self.server:
+                conn, _ = self.server.accept()
+                conn.setblocking(False)
+                self.selector.register(conn, selectors.EVENT_READ)
+                self.buffers[conn] = b''
+                continue
+            conn = key.fileobj
+            data = conn.recv(1 << 16)
+            if not data:
+                self.selector.unregister(conn)
+                self.buffers.pop(conn, None)
+                conn.close()
+                continue
+            *lines, self.buffers[conn] = (self.buffers[conn] + data).split(b'\n')
+            records = (parse_record(line, 'unix', self.path) for line in lines if line.strip())
+            self.ready.extend(record for record in records if record is not None)
+
+    def read(self, max_records, timeout):
+        # Wait up to timeout for the first record, then take whatever else is ready
+        deadline = time.monotonic() + timeout
+        self._poll(0)
+        while not self.ready:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._poll(remaining)
+        while len(self.ready) < max_records and self.selector.select(0):
+            self._poll(0)
+        batch, self.ready = self.ready[:max_records], self.ready[max_records:]
+        return [(None, record) for record in batch]
+
+    def commit(self, offsets):
+        pass
+
+    def close(self):
+        self.selector.close()
+        self.server.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class RedisStreamSource:
+    """
+    Reads a Redis stream through a consumer group; each entry carries the
+    transaction JSON in its 'data' field. Works with redis.Redis or with
+    LocalStreamClient as a local stand-in. The consumer name must be stable
+    across restarts: entries read but not acked stay pending under it, and
+    are only replayed to a consumer with the same name.
+    """
+    def __init__(self, client, stream, group='scoring', consumer='consumer-0'):
+        self.client = client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        try:
+            self.client.xgroup_create(stream, group, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        # Replay entries delivered to this consumer but never acked before reading new ones
+        self.start_id = '0'
+
+    def read(self, max_records, timeout):
+        response = self.client.xreadgroup(self.group, self.consumer, {self.stream: self.start_id},
+                                          count=max_records, block=int(timeout * 1000))
+        entries = response[0][1] if response else []
+        if self.start_id == '0' and not entries:
+            self.start_id = '>'
+            return self.read(max_records, timeout)
+        batch = []
+        for entry_id, fields in entries:
+            record = parse_record(fields.get('data', fields.get(b'data')), 'redis', f'{self.stream} {entry_id}')
+            if record is None:
+                # Acked now, or it would be replayed as pending after every restart
+                self.commit([entry_id])
+                continue
+            batch.append((entry_id, record))
+        return batch
+
+    def commit(self, offsets):
+        if offsets:
+            self.client.xack(self.stream, self.group, *offsets)
+
+    def close(self):
+        pass
+
+def redis_client(url):
+    if url.startswith('local:'):
+        return LocalStreamClient(url[len('local:'):])
+    if redis is None:
+        raise ImportError("The 'redis' package is required for redis:// sources and sinks")
+    return redis.Redis.from_url(url)
+
+def make_source(spec, partition=0, stream='transactions:{partition}', group='scoring', consumer='consumer-{partition}'):
+    """
+    Build a source from 'file:PATH', 'unix:PATH', 'redis://HOST:PORT/DB' or
+    'local:DBPATH'. '{partition}' in PATH, stream or consumer is replaced by the partition index.
+    """
+    spec = spec.format(partition=partition)
+    stream = stream.format(partition=partition)
+    consumer = consumer.format(partition=partition)
+    if spec.startswith('file:'):
+        return FileTailSource(spec[len('file:'):])
+    if spec.startswith('unix:'):
+        return UnixSocketSource(spec[len('unix:'):])
+    if spec.startswith('redis://') or spec.startswith('local:'):
+        return RedisStreamSource(redis_client(spec), stream, group, consumer)
+    logging.error(f"Unknown source spec: {spec}")
+    raise ValueError(f"Unknown source spec: {spec}")
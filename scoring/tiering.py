@@ -0,0 +1,72 @@
+import threading
+import time
+
+from scoring.metrics import Counter, Gauge
+
+TIER_REQUESTS = Counter('scoring_tier_requests_total', 'Scored requests by model tier')
+TIER_SWITCHES = Counter('scoring_tier_switches_total', 'Tier changes, by the tier switched to')
+TIER_DEGRADED = Gauge('scoring_tier_degraded', '1 while new requests are routed to the fallback model',
+                      aggregate='max')
+TIER_LATENCY_EWMA = Gauge('scoring_tier_latency_ewma_seconds', 'EWMA of end-to-end /predict latency on the primary tier',
+                          aggregate='max')
+TIER_PROBES = Counter('scoring_tier_probes_total', 'Requests sent to the primary model while degraded, to measure it')
+
+PRIMARY = 'primary'
+FALLBACK = 'fallback'
+
+class TierPolicy:
+    """
+    Routes new requests to the fallback model when queue depth or the latency
+    EWMA crosses its high watermark, and back to the primary model only once
+    both are under their low watermarks and the current tier has been held for
+    min_dwell seconds. The gap between the watermarks is the hysteresis.
+
+    The EWMA only tracks the primary tier: fast fallback responses say nothing
+    about whether the primary has recovered. While degraded, one request per
+    probe_interval seconds (and only with the queue at or under queue_low) is
+    sent to the primary as a probe, so the EWMA keeps following it.
+    """
+    def __init__(self, queue_high, queue_low, latency_high, latency_low, alpha=0.2, min_dwell=5.0,
+                 probe_interval=1.0):
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.alpha = alpha
+        self.min_dwell = min_dwell
+        self.probe_interval = probe_interval
+        self.latency_ewma = 0.0
+        self.probed_at = 0.0
+        self.degraded = False
+        self.changed_at = time.monotonic() - min_dwell
+        self.lock = threading.Lock()
+
+    def observe_latency(self, seconds, tier=PRIMARY):
+        if tier != PRIMARY:
+            return
+        with self.lock:
+            self.latency_ewma += self.alpha * (seconds - self.latency_ewma)
+        TIER_LATENCY_EWMA.set(self.latency_ewma)
+
+    def choose(self, queue_depth):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.changed_at >= self.min_dwell:
+                if not self.degraded and (queue_depth >= self.queue_high or self.latency_ewma >= self.latency_high):
+                    self._switch(True, now)
+                elif self.degraded and queue_depth <= self.queue_low and self.latency_ewma <= self.latency_low:
+                    self._switch(False, now)
+            tier = FALLBACK if self.degraded else PRIMARY
+            if tier == FALLBACK and queue_depth <= self.queue_low and now - self.probed_at >= self.probe_interval:
+                self.probed_at = now
+                tier = PRIMARY
+                TIER_PROBES.inc()
+        TIER_REQUESTS.inc(tier=tier)
+        return tier
+
+    def _switch(self, degraded, now):
+        self.degraded = degraded
+        self.changed_at = now
+        self.probed_at = now
+        TIER_SWITCHES.inc(to=FALLBACK if degraded else PRIMARY)
+        TIER_DEGRADED.set(int(degraded))